@@ -1,10 +1,61 @@
+# ---------------------
+# Standard Library Imports
+# ---------------------
+from datetime import timedelta
+
 # ---------------------
 # Django Imports
 # ---------------------
-from django.contrib import admin
-from .models import Blogpost, Comment ,MediaCategory, UserProfile
+from django.conf import settings
+from django.contrib import admin, messages
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import Blogpost, Bookmark, Comment ,MediaCategory, Like, Task, \
+    UserProfile, sync_engagement_counts
+from .caching import comments_approved
+from .pagination import ApproximateCountPaginator
+from .search import search_post_ids
+from .taskqueue import FAILED, QUEUED
+from .trending import refresh_scores
 from django_summernote.admin import SummernoteModelAdmin
 
+# ---------------------
+# Bulk Comment Moderation
+# ---------------------
+# Approving or unapproving every selected comment with one UPDATE holds
+# row locks on the whole selection and can run past the request timeout
+# when "select all" covers thousands of rows. The selection is instead
+# walked in primary key order, one batch per short transaction, and the
+# caches of each batch's posts are refreshed as it is committed.
+MODERATION_BATCH_SIZE = 1000
+
+
+def moderate_comments(queryset, approved, batch_size=MODERATION_BATCH_SIZE):
+    """
+    Sets 'approved' on the comments of the queryset that do not have it
+    yet. Returns the number of comments changed.
+    """
+    pending = queryset.exclude(approved=approved).order_by('pk')
+    changed, last_pk = 0, 0
+    while True:
+        batch = list(
+            pending.filter(pk__gt=last_pk).values_list('pk', 'blogpost_id')
+            [:batch_size]
+        )
+        if not batch:
+            return changed
+        last_pk = batch[-1][0]
+        with transaction.atomic():
+            changed += Comment.objects.filter(
+                pk__in=[pk for pk, _ in batch]
+            ).exclude(approved=approved).update(approved=approved)
+        # update() skips post_save, so tell the caches which posts changed
+        comments_approved.send(
+            sender=Comment, post_ids={post_id for _, post_id in batch}
+        )
+
+
 # ---------------------
 # Register your models
 # ---------------------
@@ -16,23 +67,92 @@ class MediaCategoryAdmin(admin.ModelAdmin):
     # Define search fields
     search_fields = ('media_name',)
 
+# Likes and bookmarks go through their own models (with the time they
+# were given), and the admin leaves such M2M fields out of the post form,
+# so they are edited as inlines. Users are picked by id, not from a
+# select listing every account.
+class LikeInline(admin.TabularInline):
+    model = Like
+    raw_id_fields = ('user',)
+    extra = 0
+
+
+class BookmarkInline(admin.TabularInline):
+    model = Bookmark
+    raw_id_fields = ('user',)
+    extra = 0
+
+
 @admin.register(Blogpost)
 class PostAdmin(SummernoteModelAdmin):
     # Each blogpost display features are defined here
-    list_display = ('blog_title', 'slug', 'status', 'created_on')
-    # Define search fields
-    search_fields = ('blog_title', 'content')
+    list_display = (
+        'blog_title', 'slug', 'status', 'created_on',
+        'like_count', 'bookmark_count'
+    )
+    # Define search fields. The search itself is done by
+    # get_search_results below, on indexed columns and the search index.
+    search_fields = ('blog_title', 'slug')
     # Define prepopulated fields
     prepopulated_fields = {'slug': ('blog_title',)}
     # Define filter fields
     list_filter = ('status', 'created_on')
     # Define summernote fields
     summernote_fields = ('content')
+    # Large tables: estimated totals instead of COUNT(*)
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
+    search_results_limit = 200
+    inlines = (LikeInline, BookmarkInline)
+
+    # Inline rows are saved one by one, without m2m_changed, so the
+    # stored counters and the hot score are recomputed afterwards
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        sync_engagement_counts([form.instance.pk])
+        refresh_scores([form.instance.pk])
+
+    # The changelist does not show the post body, so the long 'content'
+    # column is left out of its query
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if request.resolver_match and \
+                request.resolver_match.url_name.endswith('_changelist'):
+            queryset = queryset.defer('content')
+        return queryset
+
+    # Exact slug, title prefix (both unique, indexed columns) or a match
+    # in the full-text search index, instead of LIKE '%term%' over every
+    # post body. The index only holds published posts the task worker
+    # has reached, so drafts and posts still waiting to be indexed are
+    # matched on title and body directly; there are few of those.
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        matches = Q(slug=term) | Q(blog_title__startswith=term)
+        post_ids = search_post_ids(term, self.search_results_limit)
+        if post_ids:
+            matches |= Q(pk__in=post_ids)
+        unindexed = Q(status=0)
+        queued_ids = [
+            args[0] for args in Task.objects.filter(
+                name='blog.tasks.index_blogpost'
+            ).values_list('args', flat=True)
+        ]
+        if queued_ids:
+            unindexed |= Q(pk__in=queued_ids)
+        matches |= unindexed & (
+            Q(blog_title__icontains=term) | Q(content__icontains=term)
+        )
+        return queryset.filter(matches), False
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     # Define display fields for the user's profile
     list_display = ('user', 'bio', 'country')
+    # Join the user into the changelist query
+    list_select_related = ('user',)
     # Define search fields
     search_fields = ('user__username', 'bio')
 
@@ -40,13 +160,77 @@ class UserProfileAdmin(admin.ModelAdmin):
 class CommentAdmin(admin.ModelAdmin):
     # Define display fields for comments
     list_display = ('user', 'body', 'blogpost', 'created_on', 'approved')
-    # Define filter fields
+    # Join the user and the blogpost into the changelist query
+    list_select_related = ('user', 'blogpost')
+    # Define filter fields, both backed by comment indexes
     list_filter = ('approved', 'created_on')
-    # Define search fields
-    search_fields = ('user', 'body', 'blogpost')
+    # Newest first, from the created_on indexes
+    ordering = ('-created_on',)
+    # Define search fields. get_search_results below matches the first
+    # two exactly and the body in recent comments only.
+    search_fields = ('user__username', 'blogpost__slug', 'body')
+    search_help_text = (
+        'Exact username or post slug, or words in comments of the last '
+        f'{settings.BLOG_ADMIN_COMMENT_SEARCH_DAYS} days.'
+    )
+    # Large tables: estimated totals instead of COUNT(*)
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
     # Define actions
-    actions = ['approved_comments']
+    actions = ['approved_comments', 'unapproved_comments']
+
+    # Exact username or post slug, both unique indexed columns, or a
+    # body match among the comments of the last
+    # BLOG_ADMIN_COMMENT_SEARCH_DAYS (from the created_on index), instead
+    # of LIKE '%term%' over every comment body and the joined tables
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        since = timezone.now() - timedelta(
+            days=settings.BLOG_ADMIN_COMMENT_SEARCH_DAYS
+        )
+        return queryset.filter(
+            Q(user__username=term) | Q(blogpost__slug=term)
+            | Q(created_on__gte=since, body__icontains=term)
+        ), False
 
     # Define approved comments function
+    @admin.action(description='Approve selected comments')
     def approved_comments(self, request, queryset):
-        queryset.update(approved=True)
+        changed = moderate_comments(queryset, approved=True)
+        if request is not None:
+            self.message_user(
+                request, f'{changed} comment(s) approved.', messages.SUCCESS
+            )
+
+    # Define unapproved comments function
+    @admin.action(description='Unapprove selected comments')
+    def unapproved_comments(self, request, queryset):
+        changed = moderate_comments(queryset, approved=False)
+        if request is not None:
+            self.message_user(
+                request, f'{changed} comment(s) unapproved.',
+                messages.SUCCESS
+            )
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    # Queued, running and failed background tasks (blog/taskqueue.py)
+    list_display = ('name', 'args', 'status', 'attempts', 'run_after',
+                    'locked_by')
+    list_filter = ('status', 'name')
+    ordering = ('status', 'run_after', 'id')
+    readonly_fields = ('locked_by', 'locked_on', 'last_error', 'created_on')
+    actions = ['retry_tasks']
+
+    # Queue the selected failed tasks again with fresh attempts
+    @admin.action(description='Retry selected failed tasks')
+    def retry_tasks(self, request, queryset):
+        changed = queryset.filter(status=FAILED).update(
+            status=QUEUED, attempts=0, locked_by='', locked_on=None,
+            run_after=timezone.now()
+        )
+        self.message_user(
+            request, f'{changed} task(s) queued again.', messages.SUCCESS
+        )
@@ -13,3 +13,7 @@ class BlogConfig(AppConfig):
 
     # Define the application name
     name = 'blog'
+
+    # Connect the signal handlers once the app registry is ready
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,165 @@
+# ---------------------
+# Standard Library Imports
+# ---------------------
+import json
+import platform
+import statistics
+import time
+
+# ---------------------
+# Django Imports
+# ---------------------
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from nederlearn.dbconnections import install_connection_metrics, metrics
+from .models import Blogpost
+
+# ---------------------
+# HTTP Benchmark
+# ---------------------
+# Drives the main pages through the Django test client, in process, as a
+# logged-in reader. Every request goes through the full middleware stack,
+# URL routing, views and templates, so the numbers move with changes to
+# any of them. Each scenario reports latency percentiles, throughput,
+# queries per request and how many database connections were opened per
+# request (see nederlearn/dbconnections.py), so runs with different
+# connection settings can be compared.
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of a list of numbers.
+    """
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1,
+                       round(fraction * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def summarise(durations, queries, connections=None):
+    total_seconds = sum(durations)
+    milliseconds = [duration * 1000 for duration in durations]
+    summary = {
+        'requests': len(durations),
+        'p50_ms': round(percentile(milliseconds, 0.50), 2),
+        'p95_ms': round(percentile(milliseconds, 0.95), 2),
+        'p99_ms': round(percentile(milliseconds, 0.99), 2),
+        'mean_ms': round(statistics.mean(milliseconds), 2),
+        'throughput_rps': round(len(durations) / total_seconds, 1)
+        if total_seconds else None,
+        'queries_per_request': round(statistics.mean(queries), 2),
+    }
+    if connections:
+        summary['connections_per_request'] = round(
+            connections['opened'] / len(durations), 3)
+        summary['connect_ms_per_request'] = round(
+            connections['connect_ms'] / len(durations), 3)
+    return summary
+
+
+class Benchmark:
+
+    def __init__(self, user, iterations=200, warmup=10):
+        install_connection_metrics()
+        self.iterations = iterations
+        self.warmup = warmup
+        self.client = Client()
+        self.client.force_login(user)
+
+    def scenarios(self):
+        """
+        Returns {name: (method, [urls])}. Detail and like requests rotate
+        over the most liked posts, like real traffic does.
+        """
+        posts = list(Blogpost.objects.filter(status=1).order_by(
+            '-like_count').values_list('slug', 'media_category_id')[:50])
+        if not posts:
+            raise ValueError('No published posts to benchmark; seed first.')
+        category = next(
+            (category for _, category in posts if category), None
+        )
+        home = reverse('home')
+        return {
+            'home': ('get', [home]),
+            'category': ('get', [f'{home}?category={category}']),
+            'detail': ('get', [
+                reverse('blogpost_detail', args=[slug]) for slug, _ in posts
+            ]),
+            'like': ('post', [
+                reverse('like_toggle_api', args=[slug]) for slug, _ in posts
+            ]),
+            'search': ('get', [f"{reverse('search')}?q=film"]),
+        }
+
+    def run_scenario(self, method, urls):
+        send = getattr(self.client, method)
+        for i in range(self.warmup):
+            send(urls[i % len(urls)])
+        durations, queries = [], []
+        before = metrics.snapshot()
+        for i in range(self.iterations):
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = send(urls[i % len(urls)])
+                durations.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                raise ValueError(
+                    f'{urls[i % len(urls)]} returned {response.status_code}'
+                )
+            queries.append(len(context.captured_queries))
+        after = metrics.snapshot()
+        connections = {
+            name: after[name] - before[name]
+            for name in ('opened', 'connect_ms')
+        }
+        return summarise(durations, queries, connections)
+
+    def run(self, only=None):
+        results = {}
+        for name, (method, urls) in self.scenarios().items():
+            if only and name not in only:
+                continue
+            results[name] = self.run_scenario(method, urls)
+        return {
+            'created': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'database': connection.vendor,
+            'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+            'iterations': self.iterations,
+            'posts': Blogpost.objects.count(),
+            'scenarios': results,
+        }
+
+
+def compare(baseline, current):
+    """
+    Returns rows of (scenario, metric, before, after, change %) for the
+    metrics that are present in both runs.
+    """
+    rows = []
+    for name, after in current['scenarios'].items():
+        before = baseline['scenarios'].get(name)
+        if not before:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps',
+                       'queries_per_request', 'connections_per_request',
+                       'connect_ms_per_request'):
+            old, new = before.get(metric), after.get(metric)
+            if old is None or new is None:
+                continue
+            change = ((new - old) / old * 100) if old else 0.0
+            rows.append((name, metric, old, new, round(change, 1)))
+    return rows
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as baseline:
+        return json.load(baseline)
+
+
+def save_baseline(path, results):
+    with open(path, 'w', encoding='utf-8') as baseline:
+        json.dump(results, baseline, indent=2)
@@ -0,0 +1,280 @@
+# ---------------------
+# Standard Library Imports
+# ---------------------
+import time
+from datetime import datetime, timezone
+
+# ---------------------
+# Django Imports
+# ---------------------
+from django.conf import settings
+from django.core.cache import cache
+from django.dispatch import Signal
+from django.db.models import Count, Q
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from nederlearn.middleware import timing
+
+# ---------------------
+# Custom Signals
+# ---------------------
+# Sent with 'post_ids' when comments are approved or unapproved in bulk
+# (by the CommentAdmin actions), since queryset.update() fires no
+# post_save.
+comments_approved = Signal()
+
+# Sent with 'instance' after blog/images.py has stored new image variants,
+# which it writes with update() so that no second post_save fires.
+image_variants_refreshed = Signal()
+
+# ---------------------
+# Blogpost Detail Cache
+# ---------------------
+# The detail page's shared HTML (masthead, post body and comment block)
+# is rendered once and cached per post. The entry records the post's
+# 'updated_on' so an edit that slipped past the signals is still
+# detected, and the signal handlers in blog/signals.py delete the entry
+# whenever the post or one of its comments changes. Anything that
+# depends on the viewer, such as the liked state, is not cached. Each
+# entry also records when it was built: parts of the page change without
+# touching 'updated_on' (the author's name, the vocabulary header, the
+# similar posts), so the page's ETag includes that stamp.
+
+
+def detail_cache_key(post_id):
+    return f'blog:detail:{post_id}'
+
+
+def get_detail_fragments(blogpost_stub, build):
+    """
+    Returns the cached fragments for a post, building and storing them
+    with 'build()' when the entry is missing or older than the post.
+    """
+    key = detail_cache_key(blogpost_stub.pk)
+    entry = cache.get(key)
+    if entry is None or entry['updated_on'] != blogpost_stub.updated_on:
+        entry = build()
+        entry['updated_on'] = blogpost_stub.updated_on
+        entry['built_on'] = time.time()
+        cache.set(key, entry, settings.BLOG_DETAIL_CACHE_TIMEOUT)
+    return entry
+
+
+def render_detail_fragments(blogpost, comment_page, comment_count,
+                            latest_comment_on=None, similar_posts=()):
+    """
+    Renders the viewer-independent parts of the detail page. Only the
+    first page of comments is included; later pages are loaded from the
+    CommentPage endpoint using 'next_comments_cursor'. The time of the
+    newest approved comment is kept for the page's Last-Modified.
+    """
+    context = {
+        'blogpost': blogpost, 'comments': comment_page.object_list,
+        'similar_posts': similar_posts,
+    }
+    return {
+        'header': render_to_string('includes/blogpost_header.html', context),
+        'body': render_to_string('includes/blogpost_body.html', context),
+        'comments': render_to_string('includes/comment_list.html', context),
+        'similar': render_to_string('includes/similar_posts.html', context),
+        'comment_count': comment_count,
+        'next_comments_cursor': comment_page.next_cursor,
+        'latest_comment_on': latest_comment_on,
+    }
+
+
+def invalidate_detail(*post_ids):
+    cache.delete_many([detail_cache_key(pk) for pk in post_ids])
+
+
+# ---------------------
+# Media Category Catalogue
+# ---------------------
+# All media categories with their number of published posts, cached as
+# one entry. The list page reads its filter menu from here and resolves
+# ?category= to a primary key without touching the database. Signals
+# drop the entry when a category or a blogpost is saved or deleted.
+CATEGORY_CACHE_KEY = 'blog:categories'
+
+
+def get_category_catalogue():
+    """
+    Returns a list of {'id', 'media_name', 'post_count'} dicts, ordered
+    by name.
+    """
+    catalogue = cache.get(CATEGORY_CACHE_KEY)
+    if catalogue is None:
+        from .models import MediaCategory
+        catalogue = list(
+            MediaCategory.objects.annotate(
+                post_count=Count(
+                    'blog_posts', filter=Q(blog_posts__status=1)
+                )
+            ).order_by('media_name').values('id', 'media_name', 'post_count')
+        )
+        cache.set(
+            CATEGORY_CACHE_KEY, catalogue,
+            settings.BLOG_CATEGORY_CACHE_TIMEOUT
+        )
+    return catalogue
+
+
+def resolve_category(value):
+    """
+    Finds a catalogue entry by primary key, or by name for old links
+    that still use ?category=<media_name>. Returns None if unknown.
+    """
+    for category in get_category_catalogue():
+        if str(category['id']) == value or category['media_name'] == value:
+            return category
+    return None
+
+
+def invalidate_categories():
+    cache.delete(CATEGORY_CACHE_KEY)
+
+
+# ---------------------
+# Feed Versions
+# ---------------------
+# Version stamps for the post feeds, used as the list pages' ETag and
+# Last-Modified (see blog/conditional.py). Each stamp is the time of the
+# last change it covers:
+#
+# - 'posts': any post or category was saved or deleted. This changes
+#   every feed, including the category menu.
+# - 'all' and one per category id: likes or bookmarks changed on a post
+#   in the (unfiltered) feed or in that category, which moves the like
+#   counts and icons on its cards.
+# - 'personal' and one per user: posts were fanned out to the personal
+#   feeds, or one user's personal feed was rebuilt.
+#
+# A feed's version is its filter's stamp combined with 'posts'. Stamps
+# that are missing from the cache start at the current time, so an
+# evicted entry can only cause a fresh 200, never a stale 304.
+def feed_version_key(name):
+    return f'blog:feed:{name}'
+
+
+def get_feed_version(category_id=None, user_id=None):
+    """
+    Returns (version, last_modified) for the feed of one category, or
+    the unfiltered feed when 'category_id' is None. With 'user_id', the
+    version also covers that user's personal feed.
+    """
+    keys = [feed_version_key('posts'),
+            feed_version_key(category_id or 'all')]
+    if user_id is not None:
+        keys += [feed_version_key('personal'),
+                 feed_version_key(f'user:{user_id}')]
+    stamps = cache.get_many(keys)
+    for key in keys:
+        if key not in stamps:
+            cache.add(key, time.time(), None)
+            stamps[key] = cache.get(key)
+    version = ':'.join(repr(stamps[key]) for key in keys)
+    last_modified = datetime.fromtimestamp(
+        max(stamps.values()), tz=timezone.utc
+    )
+    return version, last_modified
+
+
+def bump_feed_versions(category_ids=()):
+    """
+    Marks the unfiltered feed and the given categories' feeds as changed.
+    """
+    now = time.time()
+    names = ['all'] + [pk for pk in category_ids if pk]
+    cache.set_many(
+        {feed_version_key(name): now for name in names}, None
+    )
+
+
+def bump_all_feeds():
+    cache.set(feed_version_key('posts'), time.time(), None)
+
+
+def bump_personal_feeds(*user_ids):
+    """
+    Marks the given users' personal feeds as changed, or all of them
+    when no user is given.
+    """
+    now = time.time()
+    names = [f'user:{pk}' for pk in user_ids] or ['personal']
+    cache.set_many(
+        {feed_version_key(name): now for name in names}, None
+    )
+
+
+# ---------------------
+# Post Card Fragments
+# ---------------------
+# The HTML of each post card on the feed pages, cached per card. A card's
+# key is made of the post id, its 'updated_on', its like count and a card
+# version stamp, plus the viewer's liked/bookmarked icons (so each card
+# has at most four variants). Edits and likes change the key by
+# themselves; the signal handlers in blog/signals.py bump the version for
+# changes that do not touch the post row, such as its author being
+# renamed or its image variants being rebuilt. Old cards are never read
+# again and expire after BLOG_CARD_CACHE_TIMEOUT.
+CARD_TEMPLATE = 'includes/post_card.html'
+
+
+def card_version_key(post_id):
+    return f'blog:card-version:{post_id}'
+
+
+def card_cache_key(post, version):
+    return (
+        f'blog:card:{post.pk}:{post.updated_on.timestamp()}:'
+        f'{post.like_count}:{version}:'
+        f'{getattr(post, "is_liked", False):d}'
+        f'{getattr(post, "is_bookmarked", False):d}'
+    )
+
+
+def attach_post_cards(posts):
+    """
+    Sets 'card_html' on each post of a page. Cached cards are read with
+    two cache round trips for the whole page (versions, then cards); only
+    the missing or stale ones are rendered and stored.
+    """
+    posts = list(posts)
+    if not posts:
+        return posts
+    version_keys = [card_version_key(post.pk) for post in posts]
+    versions = cache.get_many(version_keys)
+    # As with the feed versions, a missing stamp starts at the current
+    # time, so an evicted stamp cannot bring back an older card.
+    missing = {
+        key: time.time() for key in version_keys if key not in versions
+    }
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    keys = {
+        post.pk: card_cache_key(post, versions[card_version_key(post.pk)])
+        for post in posts
+    }
+    cards = cache.get_many(keys.values())
+    rendered = {}
+    with timing('cards'):
+        for post in posts:
+            key = keys[post.pk]
+            if key not in cards:
+                rendered[key] = cards[key] = render_to_string(
+                    CARD_TEMPLATE, {'blogpost': post}
+                )
+    if rendered:
+        cache.set_many(rendered, settings.BLOG_CARD_CACHE_TIMEOUT)
+    for post in posts:
+        post.card_html = mark_safe(cards[keys[post.pk]])
+    return posts
+
+
+def bump_card_versions(post_ids):
+    """
+    Makes the cached cards of the given posts stale.
+    """
+    version = time.time()
+    cache.set_many({card_version_key(pk): version for pk in post_ids}, None)
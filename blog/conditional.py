@@ -0,0 +1,66 @@
+# ---------------------
+# Standard Library Imports
+# ---------------------
+import hashlib
+from calendar import timegm
+
+# ---------------------
+# Django Imports
+# ---------------------
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+# ---------------------
+# Conditional GET
+# ---------------------
+# Views work out an ETag and a Last-Modified time from a few cheap values
+# (timestamps, counters, the viewer's id) before rendering anything. When
+# the browser or a proxy already holds that version, the view answers
+# 304 Not Modified and skips the template. The ETags are weak because the
+# CSRF token in the page's forms is masked differently on every render,
+# so two 200 responses for the same version are equivalent but not
+# byte-identical.
+
+
+class Validators:
+    """
+    The ETag and Last-Modified time of one version of a page.
+    'last_modified' is a datetime or None.
+    """
+
+    def __init__(self, *parts, last_modified=None):
+        digest = hashlib.sha1(
+            '|'.join(str(part) for part in parts).encode('utf-8')
+        ).hexdigest()
+        self.etag = 'W/' + quote_etag(digest)
+        self.last_modified = (
+            timegm(last_modified.utctimetuple()) if last_modified else None
+        )
+
+    def not_modified(self, request):
+        """
+        Returns a 304 (or 412) response if the request's conditional
+        headers match this version, otherwise None.
+        """
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        response = get_conditional_response(
+            request, etag=self.etag, last_modified=self.last_modified
+        )
+        if response is not None:
+            self.apply(response)
+        return response
+
+    def apply(self, response):
+        """
+        Adds the validators to a response. The pages depend on the viewer,
+        so shared caches may not store them, and browsers revalidate
+        before every reuse.
+        """
+        response.headers.setdefault('ETag', self.etag)
+        if self.last_modified is not None:
+            response.headers.setdefault(
+                'Last-Modified', http_date(self.last_modified)
+            )
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
@@ -0,0 +1,206 @@
+# ---------------------
+# Standard Library Imports
+# ---------------------
+import html
+import re
+
+# ---------------------
+# Django Imports
+# ---------------------
+from django.utils.html import strip_tags
+
+# ---------------------
+# Dutch Text Helpers
+# ---------------------
+# Small, dependency free helpers for turning Summernote HTML into plain
+# Dutch text, splitting it into words and reducing words to their stem.
+# The stemmer follows the Snowball Dutch algorithm, so 'boeken', 'boek'
+# and 'boekje' style variants end up on the same index term.
+
+WORD_RE = re.compile(r"[^\W\d_]+(?:['’-][^\W\d_]+)*", re.UNICODE)
+
+VOWELS = 'aeiouyè'
+
+ACCENTS = str.maketrans('äëïöüáéíóú', 'aeiouaeiou')
+
+
+def html_to_text(value):
+    """
+    Strips the HTML tags and entities from a Summernote body and
+    collapses the whitespace that is left behind.
+    """
+    text = html.unescape(strip_tags(value or ''))
+    return ' '.join(text.split())
+
+
+def tokenize(text):
+    """
+    Splits plain text into lower-cased words. Numbers and punctuation
+    are dropped; apostrophes and hyphens inside a word are kept so
+    words like "auto's" stay together.
+    """
+    return [match.group(0).lower() for match in WORD_RE.finditer(text)]
+
+
+def _is_vowel(char):
+    return char in VOWELS
+
+
+def _regions(word):
+    """
+    Returns the start of the Snowball R1 and R2 regions. R1 is adjusted
+    so that at least three letters come before it.
+    """
+    def next_region(start):
+        for i in range(start + 1, len(word)):
+            if not _is_vowel(word[i]) and _is_vowel(word[i - 1]):
+                return i + 1
+        return len(word)
+
+    r1 = max(next_region(0), 3)
+    r2 = next_region(r1)
+    return r1, r2
+
+
+def _undouble(word):
+    if word.endswith(('kk', 'dd', 'tt')):
+        return word[:-1]
+    return word
+
+
+def _valid_en_ending(word):
+    return bool(word) and not _is_vowel(word[-1]) \
+        and not word.endswith('gem')
+
+
+def _valid_s_ending(word):
+    return bool(word) and not _is_vowel(word[-1]) and word[-1] != 'j'
+
+
+def _mark_y_and_i(word):
+    chars = list(word)
+    for i, char in enumerate(chars):
+        if char == 'y' and (i == 0 or _is_vowel(chars[i - 1])):
+            chars[i] = 'Y'
+        elif (char == 'i' and 0 < i < len(chars) - 1
+              and _is_vowel(chars[i - 1]) and _is_vowel(chars[i + 1])):
+            chars[i] = 'I'
+    return ''.join(chars)
+
+
+def _strip_en(word, r1):
+    for suffix in ('ene', 'en'):
+        if word.endswith(suffix) and len(word) - len(suffix) >= r1:
+            stem = word[:-len(suffix)]
+            if _valid_en_ending(stem):
+                return _undouble(stem)
+            return word
+    return word
+
+
+def stem(word):
+    """
+    Reduces a single lower-cased Dutch word to its Snowball stem.
+    """
+    word = word.translate(ACCENTS)
+    if len(word) <= 2:
+        return word
+    word = _mark_y_and_i(word)
+    r1, r2 = _regions(word)
+
+    # Step 1: plural and inflection endings
+    if word.endswith('heden') and len(word) - 5 >= r1:
+        word = word[:-5] + 'heid'
+    elif word.endswith(('ene', 'en')):
+        word = _strip_en(word, r1)
+    elif word.endswith(('se', 's')):
+        suffix = 'se' if word.endswith('se') else 's'
+        stem_ = word[:-len(suffix)]
+        if len(stem_) >= r1 and _valid_s_ending(stem_):
+            word = stem_
+
+    # Step 2: a trailing 'e' after a consonant
+    e_found = False
+    if word.endswith('e') and len(word) - 1 >= r1 \
+            and len(word) > 1 and not _is_vowel(word[-2]):
+        word = _undouble(word[:-1])
+        e_found = True
+
+    # Step 3a: 'heid'
+    if word.endswith('heid') and len(word) - 4 >= r2 \
+            and not word[:-4].endswith('c'):
+        word = _strip_en(word[:-4], r1)
+
+    # Step 3b: derivational suffixes
+    if word.endswith(('end', 'ing')) and len(word) - 3 >= r2:
+        word = word[:-3]
+        if word.endswith('ig') and len(word) - 2 >= r2 \
+                and not word[:-2].endswith('e'):
+            word = word[:-2]
+        else:
+            word = _undouble(word)
+    elif word.endswith('ig') and len(word) - 2 >= r2 \
+            and not word[:-2].endswith('e'):
+        word = word[:-2]
+    elif word.endswith('lijk') and len(word) - 4 >= r2:
+        word = word[:-4]
+        if word.endswith('e') and len(word) - 1 >= r1 \
+                and len(word) > 1 and not _is_vowel(word[-2]):
+            word = _undouble(word[:-1])
+    elif word.endswith('baar') and len(word) - 4 >= r2:
+        word = word[:-4]
+    elif word.endswith('bar') and len(word) - 3 >= r2 and e_found:
+        word = word[:-3]
+
+    # Step 4: undouble a long vowel in a closing syllable (maan -> man)
+    if len(word) >= 4:
+        c, v1, v2, d = word[-4], word[-3], word[-2], word[-1]
+        if (not _is_vowel(c) and v1 == v2 and v1 in 'aeou'
+                and not _is_vowel(d) and d != 'I'):
+            word = word[:-2] + d
+
+    return word.replace('Y', 'y').replace('I', 'i')
+
+
+def stem_text(text):
+    """
+    Tokenizes plain text and returns the stems joined by spaces.
+    """
+    return ' '.join(stem(token) for token in tokenize(text))
+
+
+# ---------------------
+# Frequent Dutch Words
+# ---------------------
+# About three hundred of the most frequent words of everyday Dutch, with
+# their common verb forms. blog/vocabulary.py measures how much of a text
+# they cover: beginner texts are made almost only of these words, while
+# advanced texts lean on rarer vocabulary.
+FREQUENT_WORDS = (
+    'de het een en van ik te dat die in is niet je op wat met zijn voor '
+    'maar er hij ze dit als om naar ook nog al bij kan uit zo dan was '
+    'aan heb wel hebben we jij moet hier mijn me hem wil geen u nu daar '
+    'heeft goed waar zal kom weet mij hoe haar jullie doen gaan of nee '
+    'ja ben zou zei iets door worden over tot alles ons hun gaat wordt '
+    'werd mag laat zich meer iemand hebt weer niets moeten kunnen waren '
+    'veel had toch want omdat dus toen kunt komen zien zeggen doe deze '
+    'wie waarom kijk misschien gewoon altijd niemand zonder zeker onze '
+    'jouw andere zelf tegen echt alleen terug even één twee drie vier '
+    'vijf zes tien honderd jaar dag dagen week tijd keer man vrouw kind '
+    'kinderen mensen mens huis leven wereld land stad water hand hoofd '
+    'ogen naam vader moeder broer zus vriend vrienden werk school geld '
+    'eten boek film serie muziek taal woord woorden vraag antwoord deel '
+    'manier plaats kant einde begin groot klein nieuw oud lang kort '
+    'mooi goede grote kleine hele heel eerste laatste beter best graag '
+    'snel samen binnen buiten boven onder achter na sinds tijdens '
+    'vandaag morgen gisteren nooit vaak soms steeds meteen later vroeg '
+    'eens ieder elke iedereen alle beide welke zulke ga ging gingen '
+    'kwam kwamen komt zag zie ziet maakt maken maakte vind vindt vond '
+    'denk denkt dacht zeg zegt krijg krijgt kreeg geef geeft gaf neem '
+    'neemt nam staat stond zit zat ligt lag loop loopt liep houd houdt '
+    'hield blijf blijft bleef lees leest las schrijf schrijft schreef '
+    'praat spreek spreekt hoor hoort hoorde leer leert leerde ken kent '
+    'kende wonen woont woonde werken werkt werkte spelen speelt speelde '
+    'kopen koopt kocht nederlands nederland engels amsterdam hallo dank '
+    'bedankt alsjeblieft'
+).split()
@@ -0,0 +1,68 @@
+# ---------------------
+# Django Imports
+# ---------------------
+from django.db.models import CharField, Value
+from .models import Blogpost
+
+# ---------------------
+# Per-User Engagement State
+# ---------------------
+# Listing pages show whether the viewer liked or bookmarked each post.
+# Instead of asking per card, the state of a whole page is read with one
+# query over both through tables (UNION of likes and bookmarks, limited
+# to the user and the page's post ids), so the cost stays constant
+# however many cards a page shows.
+
+
+class EngagementState:
+    """
+    The viewer's liked and bookmarked post ids for one page.
+    """
+
+    def __init__(self, liked_ids=(), bookmarked_ids=()):
+        self.liked_ids = set(liked_ids)
+        self.bookmarked_ids = set(bookmarked_ids)
+
+    def is_liked(self, post_id):
+        return post_id in self.liked_ids
+
+    def is_bookmarked(self, post_id):
+        return post_id in self.bookmarked_ids
+
+
+def resolve_engagement(user, post_ids):
+    """
+    Returns the EngagementState of 'user' for the given post ids.
+    Anonymous users and empty pages cost no query.
+    """
+    post_ids = list(post_ids)
+    if not user.is_authenticated or not post_ids:
+        return EngagementState()
+    rows = {}
+    for kind, m2m_name in (('like', 'likes'), ('bookmark', 'bookmarks')):
+        through = getattr(Blogpost, m2m_name).through
+        rows[kind] = through.objects.filter(
+            user_id=user.pk, blogpost_id__in=post_ids
+        ).annotate(
+            kind=Value(kind, output_field=CharField())
+        ).values_list('blogpost_id', 'kind').order_by()
+    state = EngagementState()
+    for post_id, kind in rows['like'].union(rows['bookmark'], all=True):
+        if kind == 'like':
+            state.liked_ids.add(post_id)
+        else:
+            state.bookmarked_ids.add(post_id)
+    return state
+
+
+def attach_engagement(posts, user):
+    """
+    Sets 'is_liked' and 'is_bookmarked' on each post of a page so
+    templates can read them directly. Returns the EngagementState.
+    """
+    posts = list(posts)
+    state = resolve_engagement(user, [post.pk for post in posts])
+    for post in posts:
+        post.is_liked = state.is_liked(post.pk)
+        post.is_bookmarked = state.is_bookmarked(post.pk)
+    return state
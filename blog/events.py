@@ -0,0 +1,282 @@
+# ---------------------
+# Standard Library Imports
+# ---------------------
+import atexit
+import logging
+import os
+import threading
+from collections import Counter
+from datetime import timedelta
+from functools import partial
+
+# ---------------------
+# Django Imports
+# ---------------------
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connections, \
+    transaction
+from django.db.models import Max
+from django.utils import timezone
+from .models import DailyEngagement, EngagementEvent, EngagementRollup, \
+    EVENT_KINDS
+
+logger = logging.getLogger(__name__)
+
+# ---------------------
+# Engagement Event Log
+# ---------------------
+# Likes, bookmarks and comments are appended to an EngagementEvent log
+# for analytics. The request only adds the event to an in-process buffer
+# (after its transaction commits); a background thread per worker process
+# writes the buffer with one bulk INSERT when it holds
+# BLOG_EVENT_FLUSH_SIZE events or BLOG_EVENT_FLUSH_INTERVAL seconds have
+# passed, whichever comes first. The thread is started on the first event
+# in each process, so gunicorn workers forked from a preloaded master get
+# their own, and whatever is still buffered is written when the worker
+# exits (see gunicorn.conf.py and the atexit hook below).
+#
+# The buffer is bounded by BLOG_EVENT_BUFFER_LIMIT: while the database is
+# unreachable, failed batches are kept for the next flush and events past
+# the limit are dropped and counted, rather than growing without end.
+#
+# rollup_events() folds new log rows into per post and day totals
+# (DailyEngagement) in insert order, picking up from the last event id
+# it counted.
+
+EVENT_CODES = {name: code for code, name in EVENT_KINDS}
+ROLLUP_COLUMNS = {
+    1: 'likes', 2: 'unlikes', 3: 'bookmarks', 4: 'unbookmarks',
+    5: 'comments',
+}
+DAILY_ROLLUP = 'daily'
+
+
+class EventBuffer:
+    """
+    Process-wide buffer of unsaved EngagementEvents and the thread that
+    flushes it.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.events = []
+        self.flushed = 0
+        self.dropped = 0
+        self.failures = 0
+
+    def append(self, kind, blogpost_id, user_id=None, when=None):
+        event = EngagementEvent(
+            kind=EVENT_CODES[kind], blogpost_id=blogpost_id,
+            user_id=user_id, created_on=when or timezone.now(),
+        )
+        with self.lock:
+            if len(self.events) >= settings.BLOG_EVENT_BUFFER_LIMIT:
+                self.dropped += 1
+                return
+            self.events.append(event)
+            full = len(self.events) >= settings.BLOG_EVENT_FLUSH_SIZE
+        if not settings.BLOG_EVENT_BACKGROUND_FLUSH:
+            if full:
+                self.flush()
+            return
+        self.start()
+        if full:
+            self.wake.set()
+
+    def start(self):
+        if self.thread is not None or self.stopped.is_set():
+            return
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(
+                target=self.run, name='engagement-event-flusher', daemon=True
+            )
+            self.thread.start()
+
+    def run(self):
+        try:
+            while not self.stopped.is_set():
+                self.wake.wait(settings.BLOG_EVENT_FLUSH_INTERVAL)
+                self.wake.clear()
+                # The thread keeps its own connection between flushes;
+                # drop it once it is past CONN_MAX_AGE or broken
+                close_old_connections()
+                self.flush()
+        finally:
+            connections.close_all()
+
+    def flush(self):
+        """
+        Writes every buffered event. Returns the number written.
+        """
+        with self.flush_lock:
+            with self.lock:
+                events, self.events = self.events, []
+            if not events:
+                return 0
+            try:
+                self.write(events)
+            except DatabaseError:
+                logger.exception(
+                    'Could not write %d engagement event(s)', len(events)
+                )
+                with self.lock:
+                    self.failures += 1
+                    room = settings.BLOG_EVENT_BUFFER_LIMIT - len(self.events)
+                    self.dropped += max(0, len(events) - room)
+                    self.events[:0] = events[:max(0, room)]
+                return 0
+            with self.lock:
+                self.flushed += len(events)
+            return len(events)
+
+    def write(self, events):
+        EngagementEvent.objects.bulk_create(
+            events, batch_size=settings.BLOG_EVENT_FLUSH_SIZE
+        )
+
+    def stop(self, timeout=5):
+        """
+        Stops the flusher thread and writes what is left in the buffer.
+        """
+        self.stopped.set()
+        self.wake.set()
+        thread = self.thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+        return self.flush()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'buffered': len(self.events),
+                'flushed': self.flushed,
+                'dropped': self.dropped,
+                'failures': self.failures,
+                'flusher_running': bool(
+                    self.thread and self.thread.is_alive()
+                ),
+            }
+
+
+event_buffer = EventBuffer()
+
+# A forked child (a gunicorn worker) must not inherit the parent's
+# buffered events, locks or the handle of a thread it does not have.
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=event_buffer.reset)
+
+
+@atexit.register
+def shutdown_events():
+    """
+    Flushes the buffer when the process exits.
+    """
+    try:
+        return event_buffer.stop()
+    except Exception:
+        logger.exception('Could not flush engagement events on exit')
+        return 0
+
+
+def record_event(kind, blogpost_id, user_id=None):
+    """
+    Buffers one 'like', 'unlike', 'bookmark', 'unbookmark' or 'comment'
+    event once the current transaction has committed.
+    """
+    transaction.on_commit(partial(
+        event_buffer.append, kind, blogpost_id, user_id, timezone.now()
+    ))
+
+
+# ---------------------
+# Daily Rollup
+# ---------------------
+def rollup_events(lag=None, batch_size=5000):
+    """
+    Adds the events logged since the last rollup to DailyEngagement, in
+    insert (id) order. Each run notes the highest event id written so
+    far; a later run counts up to that id once it was noted at least
+    'lag' seconds (default BLOG_EVENT_ROLLUP_LAG) ago, so a batch still
+    being written by another worker is not skipped. When an event
+    happened does not matter: one buffered for a while is counted after
+    it is inserted. Returns the number of events counted.
+    """
+    lag = settings.BLOG_EVENT_ROLLUP_LAG if lag is None else lag
+    total = 0
+    while True:
+        with transaction.atomic():
+            # Locking the checkpoint row runs concurrent rollups one by one
+            EngagementRollup.objects.get_or_create(name=DAILY_ROLLUP)
+            state = EngagementRollup.objects.select_for_update().get(
+                name=DAILY_ROLLUP
+            )
+            now = timezone.now()
+            if state.seen_on and \
+                    state.seen_on > now - timedelta(seconds=lag):
+                return total
+            rows = list(EngagementEvent.objects.filter(
+                pk__gt=state.last_event_id, pk__lte=state.seen_event_id
+            ).order_by('pk').values_list(
+                'pk', 'kind', 'blogpost_id', 'created_on'
+            )[:batch_size])
+            if rows:
+                add_daily_counts(rows)
+                state.last_event_id = rows[-1][0]
+                total += len(rows)
+            else:
+                # Everything noted is counted; note what was written since
+                seen_event_id = EngagementEvent.objects.aggregate(
+                    last=Max('pk')
+                )['last'] or state.last_event_id
+                if seen_event_id == state.last_event_id and state.seen_on:
+                    return total
+                state.seen_event_id, state.seen_on = seen_event_id, now
+            state.save(update_fields=[
+                'last_event_id', 'seen_event_id', 'seen_on', 'updated_on'
+            ])
+
+
+def add_daily_counts(rows):
+    counts = Counter(
+        (timezone.localdate(created_on), post_id, ROLLUP_COLUMNS[kind])
+        for _, kind, post_id, created_on in rows
+    )
+    keys = {(day, post_id) for day, post_id, _ in counts}
+    existing = {
+        (row.day, row.blogpost_id): row
+        for row in DailyEngagement.objects.filter(
+            day__in={day for day, _ in keys},
+            blogpost_id__in={post_id for _, post_id in keys},
+        )
+        if (row.day, row.blogpost_id) in keys
+    }
+    created = {}
+    for (day, post_id, column), count in counts.items():
+        row = existing.get((day, post_id)) or created.setdefault(
+            (day, post_id), DailyEngagement(day=day, blogpost_id=post_id)
+        )
+        setattr(row, column, getattr(row, column) + count)
+    DailyEngagement.objects.bulk_update(
+        existing.values(), list(ROLLUP_COLUMNS.values())
+    )
+    DailyEngagement.objects.bulk_create(created.values())
+
+
+def daily_engagement(post_id, days=30):
+    """
+    The last 'days' days of rolled up engagement of one post, oldest
+    first, from the (blogpost_id, day) index.
+    """
+    since = timezone.localdate() - timedelta(days=days - 1)
+    return list(DailyEngagement.objects.filter(
+        blogpost_id=post_id, day__gte=since
+    ).order_by('day'))
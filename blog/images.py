@@ -0,0 +1,215 @@
+# ---------------------
+# Standard Library Imports
+# ---------------------
+import logging
+import posixpath
+from io import BytesIO
+
+# ---------------------
+# Django Imports
+# ---------------------
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.utils.module_loading import import_string
+from nederlearn.middleware import timing
+from .caching import image_variants_refreshed
+
+logger = logging.getLogger(__name__)
+
+# ---------------------
+# Responsive Image Variants
+# ---------------------
+# When a featured or profile image is uploaded, a set of resized JPEG and
+# WebP variants is produced and their URLs (plus ready-made srcset
+# strings) are stored on the model in a JSON field. Templates only read
+# that field, so no image URL is built while rendering a page.
+#
+# Two backends are available through settings.BLOG_IMAGE_BACKEND:
+# - 'cloudinary' builds Cloudinary transformation URLs; Cloudinary
+#   resizes and converts the image on its CDN, nothing is uploaded.
+# - 'local' opens the original from a Django storage with Pillow and
+#   writes the variants next to it. This is the filesystem stand-in used
+#   in development and in the tests.
+
+# Widths (in pixels) generated for each kind of image.
+IMAGE_WIDTHS = {
+    'featured': (320, 640, 1024),
+    'profile': (96, 192),
+}
+
+FORMATS = {'jpg': 'JPEG', 'webp': 'WEBP'}
+
+
+def is_placeholder(source):
+    return not source or 'placeholder' in source
+
+
+def source_name(image):
+    """
+    Returns the stored database value of a CloudinaryField, which changes
+    whenever a new image is uploaded.
+    """
+    if not image:
+        return ''
+    if hasattr(image, 'get_prep_value'):
+        return image.get_prep_value()
+    return str(image)
+
+
+def build_srcset(urls):
+    return ', '.join(f'{url} {width}w' for width, url in urls)
+
+
+def make_variants(source, urls):
+    """
+    Turns {format: [(width, url), ...]} into the dict stored on the model.
+    """
+    jpg, webp = urls['jpg'], urls['webp']
+    return {
+        'source': source,
+        'src': jpg[-1][1],
+        'thumbnail': jpg[0][1],
+        'srcset': build_srcset(jpg),
+        'webp_srcset': build_srcset(webp),
+    }
+
+
+class CloudinaryImageBackend:
+
+    def build(self, image, kind):
+        urls = {
+            extension: [
+                (width, image.build_url(
+                    width=width, crop='limit', quality='auto',
+                    format=extension, secure=True,
+                ))
+                for width in IMAGE_WIDTHS[kind]
+            ]
+            for extension in FORMATS
+        }
+        return make_variants(source_name(image), urls)
+
+
+class LocalImageBackend:
+
+    def __init__(self, storage=None):
+        self.storage = storage or get_image_storage()
+
+    def original_name(self, image):
+        public_id = getattr(image, 'public_id', None) or str(image)
+        image_format = getattr(image, 'format', None)
+        return f'{public_id}.{image_format}' if image_format else public_id
+
+    def build(self, image, kind):
+        try:
+            from PIL import Image
+        except ImportError:
+            raise ImproperlyConfigured(
+                "The 'local' image backend needs Pillow installed."
+            )
+        name = self.original_name(image)
+        with self.storage.open(name, 'rb') as original:
+            picture = Image.open(original)
+            picture.load()
+        if picture.mode not in ('RGB', 'L'):
+            picture = picture.convert('RGB')
+
+        stem = posixpath.join('variants', kind, posixpath.splitext(name)[0])
+        # Never upscale: widths above the original are dropped, but the
+        # smallest one is always produced.
+        widths = [w for w in IMAGE_WIDTHS[kind] if w <= picture.width]
+        widths = widths or [picture.width]
+        urls = {extension: [] for extension in FORMATS}
+        for width in widths:
+            height = round(picture.height * width / picture.width)
+            resized = picture.resize((width, height), Image.LANCZOS)
+            for extension, pil_format in FORMATS.items():
+                buffer = BytesIO()
+                resized.save(buffer, pil_format, quality=82)
+                saved = self.storage.save(
+                    f'{stem}-{width}.{extension}',
+                    ContentFile(buffer.getvalue())
+                )
+                urls[extension].append((width, self.storage.url(saved)))
+        return make_variants(source_name(image), urls)
+
+
+BACKENDS = {
+    'cloudinary': CloudinaryImageBackend,
+    'local': LocalImageBackend,
+}
+
+
+def get_image_storage():
+    storage = getattr(settings, 'BLOG_IMAGE_STORAGE', None)
+    if storage:
+        return import_string(storage)()
+    return FileSystemStorage()
+
+
+def get_backend():
+    try:
+        return BACKENDS[settings.BLOG_IMAGE_BACKEND]()
+    except KeyError:
+        raise ImproperlyConfigured(
+            f'Unknown BLOG_IMAGE_BACKEND {settings.BLOG_IMAGE_BACKEND!r}.'
+        )
+
+
+# ---------------------
+# Public API
+# ---------------------
+def build_variants(image, kind):
+    """
+    Returns the variants dict for an image. Placeholders and images that
+    cannot be processed only record their source, so templates fall back
+    to the placeholder or the original URL.
+    """
+    source = source_name(image)
+    if is_placeholder(source):
+        return {'source': source}
+    try:
+        with timing('images'):
+            return get_backend().build(image, kind)
+    except (OSError, ValueError) as error:
+        logger.warning('Could not build variants for %s: %s', source, error)
+        return {'source': source}
+
+
+def current_image(instance, image_field):
+    # A value assigned as a plain string is parsed into a resource first
+    field = instance._meta.get_field(image_field)
+    return field.to_python(getattr(instance, image_field))
+
+
+def variants_outdated(instance, image_field, variants_field):
+    """
+    True when the stored variants were not built from the current image.
+    """
+    current = getattr(instance, variants_field) or {}
+    return current.get('source') != source_name(
+        current_image(instance, image_field)
+    )
+
+
+def refresh_variants(instance, image_field, variants_field, kind,
+                     force=False):
+    """
+    Rebuilds the stored variants when the image has changed since they
+    were last built. The new value is written with update(), so no
+    further save signals fire; image_variants_refreshed is sent instead.
+    Returns True if the variants were rebuilt.
+    """
+    image = current_image(instance, image_field)
+    if not force and not variants_outdated(
+            instance, image_field, variants_field):
+        return False
+    variants = build_variants(image, kind)
+    type(instance).objects.filter(pk=instance.pk).update(
+        **{variants_field: variants}
+    )
+    setattr(instance, variants_field, variants)
+    image_variants_refreshed.send(sender=type(instance), instance=instance)
+    return True
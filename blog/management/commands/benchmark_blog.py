@@ -0,0 +1,90 @@
+# ---------------------
+# Django Imports
+# ---------------------
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from blog.benchmark import Benchmark, compare, load_baseline, save_baseline
+
+# ---------------------
+# Benchmark Blog Command
+# ---------------------
+# Runs the HTTP benchmark in blog/benchmark.py against the current
+# database (seed it first with seed_blog). Results can be saved as a JSON
+# baseline and compared with an earlier one. Note that the 'like'
+# scenario toggles likes on the most liked posts.
+#
+# --conn-max-age overrides the connection lifetime for the run, so the
+# connection setup overhead can be compared, e.g. a baseline saved with
+# --conn-max-age 0 against a run with --conn-max-age 60.
+class Command(BaseCommand):
+    help = 'Benchmark the home, category, detail, like and search endpoints.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument(
+            '--scenario', action='append', dest='scenarios',
+            help='Only run the named scenario (can be repeated).'
+        )
+        parser.add_argument(
+            '--user', help='Username to log in as (default: first user).'
+        )
+        parser.add_argument(
+            '--conn-max-age', type=int,
+            help='CONN_MAX_AGE to use for the run (0 reconnects on every '
+                 'request).'
+        )
+        parser.add_argument('--save', help='Write the results to this file.')
+        parser.add_argument(
+            '--compare', help='Baseline file to compare the results with.'
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('pk')
+        if options['user']:
+            users = users.filter(username=options['user'])
+        user = users.first()
+        if user is None:
+            raise CommandError('No user to log in as; run seed_blog first.')
+
+        if options['conn_max_age'] is not None:
+            connection.close()
+            connection.settings_dict['CONN_MAX_AGE'] = options['conn_max_age']
+
+        benchmark = Benchmark(user, options['iterations'], options['warmup'])
+        # The test client sends requests for 'testserver'
+        with override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            try:
+                results = benchmark.run(options['scenarios'])
+            except ValueError as error:
+                raise CommandError(str(error))
+
+        self.stdout.write(
+            f"{'scenario':<10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+            f"{'req/s':>9}{'queries':>9}{'conns':>9}"
+        )
+        for name, stats in results['scenarios'].items():
+            self.stdout.write(
+                f"{name:<10}{stats['p50_ms']:>9}{stats['p95_ms']:>9}"
+                f"{stats['p99_ms']:>9}{stats['throughput_rps']:>9}"
+                f"{stats['queries_per_request']:>9}"
+                f"{stats['connections_per_request']:>9}"
+            )
+
+        if options['compare']:
+            self.stdout.write('\nChange against ' + options['compare'])
+            for name, metric, old, new, change in compare(
+                    load_baseline(options['compare']), results):
+                self.stdout.write(
+                    f'{name:<10}{metric:<24}{old:>9} -> {new:<9}'
+                    f'({change:+.1f}%)'
+                )
+        if options['save']:
+            save_baseline(options['save'], results)
+            self.stdout.write(self.style.SUCCESS(
+                f"Saved results to {options['save']}."
+            ))
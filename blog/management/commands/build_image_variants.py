@@ -0,0 +1,42 @@
+# ---------------------
+# Django Imports
+# ---------------------
+from django.core.management.base import BaseCommand
+from blog.images import refresh_variants
+from blog.models import Blogpost, UserProfile
+
+# ---------------------
+# Build Image Variants Command
+# ---------------------
+# Builds the stored responsive image variants for existing blogposts and
+# user profiles, e.g. after switching BLOG_IMAGE_BACKEND. Only images
+# that changed since their variants were built are processed unless
+# --force is given.
+class Command(BaseCommand):
+    help = 'Build responsive image variants for featured and profile images.'
+
+    TARGETS = (
+        (Blogpost, 'featured_image', 'featured_image_variants', 'featured'),
+        (UserProfile, 'profile_image', 'profile_image_variants', 'profile'),
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Rebuild variants even if the image has not changed.'
+        )
+
+    def handle(self, *args, **options):
+        for model, image_field, variants_field, kind in self.TARGETS:
+            rebuilt = 0
+            queryset = model.objects.only(
+                'pk', image_field, variants_field
+            ).order_by('pk')
+            for instance in queryset.iterator(chunk_size=200):
+                rebuilt += refresh_variants(
+                    instance, image_field, variants_field, kind,
+                    force=options['force']
+                )
+            self.stdout.write(self.style.SUCCESS(
+                f'Rebuilt {rebuilt} {model._meta.verbose_name} image(s).'
+            ))
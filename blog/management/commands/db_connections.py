@@ -0,0 +1,39 @@
+# ---------------------
+# Django Imports
+# ---------------------
+from django.core.management.base import BaseCommand
+from nederlearn.dbconnections import connection_settings, \
+    install_connection_metrics, measure_connection_overhead, metrics
+
+# ---------------------
+# DB Connections Command
+# ---------------------
+# Shows how the default database connection is configured and measures
+# what a new connection costs compared with reusing an open one. The
+# counters of a running worker are served at /internal/db-connections/;
+# the ones printed here belong to this command's own process.
+class Command(BaseCommand):
+    help = 'Show database connection settings and connection setup cost.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rounds', type=int, default=50,
+            help='Queries to time on new and on reused connections.'
+        )
+
+    def handle(self, *args, **options):
+        install_connection_metrics()
+        for name, value in connection_settings().items():
+            self.stdout.write(f'{name:<22}{value}')
+
+        overhead = measure_connection_overhead(options['rounds'])
+        self.stdout.write(
+            f"\nSELECT 1 on a new connection:   "
+            f"{overhead['new_connection_ms']} ms"
+        )
+        self.stdout.write(
+            f"SELECT 1 on a reused connection: {overhead['reused_ms']} ms"
+        )
+        self.stdout.write('')
+        for name, value in metrics.snapshot().items():
+            self.stdout.write(f'{name:<22}{value}')
@@ -0,0 +1,35 @@
+# ---------------------
+# Standard Library Imports
+# ---------------------
+import sys
+
+# ---------------------
+# Django Imports
+# ---------------------
+from django.core.management.base import BaseCommand
+from blog.transfer import export_jsonl, open_stream
+
+# ---------------------
+# Export Blog Command
+# ---------------------
+# Streams all media categories, blogposts, comments, likes and bookmarks
+# to a JSON Lines file ('-' for stdout, '.gz' to compress).
+class Command(BaseCommand):
+    help = 'Export blog content as streaming JSON Lines.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="Output file, or '-' for stdout.")
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Rows fetched from the database per round trip.'
+        )
+
+    def handle(self, *args, **options):
+        if options['output'] == '-':
+            export_jsonl(sys.stdout, options['chunk_size'])
+            return
+        with open_stream(options['output'], 'w') as stream:
+            total = export_jsonl(stream, options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {total} record(s) to {options['output']}."
+        ))
@@ -0,0 +1,61 @@
+# ---------------------
+# Django Imports
+# ---------------------
+from django.core.management.base import BaseCommand, CommandError
+from blog.transfer import CheckpointExists, JsonlImporter, open_stream
+
+# ---------------------
+# Import Blog Command
+# ---------------------
+# Loads a JSON Lines dump written by export_blog in batches. A checkpoint
+# file is updated after every committed batch; run again with --resume to
+# carry on after an interruption. While a checkpoint is there, a run
+# without --resume is refused rather than importing everything again.
+class Command(BaseCommand):
+    help = 'Import blog content from a JSON Lines dump.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='JSON Lines file to import.')
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Records written per transaction.'
+        )
+        parser.add_argument(
+            '--on-conflict', choices=('skip', 'rename'), default='skip',
+            help='What to do with posts whose slug or title already exists.'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Checkpoint file (default: <input>.checkpoint).'
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Continue from the last checkpoint.'
+        )
+
+    def handle(self, *args, **options):
+        importer = JsonlImporter(
+            batch_size=options['batch_size'],
+            on_conflict=options['on_conflict'],
+            checkpoint_path=(
+                options['checkpoint'] or options['input'] + '.checkpoint'
+            ),
+        )
+        try:
+            with open_stream(options['input'], 'r') as stream:
+                counts = importer.run(stream, resume=options['resume'])
+        except CheckpointExists as error:
+            raise CommandError(
+                f'{error}. Run again with --resume to continue it, or '
+                f'delete the checkpoint to start over.'
+            )
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(
+                f'Import stopped after line {importer.line}: {error}. '
+                f'Run again with --resume to continue.'
+            )
+        for record_type, total in sorted(counts.items()):
+            self.stdout.write(f'{record_type}: {total} imported')
+        if options['on_conflict'] == 'rename' and importer.renamed:
+            self.stdout.write(f'{len(importer.renamed)} post(s) renamed.')
+        self.stdout.write(self.style.SUCCESS('Import finished.'))
@@ -0,0 +1,28 @@
+# ---------------------
+# Django Imports
+# ---------------------
+from django.core.management.base import BaseCommand
+from blog.models import PersonalFeed
+from blog.personal_feed import build_feed, prune_inactive_feeds
+
+# ---------------------
+# Rebuild Personal Feeds Command
+# ---------------------
+# Drops the personal feeds of users who have been away longer than
+# BLOG_PERSONAL_FEED_ACTIVE_DAYS, which are built again when they return,
+# and rebuilds the others from their users' current likes, bookmarks and
+# profiles, e.g. nightly or after changing the feed weights.
+class Command(BaseCommand):
+    help = 'Prune inactive personal feeds and rebuild the active ones.'
+
+    def handle(self, *args, **options):
+        pruned = prune_inactive_feeds()
+        user_ids = list(PersonalFeed.objects.values_list(
+            'user_id', flat=True
+        ).order_by('user_id'))
+        for user_id in user_ids:
+            build_feed(user_id)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {len(user_ids)} personal feed(s), dropped {pruned} '
+            f'inactive one(s).'
+        ))
@@ -0,0 +1,23 @@
+# ---------------------
+# Django Imports
+# ---------------------
+from django.core.management.base import BaseCommand
+from blog.search import rebuild_index
+
+# ---------------------
+# Rebuild Search Index Command
+# ---------------------
+# Clears the blogpost full-text index and fills it again from the
+# published posts, in batches.
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for published blogposts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of posts indexed per batch.'
+        )
+
+    def handle(self, *args, **options):
+        total = rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} blogpost(s).'))
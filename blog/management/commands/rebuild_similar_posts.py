@@ -0,0 +1,36 @@
+# ---------------------
+# Django Imports
+# ---------------------
+from django.core.management.base import BaseCommand
+from blog.caching import invalidate_detail
+from blog.models import Blogpost
+from blog.similarity import rebuild_similar_posts, sparse
+
+# ---------------------
+# Rebuild Similar Posts Command
+# ---------------------
+# Recomputes the similar posts of every published post. Saved posts are
+# refreshed one by one by the task queue, but likes and the word
+# statistics of the whole corpus drift, so this is meant to run nightly.
+# It needs the vocabulary index (rebuild_vocabulary) to be in place.
+class Command(BaseCommand):
+    help = 'Rebuild the similar posts of every published blogpost.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of posts whose lists are written per transaction.'
+        )
+        parser.add_argument(
+            '--no-sparse', action='store_true',
+            help='Score in plain Python even if SciPy is installed.'
+        )
+
+    def handle(self, *args, **options):
+        vectorized = sparse is not None and not options['no_sparse']
+        total = rebuild_similar_posts(vectorized, options['batch_size'])
+        invalidate_detail(*Blogpost.objects.values_list('pk', flat=True))
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt the similar posts of {total} blogpost(s)"
+            f"{' with SciPy' if vectorized else ''}."
+        ))
@@ -0,0 +1,28 @@
+# ---------------------
+# Django Imports
+# ---------------------
+from django.core.management.base import BaseCommand
+from blog.caching import bump_all_feeds
+from blog.trending import refresh_scores
+
+# ---------------------
+# Rebuild Trending Command
+# ---------------------
+# Recomputes every blogpost's hot score from the likes, bookmarks and
+# approved comments tables, e.g. after changing the trending weights or
+# half-life, or after loading data with bulk inserts.
+class Command(BaseCommand):
+    help = 'Rebuild the trending hot score of every blogpost.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of posts written per UPDATE batch.'
+        )
+
+    def handle(self, *args, **options):
+        total = refresh_scores(batch_size=options['batch_size'])
+        bump_all_feeds()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt the hot score of {total} blogpost(s).'
+        ))
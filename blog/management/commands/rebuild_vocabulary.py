@@ -0,0 +1,33 @@
+# ---------------------
+# Django Imports
+# ---------------------
+from django.core.management.base import BaseCommand
+from blog.vocabulary import numpy, rebuild_vocabulary
+
+# ---------------------
+# Rebuild Vocabulary Command
+# ---------------------
+# Re-analyzes the Dutch vocabulary of every blogpost: the word index
+# behind the "posts using a word" lookup and each post's word count,
+# reading time and level. Run it after the first deploy, after bulk
+# imports, or after changing the frequent word list or level thresholds.
+class Command(BaseCommand):
+    help = 'Rebuild the Dutch vocabulary index and profile of every post.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of posts counted together.'
+        )
+        parser.add_argument(
+            '--no-numpy', action='store_true',
+            help='Count with plain Python even if NumPy is installed.'
+        )
+
+    def handle(self, *args, **options):
+        vectorized = numpy is not None and not options['no_numpy']
+        total = rebuild_vocabulary(options['batch_size'], vectorized)
+        self.stdout.write(self.style.SUCCESS(
+            f"Analyzed {total} blogpost(s)"
+            f"{' with NumPy' if vectorized else ''}."
+        ))
@@ -0,0 +1,59 @@
+# ---------------------
+# Django Imports
+# ---------------------
+from django.core.management.base import BaseCommand, CommandError
+from blog.caching import bump_all_feeds
+from blog.models import Blogpost, COUNTER_FIELDS, counter_subquery, \
+    sync_engagement_counts
+
+# ---------------------
+# Recount Engagement Command
+# ---------------------
+# Rebuilds the stored like/bookmark counters on Blogpost from the M2M
+# tables. With --check it only reports drift and exits with an error if
+# any counter is out of step, which makes it usable in CI or cron.
+class Command(BaseCommand):
+    help = 'Rebuild or verify Blogpost like_count and bookmark_count.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Report counters that are out of step without fixing them.'
+        )
+
+    def handle(self, *args, **options):
+        drift = self.find_drift()
+        for post_id, field, stored, actual in drift:
+            self.stdout.write(
+                f'Blogpost {post_id}: {field} is {stored}, expected {actual}'
+            )
+
+        if options['check']:
+            if drift:
+                raise CommandError(f'{len(drift)} counter(s) out of step.')
+            self.stdout.write(self.style.SUCCESS('All counters are correct.'))
+            return
+
+        updated = sync_engagement_counts()
+        if drift:
+            bump_all_feeds()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt counters for {updated} blogpost(s); '
+            f'{len(drift)} were out of step.'
+        ))
+
+    def find_drift(self):
+        annotations = {
+            f'actual_{field}': counter_subquery(m2m)
+            for field, m2m in COUNTER_FIELDS.items()
+        }
+        rows = Blogpost.objects.order_by().annotate(**annotations).values(
+            'pk', *COUNTER_FIELDS, *annotations
+        )
+        drift = []
+        for row in rows.iterator():
+            for field in COUNTER_FIELDS:
+                stored, actual = row[field], row[f'actual_{field}']
+                if stored != actual:
+                    drift.append((row['pk'], field, stored, actual))
+        return drift
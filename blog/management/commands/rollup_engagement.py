@@ -0,0 +1,33 @@
+# ---------------------
+# Django Imports
+# ---------------------
+from django.core.management.base import BaseCommand
+from blog.events import rollup_events
+
+# ---------------------
+# Rollup Engagement Command
+# ---------------------
+# Adds the engagement events logged since the previous run to the daily
+# per post totals. Meant to run every few minutes from a scheduler; each
+# run only reads the new part of the event log.
+class Command(BaseCommand):
+    help = 'Roll new engagement events up into daily per post totals.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Number of events counted per transaction.'
+        )
+        parser.add_argument(
+            '--lag', type=int, default=None,
+            help='Leave events inserted less than this many seconds ago '
+                 'for a later run (default: BLOG_EVENT_ROLLUP_LAG).'
+        )
+
+    def handle(self, *args, **options):
+        total = rollup_events(
+            lag=options['lag'], batch_size=options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Rolled up {total} engagement event(s).'
+        ))
@@ -0,0 +1,78 @@
+# ---------------------
+# Standard Library Imports
+# ---------------------
+import multiprocessing
+import signal
+
+# ---------------------
+# Django Imports
+# ---------------------
+from django.core.management.base import BaseCommand
+from django.db import connections
+from blog.taskqueue import Worker, requeue_stale, run_pending
+
+# ---------------------
+# Run Tasks Command
+# ---------------------
+# Runs the background task queue (blog/taskqueue.py). Each of the
+# --processes worker processes runs --threads threads, and every thread
+# takes one task at a time from the database. SIGINT or SIGTERM let the
+# running tasks finish, then stop the workers. With --once, the due tasks
+# are run in this process and the command exits, e.g. from cron.
+class Command(BaseCommand):
+    help = 'Run background tasks queued in the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help='Number of worker processes.'
+        )
+        parser.add_argument(
+            '--threads', type=int, default=1,
+            help='Number of worker threads in each process.'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Seconds an idle worker waits before looking again.'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Run the tasks that are due now, then exit.'
+        )
+
+    def handle(self, *args, **options):
+        if options['once']:
+            requeue_stale()
+            total = run_pending()
+            self.stdout.write(self.style.SUCCESS(f'Ran {total} task(s).'))
+            return
+
+        processes, threads = options['processes'], options['threads']
+        # Children are forked, so they must not share the parent's
+        # database connections
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        stop = context.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: stop.set())
+
+        def start():
+            return Worker(threads, options['poll_interval'], stop).run()
+
+        if processes == 1:
+            self.stdout.write(f'Running tasks on {threads} thread(s).')
+            start()
+        else:
+            self.stdout.write(
+                f'Running tasks in {processes} processes of {threads} '
+                f'thread(s).'
+            )
+            workers = [
+                context.Process(target=start, name=f'task-worker-{i}')
+                for i in range(processes)
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        self.stdout.write(self.style.SUCCESS('Task workers stopped.'))
@@ -0,0 +1,47 @@
+# ---------------------
+# Django Imports
+# ---------------------
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from blog.seeding import Seeder
+
+# ---------------------
+# Seed Blog Command
+# ---------------------
+# Fills the database with a synthetic, production-like data set for
+# benchmarking. Not meant for production databases.
+class Command(BaseCommand):
+    help = 'Generate synthetic users, posts, likes, bookmarks and comments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--likes', type=int, default=20000)
+        parser.add_argument('--bookmarks', type=int, default=5000)
+        parser.add_argument('--comments', type=int, default=5000)
+        parser.add_argument(
+            '--draft-ratio', type=float, default=0.1,
+            help='Share of posts created as drafts.'
+        )
+        parser.add_argument(
+            '--prefix', default='seed',
+            help='Prefix for generated usernames and slugs.'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=42,
+            help='Random seed, so runs can be reproduced.'
+        )
+
+    def handle(self, *args, **options):
+        seeder = Seeder(
+            users=options['users'], posts=options['posts'],
+            likes=options['likes'], bookmarks=options['bookmarks'],
+            comments=options['comments'],
+            draft_ratio=options['draft_ratio'],
+            prefix=options['prefix'], seed=options['seed'],
+        )
+        with transaction.atomic():
+            totals = seeder.run()
+        for name, total in totals.items():
+            self.stdout.write(f'{name}: {total}')
+        self.stdout.write(self.style.SUCCESS('Seeding finished.'))
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.1 on 2026-10-18 00:14
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_counters(apps, schema_editor):
+    Blogpost = apps.get_model('blog', 'Blogpost')
+    posts = Blogpost.objects.annotate(
+        n_likes=Count('likes', distinct=True),
+        n_bookmarks=Count('bookmarks', distinct=True),
+    ).only('pk')
+    for post in posts.iterator():
+        Blogpost.objects.filter(pk=post.pk).update(
+            like_count=post.n_likes, bookmark_count=post.n_bookmarks
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0002_rename_post_comment_blogpost_alter_blogpost_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='bookmark_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.1 on 2026-10-18 00:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_blogpost_engagement_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['status', 'created_on', 'id'], name='blogpost_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['media_category', 'status', 'created_on', 'id'], name='blogpost_category_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+from django.db import migrations
+
+# ---------------------
+# Full-text search tables
+# ---------------------
+# The search index lives outside the ORM because its shape depends on
+# the database: an FTS5 virtual table on SQLite and a tsvector column
+# with a GIN index on PostgreSQL. Other databases get no table and use
+# the icontains fallback in blog/search.py. Run
+# 'manage.py rebuild_search_index' after migrating to fill it.
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS blog_search_fts "
+    "USING fts5(blog_title, excerpt, body, tokenize='unicode61')",
+]
+SQLITE_BACKWARD = ["DROP TABLE IF EXISTS blog_search_fts"]
+
+POSTGRES_FORWARD = [
+    "CREATE TABLE IF NOT EXISTS blog_search_document ("
+    "blogpost_id bigint PRIMARY KEY "
+    "REFERENCES blog_blogpost (id) ON DELETE CASCADE "
+    "DEFERRABLE INITIALLY DEFERRED, "
+    "document tsvector NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS blog_search_document_gin "
+    "ON blog_search_document USING GIN (document)",
+]
+POSTGRES_BACKWARD = ["DROP TABLE IF EXISTS blog_search_document"]
+
+STATEMENTS = {
+    'sqlite': (SQLITE_FORWARD, SQLITE_BACKWARD),
+    'postgresql': (POSTGRES_FORWARD, POSTGRES_BACKWARD),
+}
+
+
+def create_search_tables(apps, schema_editor):
+    forward, _ = STATEMENTS.get(schema_editor.connection.vendor, ([], []))
+    for statement in forward:
+        schema_editor.execute(statement)
+
+
+def drop_search_tables(apps, schema_editor):
+    _, backward = STATEMENTS.get(schema_editor.connection.vendor, ([], []))
+    for statement in backward:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_blogpost_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_tables, drop_search_tables),
+    ]
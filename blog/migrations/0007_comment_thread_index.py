@@ -0,0 +1,17 @@
+# Generated by Django 4.2.1 on 2026-10-18 00:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['blogpost', 'approved', 'created_on'], name='comment_thread_idx'),
+        ),
+    ]
@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+# ---------------------
+# Timestamped likes and bookmarks
+# ---------------------
+# Blogpost.likes and Blogpost.bookmarks get explicit through models that
+# reuse the existing M2M tables, so no rows are copied. The switch is
+# state-only; the database only gains the created_on column (existing
+# rows get the migration time) and the per-user feed indexes.
+
+
+def engagement_model(name, table):
+    return migrations.CreateModel(
+        name=name,
+        fields=[
+            ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ('blogpost', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='blog.blogpost')),
+            ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+        ],
+        options={
+            'db_table': table,
+            'abstract': False,
+            'unique_together': {('blogpost', 'user')},
+        },
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('blog', '0007_comment_thread_index'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                engagement_model('Like', 'blog_blogpost_likes'),
+                engagement_model('Bookmark', 'blog_blogpost_bookmarks'),
+                migrations.AlterField(
+                    model_name='blogpost',
+                    name='likes',
+                    field=models.ManyToManyField(blank=True, related_name='blogpost_likes', through='blog.Like', to=settings.AUTH_USER_MODEL),
+                ),
+                migrations.AlterField(
+                    model_name='blogpost',
+                    name='bookmarks',
+                    field=models.ManyToManyField(blank=True, related_name='blogpost_bookmarks', through='blog.Bookmark', to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='like',
+            name='created_on',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='bookmark',
+            name='created_on',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['user', 'created_on', 'id'], name='like_user_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookmark',
+            index=models.Index(fields=['user', 'created_on', 'id'], name='bookmark_user_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.1 on 2026-10-18 00:41
+
+import math
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import migrations, models
+
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def backfill_hot_scores(apps, schema_editor):
+    # Same formula as blog/trending.py, on the historical models
+    Blogpost = apps.get_model('blog', 'Blogpost')
+    Like = apps.get_model('blog', 'Like')
+    Bookmark = apps.get_model('blog', 'Bookmark')
+    Comment = apps.get_model('blog', 'Comment')
+    rate = math.log(2) / (settings.BLOG_TRENDING_HALF_LIFE_HOURS * 3600)
+    weights = settings.BLOG_TRENDING_WEIGHTS
+
+    def term(kind, when):
+        return math.log(weights[kind]) + \
+            rate * (when - EPOCH).total_seconds()
+
+    scores = {
+        pk: term('post', created_on) for pk, created_on in
+        Blogpost.objects.values_list('pk', 'created_on').iterator()
+    }
+    for kind, rows in (('like', Like.objects.all()),
+                       ('bookmark', Bookmark.objects.all()),
+                       ('comment', Comment.objects.filter(approved=True))):
+        for post_id, created_on in rows.values_list(
+                'blogpost_id', 'created_on').iterator():
+            high, low = sorted((scores[post_id], term(kind, created_on)),
+                               reverse=True)
+            scores[post_id] = high + math.log1p(math.exp(low - high))
+    Blogpost.objects.bulk_update(
+        [Blogpost(pk=pk, hot_score=score) for pk, score in scores.items()],
+        ['hot_score'], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0009_admin_changelist_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='hot_score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['status', 'hot_score', 'id'], name='blogpost_trending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['media_category', 'status', 'hot_score', 'id'], name='blogpost_category_trending_idx'),
+        ),
+        migrations.RunPython(backfill_hot_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.1 on 2026-10-18 00:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_blogpost_hot_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EngagementEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.PositiveSmallIntegerField(choices=[(1, 'like'), (2, 'unlike'), (3, 'bookmark'), (4, 'unbookmark'), (5, 'comment')])),
+                ('blogpost_id', models.BigIntegerField()),
+                ('user_id', models.BigIntegerField(null=True)),
+                ('created_on', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EngagementRollup',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('last_event_id', models.BigIntegerField(default=0)),
+                ('updated_on', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyEngagement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('blogpost_id', models.BigIntegerField()),
+                ('likes', models.PositiveIntegerField(default=0)),
+                ('unlikes', models.PositiveIntegerField(default=0)),
+                ('bookmarks', models.PositiveIntegerField(default=0)),
+                ('unbookmarks', models.PositiveIntegerField(default=0)),
+                ('comments', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['blogpost_id', 'day'], name='daily_engagement_post_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyengagement',
+            constraint=models.UniqueConstraint(fields=('day', 'blogpost_id'), name='daily_engagement_unique'),
+        ),
+    ]
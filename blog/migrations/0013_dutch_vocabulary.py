@@ -0,0 +1,42 @@
+# Generated by Django 4.2.1 on 2026-10-18 00:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0012_task_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostVocabulary',
+            fields=[
+                ('blogpost', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='vocabulary', serialize=False, to='blog.blogpost')),
+                ('word_count', models.PositiveIntegerField(default=0)),
+                ('unique_lemmas', models.PositiveIntegerField(default=0)),
+                ('reading_minutes', models.FloatField(default=0)),
+                ('coverage', models.FloatField(default=0)),
+                ('level', models.CharField(choices=[('A1', 'A1'), ('A2', 'A2'), ('B1', 'B1'), ('B2', 'B2'), ('C1', 'C1'), ('C2', 'C2')], max_length=2)),
+                ('analyzed_on', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WordOccurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lemma', models.CharField(max_length=64)),
+                ('count', models.PositiveIntegerField()),
+                ('blogpost', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='word_occurrences', to='blog.blogpost')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['lemma', 'count', 'blogpost'], name='word_lookup_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='wordoccurrence',
+            constraint=models.UniqueConstraint(fields=('blogpost', 'lemma'), name='word_occurrence_unique'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.1 on 2026-10-18 01:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0015_personal_feed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='engagementrollup',
+            name='seen_event_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='engagementrollup',
+            name='seen_on',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.1 on 2026-10-18 01:36
+
+import blog.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0016_engagement_rollup_seen_event'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='blogpost',
+            name='slug',
+            field=models.SlugField(max_length=200, unique=True, validators=[blog.models.validate_post_slug]),
+        ),
+    ]
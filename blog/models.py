@@ -1,4 +1,7 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models.signals import m2m_changed
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from cloudinary.models import CloudinaryField
 from django.core.exceptions import ValidationError
@@ -23,6 +26,30 @@ def validate_year(value):
             params={'current_year': current_year},
         )
 
+# ---------------------
+# Define Slug Validator
+# ---------------------
+# Post pages live at '/<slug>/', next to fixed top-level routes in
+# blog/urls.py. A post with one of these slugs could not be reached, so
+# the first path segment of every such route is reserved.
+RESERVED_SLUGS = frozenset((
+    'about-us', 'accounts', 'admin', 'api', 'comments', 'for-you',
+    'internal', 'like', 'my', 'search', 'static', 'summernote', 'trending',
+    'words',
+))
+
+
+def validate_post_slug(value):
+    """
+    Rejects slugs that are taken by a fixed route of the site.
+    """
+    if value in RESERVED_SLUGS:
+        raise ValidationError(
+            _("'%(slug)s' is used by the site itself, please choose "
+              "another slug."),
+            params={'slug': value},
+        )
+
 # ---------------------
 # Define Your Models
 # ---------------------
@@ -55,7 +82,9 @@ class Blogpost(models.Model):
     engagement and reference.
     """
     blog_title = models.CharField(max_length=200, unique=True)
-    slug = models.SlugField(max_length=200, unique=True)
+    slug = models.SlugField(
+        max_length=200, unique=True, validators=[validate_post_slug]
+    )
     author = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name='blog_posts'
     )
@@ -65,6 +94,11 @@ class Blogpost(models.Model):
     excerpt = models.TextField(max_length=500, blank=True)
     status = models.IntegerField(choices=STATUS, default=1)
     featured_image = CloudinaryField('image', default='placeholder')
+    # Resized JPEG/WebP URLs and srcset strings for 'featured_image',
+    # built once per upload by blog/images.py.
+    featured_image_variants = models.JSONField(
+        default=dict, blank=True, editable=False
+    )
     media_category = models.ForeignKey(
         'MediaCategory', on_delete=models.SET_NULL,
         related_name='blog_posts', null=True, blank=True
@@ -73,23 +107,180 @@ class Blogpost(models.Model):
     release_year = models.IntegerField(validators=[validate_year])
     media_link = models.URLField()
     likes = models.ManyToManyField(
-        User, related_name='blogpost_likes', blank=True
+        User, related_name='blogpost_likes', blank=True, through='Like'
     )
     bookmarks = models.ManyToManyField(
-        User, related_name='blogpost_bookmarks', blank=True
+        User, related_name='blogpost_bookmarks', blank=True,
+        through='Bookmark'
     )
+    # Stored copies of the likes/bookmarks totals. They are kept in step
+    # by the m2m_changed handlers in blog/signals.py, so templates can
+    # read a column instead of running a COUNT(*) per card.
+    like_count = models.PositiveIntegerField(default=0, editable=False)
+    bookmark_count = models.PositiveIntegerField(default=0, editable=False)
+    # Time-decayed engagement score for the trending feed, maintained by
+    # blog/trending.py.
+    hot_score = models.FloatField(default=0, editable=False)
 
     class Meta:
         ordering = ['-created_on']
+        # Composite indexes that back the keyset paginated feed, with and
+        # without the media category filter.
+        indexes = [
+            models.Index(
+                fields=['status', 'created_on', 'id'],
+                name='blogpost_feed_idx',
+            ),
+            models.Index(
+                fields=['media_category', 'status', 'created_on', 'id'],
+                name='blogpost_category_feed_idx',
+            ),
+            # Admin changelist ordering and created_on filter
+            models.Index(fields=['created_on'], name='blogpost_created_idx'),
+            # Trending feed, with and without the media category filter
+            models.Index(
+                fields=['status', 'hot_score', 'id'],
+                name='blogpost_trending_idx',
+            ),
+            models.Index(
+                fields=['media_category', 'status', 'hot_score', 'id'],
+                name='blogpost_category_trending_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.blog_title
 
     def number_of_likes(self):
-        return self.likes.count()
+        return self.like_count
 
     def number_of_bookmarks(self):
-        return self.bookmarks.count()
+        return self.bookmark_count
+
+
+# ---------------------
+# Engagement Counters
+# ---------------------
+# Maps each stored counter column to the M2M field it mirrors.
+COUNTER_FIELDS = {
+    'like_count': 'likes',
+    'bookmark_count': 'bookmarks',
+}
+
+
+def counter_subquery(m2m_name):
+    """
+    Returns a subquery that counts the rows of the given M2M through
+    table for the outer blogpost. Used to recompute a counter column
+    inside a single UPDATE statement.
+    """
+    through = getattr(Blogpost, m2m_name).through
+    rows = (
+        through.objects.filter(blogpost_id=OuterRef('pk'))
+        .order_by()
+        .values('blogpost_id')
+        .annotate(total=Count('*'))
+        .values('total')
+    )
+    return Coalesce(Subquery(rows), Value(0))
+
+
+def sync_engagement_counts(post_ids=None, fields=None):
+    """
+    Recomputes the stored like/bookmark counters from the M2M tables.
+    The recount runs as one UPDATE per counter, so concurrent add/remove
+    calls cannot leave the column out of step with the through table.
+    When 'post_ids' is None every blogpost is rebuilt.
+    """
+    fields = fields or list(COUNTER_FIELDS)
+    queryset = Blogpost.objects.all()
+    if post_ids is not None:
+        post_ids = list(post_ids)
+        if not post_ids:
+            return 0
+        queryset = queryset.filter(pk__in=post_ids)
+    return queryset.update(**{
+        field: counter_subquery(COUNTER_FIELDS[field]) for field in fields
+    })
+
+# Like and Bookmark Models
+class Engagement(models.Model):
+    """
+    Base for the through models of Blogpost.likes and Blogpost.bookmarks.
+    They use the tables Django created for the original plain M2M fields
+    and add the time the user liked or saved the post, so a user's likes
+    and bookmarks can be listed newest first from the (user, created_on,
+    id) index.
+    """
+    blogpost = models.ForeignKey('Blogpost', on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    created_on = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        abstract = True
+        unique_together = [('blogpost', 'user')]
+
+
+class Like(Engagement):
+
+    class Meta(Engagement.Meta):
+        db_table = 'blog_blogpost_likes'
+        indexes = [
+            models.Index(
+                fields=['user', 'created_on', 'id'], name='like_user_feed_idx'
+            ),
+        ]
+
+
+class Bookmark(Engagement):
+
+    class Meta(Engagement.Meta):
+        db_table = 'blog_blogpost_bookmarks'
+        indexes = [
+            models.Index(
+                fields=['user', 'created_on', 'id'],
+                name='bookmark_user_feed_idx',
+            ),
+        ]
+
+
+def toggle_like(blogpost_id, user):
+    """
+    Likes or unlikes a post for a user without a separate exists() check.
+    The like row is deleted if it is there and inserted otherwise, inside
+    one transaction; the through table's unique constraint makes a racing
+    second insert a no-op. m2m_changed is sent as for likes.add/remove so
+    the counter handlers keep working, but only when a row was actually
+    inserted or deleted, so a race is not counted twice. Returns
+    (liked, like_count).
+    """
+    through = Blogpost.likes.through
+    with transaction.atomic():
+        deleted, _ = through.objects.filter(
+            blogpost_id=blogpost_id, user_id=user.pk
+        ).delete()
+        liked = changed = not deleted
+        if liked:
+            try:
+                with transaction.atomic():
+                    through.objects.create(
+                        blogpost_id=blogpost_id, user_id=user.pk
+                    )
+            except IntegrityError:
+                # A concurrent request liked the post first
+                changed = False
+        if deleted or changed:
+            m2m_changed.send(
+                sender=through, instance=user,
+                action='post_add' if liked else 'post_remove',
+                reverse=True, model=Blogpost, pk_set={blogpost_id},
+                using=through.objects.db,
+            )
+        like_count = Blogpost.objects.filter(pk=blogpost_id).values_list(
+            'like_count', flat=True
+        ).get()
+    return liked, like_count
+
 
 # UserProfile Model
 class UserProfile(models.Model):
@@ -106,6 +297,10 @@ class UserProfile(models.Model):
     """
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     profile_image = CloudinaryField('image', default='placeholder')
+    # Resized JPEG/WebP URLs for 'profile_image', built by blog/images.py.
+    profile_image_variants = models.JSONField(
+        default=dict, blank=True, editable=False
+    )
     bio = models.TextField(blank=True)
     country = models.CharField(max_length=100, blank=True)
     top_movies = models.CharField(max_length=255, blank=True)
@@ -134,5 +329,282 @@ symbolizing a comment made on that post. It stores:
     blogpost = models.ForeignKey('Blogpost', on_delete=models.CASCADE, related_name='comments')
     user = models.ForeignKey(User, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            # Backs the paginated comment threads on the detail page
+            models.Index(
+                fields=['blogpost', 'approved', 'created_on'],
+                name='comment_thread_idx',
+            ),
+            # Admin moderation queue: filter on approved, newest first
+            models.Index(
+                fields=['approved', 'created_on'],
+                name='comment_moderation_idx',
+            ),
+            # Admin changelist ordering and created_on filter
+            models.Index(fields=['created_on'], name='comment_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.id} by {self.user.username}"
+
+# ---------------------
+# Dutch Vocabulary
+# ---------------------
+# Derived from each post's text by blog/vocabulary.py: an inverted index
+# of the word stems ('lemmas') a post uses, and its vocabulary profile.
+CEFR_LEVELS = (
+    ('A1', 'A1'), ('A2', 'A2'), ('B1', 'B1'), ('B2', 'B2'), ('C1', 'C1'),
+    ('C2', 'C2'),
+)
+
+
+class PostVocabulary(models.Model):
+    """
+    Word statistics of one post and the CEFR level its vocabulary
+    suggests.
+    """
+    blogpost = models.OneToOneField(
+        'Blogpost', on_delete=models.CASCADE, primary_key=True,
+        related_name='vocabulary'
+    )
+    word_count = models.PositiveIntegerField(default=0)
+    unique_lemmas = models.PositiveIntegerField(default=0)
+    reading_minutes = models.FloatField(default=0)
+    # Share of the running words that are frequent Dutch words
+    coverage = models.FloatField(default=0)
+    level = models.CharField(max_length=2, choices=CEFR_LEVELS)
+    analyzed_on = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.blogpost_id}: {self.level}"
+
+
+class WordOccurrence(models.Model):
+    """
+    How often a post uses one lemma: a posting of the inverted index.
+    """
+    lemma = models.CharField(max_length=64)
+    blogpost = models.ForeignKey(
+        'Blogpost', on_delete=models.CASCADE, related_name='word_occurrences'
+    )
+    count = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['blogpost', 'lemma'], name='word_occurrence_unique'
+            ),
+        ]
+        indexes = [
+            # Posts using a word, most uses first
+            models.Index(
+                fields=['lemma', 'count', 'blogpost'],
+                name='word_lookup_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.lemma} x{self.count} in {self.blogpost_id}"
+
+
+# ---------------------
+# Similar Posts
+# ---------------------
+class SimilarPost(models.Model):
+    """
+    One of the top-K most similar published posts of a post, ranked from
+    1, as precomputed by blog/similarity.py.
+    """
+    blogpost = models.ForeignKey(
+        'Blogpost', on_delete=models.CASCADE, related_name='similar_links'
+    )
+    similar = models.ForeignKey(
+        'Blogpost', on_delete=models.CASCADE, related_name='+'
+    )
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['blogpost', 'similar'], name='similar_post_unique'
+            ),
+        ]
+        indexes = [
+            # The detail page reads a post's neighbours in rank order
+            models.Index(
+                fields=['blogpost', 'rank'], name='similar_post_rank_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.blogpost_id} ~ {self.similar_id} ({self.rank})"
+
+
+# ---------------------
+# Engagement Event Log
+# ---------------------
+# An append-only history of likes, bookmarks and comments, written in
+# batches by blog/events.py and rolled up into DailyEngagement. Posts and
+# users are stored as plain ids, without foreign keys, so batches insert
+# without constraint checks and the history outlives deleted rows.
+EVENT_KINDS = (
+    (1, 'like'), (2, 'unlike'), (3, 'bookmark'), (4, 'unbookmark'),
+    (5, 'comment'),
+)
+
+
+class EngagementEvent(models.Model):
+    """
+    One like, unlike, bookmark, unbookmark or comment, in the order the
+    events were flushed.
+    """
+    kind = models.PositiveSmallIntegerField(choices=EVENT_KINDS)
+    blogpost_id = models.BigIntegerField()
+    user_id = models.BigIntegerField(null=True)
+    created_on = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.get_kind_display()} of {self.blogpost_id}"
+
+
+class DailyEngagement(models.Model):
+    """
+    Per post and day totals of each kind of engagement event, maintained
+    incrementally from EngagementEvent by blog/events.py.
+    """
+    day = models.DateField()
+    blogpost_id = models.BigIntegerField()
+    likes = models.PositiveIntegerField(default=0)
+    unlikes = models.PositiveIntegerField(default=0)
+    bookmarks = models.PositiveIntegerField(default=0)
+    unbookmarks = models.PositiveIntegerField(default=0)
+    comments = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'blogpost_id'], name='daily_engagement_unique'
+            ),
+        ]
+        indexes = [
+            # A post's history, newest day first
+            models.Index(
+                fields=['blogpost_id', 'day'],
+                name='daily_engagement_post_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.blogpost_id} on {self.day}"
+
+
+class EngagementRollup(models.Model):
+    """
+    How far the event log has been rolled up: the id of the last
+    EngagementEvent counted in DailyEngagement, and the highest id that
+    had been written at 'seen_on', which the next run counts up to.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    last_event_id = models.BigIntegerField(default=0)
+    seen_event_id = models.BigIntegerField(default=0)
+    seen_on = models.DateTimeField(null=True, blank=True)
+    updated_on = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+
+# ---------------------
+# Background Task Queue
+# ---------------------
+# Rows of the database-backed task queue run by blog/taskqueue.py. Only
+# queued, running and failed tasks are kept; finished tasks are deleted.
+TASK_STATUS = ((0, 'Queued'), (1, 'Running'), (2, 'Failed'))
+
+
+class Task(models.Model):
+    """
+    One call of a registered task function with JSON arguments, its
+    retry state and the worker that holds it.
+    """
+    name = models.CharField(max_length=200)
+    args = models.JSONField(default=list)
+    # name + arguments, for skipping duplicates of a task still queued
+    key = models.CharField(max_length=255, db_index=True)
+    status = models.PositiveSmallIntegerField(choices=TASK_STATUS, default=0)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_on = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_on = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Workers take the oldest due task of a status
+            models.Index(
+                fields=['status', 'run_after', 'id'], name='task_queue_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name}{tuple(self.args)}"
+
+
+# ---------------------
+# Personal Feed
+# ---------------------
+class PersonalFeed(models.Model):
+    """
+    The state of one user's materialized "For you" feed: the interests it
+    was scored with, when it was built and when the user last opened it,
+    as kept by blog/personal_feed.py.
+    """
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True,
+        related_name='personal_feed'
+    )
+    interests = models.JSONField(default=dict)
+    built_on = models.DateTimeField(default=timezone.now)
+    last_seen = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # New posts are fanned out to the recently active users
+            models.Index(fields=['last_seen'], name='personal_feed_seen_idx'),
+        ]
+
+    def __str__(self):
+        return f"Feed of {self.user_id}"
+
+
+class FeedEntry(models.Model):
+    """
+    One post in a user's personal feed with its score for that user.
+    """
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='feed_entries'
+    )
+    blogpost = models.ForeignKey(
+        'Blogpost', on_delete=models.CASCADE, related_name='+'
+    )
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'blogpost'], name='feed_entry_unique'
+            ),
+        ]
+        indexes = [
+            # The feed is read and keyset paginated in score order
+            models.Index(
+                fields=['user', 'score', 'id'], name='feed_entry_rank_idx'
+            ),
+        ]
+
     def __str__(self):
-        return f"{self.id} by {self.user.username}"
\ No newline at end of file
+        return f"{self.user_id}: {self.blogpost_id} ({self.score:.2f})"
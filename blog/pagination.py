@@ -0,0 +1,206 @@
+# ---------------------
+# Standard Library Imports
+# ---------------------
+import base64
+import binascii
+import json
+
+# ---------------------
+# Django Imports
+# ---------------------
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max, Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(Exception):
+    """
+    Raised when a cursor token cannot be decoded.
+    """
+
+
+# ---------------------
+# Cursor Encoding
+# ---------------------
+# A cursor records the (created_on, id) position of the row a page
+# starts after, plus the direction to read in. It is base64 encoded so
+# templates and URLs treat it as an opaque token. Feeds ordered by
+# another column (such as the trending score) store that column's value
+# in place of created_on.
+def encode_cursor(value, pk, direction):
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    raw = json.dumps([value, pk, direction])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, parse=parse_datetime):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        value, pk, direction = json.loads(
+            base64.urlsafe_b64decode(padded.encode())
+        )
+        value = parse(value)
+    except (ValueError, TypeError, binascii.Error):
+        raise InvalidCursor(token)
+    if value is None or not isinstance(pk, int) \
+            or direction not in ('next', 'prev'):
+        raise InvalidCursor(token)
+    return value, pk, direction
+
+
+# ---------------------
+# Cursor Page
+# ---------------------
+class CursorPage:
+    """
+    One page of a cursor paginated feed. It mirrors the parts of Django's
+    Page that the templates use (iteration, has_next, has_previous) and
+    carries the tokens for the neighbouring pages instead of page numbers.
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+# ---------------------
+# Cursor Paginator
+# ---------------------
+class CursorPaginator:
+    """
+    Keyset paginator for querysets ordered by (created_on, id), newest
+    first by default (the post feed) or oldest first (comment threads).
+    Each page is fetched with a range condition on a composite index
+    instead of OFFSET, so deep pages cost the same as the first one and
+    no COUNT(*) is needed.
+
+    'field' orders by another column instead of created_on; 'parse'
+    turns the value stored in a cursor back into that column's type.
+    """
+
+    def __init__(self, queryset, per_page, newest_first=True,
+                 field='created_on', parse=parse_datetime):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.newest_first = newest_first
+        self.field = field
+        self.parse = parse
+
+    def ordered(self, descending):
+        if descending:
+            return self.queryset.order_by(f'-{self.field}', '-id')
+        return self.queryset.order_by(self.field, 'id')
+
+    def after(self, queryset, value, pk, descending):
+        # Rows that come after (value, pk) in the given direction
+        lookup = 'lt' if descending else 'gt'
+        return queryset.filter(
+            Q(**{f'{self.field}__{lookup}': value})
+            | Q(**{self.field: value, f'id__{lookup}': pk})
+        )
+
+    def page(self, token=None):
+        direction = 'next'
+        queryset = self.ordered(self.newest_first)
+        if token:
+            value, pk, direction = decode_cursor(token, self.parse)
+            # Going back reads the rows before the cursor in reverse order
+            descending = self.newest_first == (direction == 'next')
+            queryset = self.after(
+                self.ordered(descending), value, pk, descending
+            )
+
+        # One extra row tells us whether there is another page beyond
+        # this one without having to count the rest of the table.
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == 'prev':
+            rows.reverse()
+        if not rows:
+            return CursorPage(rows)
+
+        first, last = rows[0], rows[-1]
+        if direction == 'next':
+            has_next, has_previous = has_more, bool(token)
+        else:
+            has_next, has_previous = True, has_more
+        return CursorPage(
+            rows,
+            next_cursor=(
+                encode_cursor(getattr(last, self.field), last.pk, 'next')
+                if has_next else None
+            ),
+            previous_cursor=(
+                encode_cursor(getattr(first, self.field), first.pk, 'prev')
+                if has_previous else None
+            ),
+        )
+
+
+# ---------------------
+# Approximate Count Paginator
+# ---------------------
+# The admin changelist counts the whole table to number its pages. On
+# large tables that COUNT(*) is a full scan, so for unfiltered lists the
+# database's own row estimate is used instead: PostgreSQL's planner
+# statistics (pg_class.reltuples) or, on SQLite, the highest primary key,
+# read from the end of the primary key index. Small tables and filtered
+# lists are still counted exactly.
+def estimate_row_count(model):
+    """
+    Returns a cheap estimate of the number of rows in the model's table,
+    or None if the database cannot give one.
+    """
+    connection = connections[model.objects.db]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class '
+                'WHERE oid = to_regclass(%s)',
+                [model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        # -1 means the table has not been analyzed yet
+        return row[0] if row and row[0] >= 0 else None
+    if connection.vendor == 'sqlite':
+        return model.objects.aggregate(highest=Max('pk'))['highest'] or 0
+    return None
+
+
+class ApproximateCountPaginator(Paginator):
+    """
+    Paginator that reports the estimated row count for unfiltered
+    querysets once the table has more than
+    BLOG_ADMIN_APPROXIMATE_COUNT_THRESHOLD rows.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_row_count(queryset.model)
+            if estimate is not None and \
+                    estimate >= settings.BLOG_ADMIN_APPROXIMATE_COUNT_THRESHOLD:
+                return estimate
+        return super().count
@@ -0,0 +1,341 @@
+# ---------------------
+# Standard Library Imports
+# ---------------------
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+# ---------------------
+# Django Imports
+# ---------------------
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from .caching import bump_personal_feeds, get_category_catalogue
+from .dutch import tokenize
+from .models import Blogpost, Comment, FeedEntry, PersonalFeed, UserProfile
+from .trending import EPOCH
+from .vocabulary import FREQUENT_LEMMAS, cached_stem
+
+# ---------------------
+# Personal Feed
+# ---------------------
+# The "For you" page lists the posts each user is most likely to read.
+# Every post gets a per-user score:
+#
+#     score = rate * (created_on - EPOCH) + ln(1 + affinity)
+#
+# The first term is recency, on the same half-life scale as the trending
+# score (BLOG_PERSONAL_FEED_HALF_LIFE_HOURS), so scores never need
+# refreshing as time passes. The affinity moves a post up as if it were
+# up to a few half-lives newer. It adds up, weighted by
+# BLOG_PERSONAL_FEED_WEIGHTS:
+#
+# - the share of the user's recent likes, bookmarks and comments that
+#   went to the post's category, and to its author,
+# - the categories the user filled in on their profile (top_movies,
+#   top_books, ... see BLOG_PERSONAL_FEED_PROFILE_CATEGORIES),
+# - title words shared with the titles the user listed there.
+#
+# Feeds are materialized as FeedEntry rows, read in (user, score, id)
+# order like any other keyset paginated feed. A feed is built from the
+# BLOG_PERSONAL_FEED_CANDIDATES newest posts, and the user's interests
+# are stored with it. A saved post is then scored against the stored
+# interests of every recently active user and written into their feeds
+# (fan-out on write), each trimmed back to BLOG_PERSONAL_FEED_SIZE. Only
+# publishing, unpublishing and changes to what the score depends on fan
+# a post out; plain text edits do not. Users who have not been seen for
+# BLOG_PERSONAL_FEED_ACTIVE_DAYS get no fan-out; their feed is built
+# again when they come back.
+
+READY, STALE, MISSING = 'ready', 'stale', 'missing'
+
+SCORE_DIGITS = 6
+MIN_LEMMA_LENGTH = 3
+
+
+def decay_rate():
+    """
+    Per-second growth rate of the recency term.
+    """
+    return math.log(2) / (settings.BLOG_PERSONAL_FEED_HALF_LIFE_HOURS * 3600)
+
+
+def title_lemmas(text):
+    """
+    The distinctive lemmas of a title: frequent and very short words
+    say little about what a post is about.
+    """
+    return {
+        lemma for lemma in map(cached_stem, tokenize(text or ''))
+        if len(lemma) >= MIN_LEMMA_LENGTH and lemma not in FREQUENT_LEMMAS
+    }
+
+
+def shares(counts):
+    total = sum(counts.values())
+    return {key: count / total for key, count in counts.items()} \
+        if total else {}
+
+
+# ---------------------
+# Interests
+# ---------------------
+class Interests:
+    """
+    What one user's engagement and profile say they like.
+    """
+
+    def __init__(self, categories=None, authors=None,
+                 profile_categories=(), lemmas=()):
+        # {category id: share}, {author id: share}
+        self.categories = categories or {}
+        self.authors = authors or {}
+        self.profile_categories = set(profile_categories)
+        self.lemmas = set(lemmas)
+
+    @classmethod
+    def load(cls, user_id, now=None):
+        """
+        Reads a user's interests from their likes, bookmarks and comments
+        of the last BLOG_PERSONAL_FEED_HISTORY_DAYS and their profile.
+        """
+        weights = settings.BLOG_PERSONAL_FEED_WEIGHTS
+        since = (now or timezone.now()) - timedelta(
+            days=settings.BLOG_PERSONAL_FEED_HISTORY_DAYS
+        )
+        sources = (
+            ('like', Blogpost.likes.through.objects),
+            ('bookmark', Blogpost.bookmarks.through.objects),
+            ('comment', Comment.objects),
+        )
+        categories, authors = defaultdict(float), defaultdict(float)
+        for kind, rows in sources:
+            for category_id, author_id in rows.filter(
+                    user_id=user_id, created_on__gte=since).values_list(
+                    'blogpost__media_category_id', 'blogpost__author_id'):
+                if category_id is not None:
+                    categories[category_id] += weights[kind]
+                if author_id != user_id:
+                    authors[author_id] += weights[kind]
+
+        fields = settings.BLOG_PERSONAL_FEED_PROFILE_CATEGORIES
+        profile = UserProfile.objects.filter(user_id=user_id).values(
+            *fields
+        ).first() or {}
+        category_ids = {
+            category['media_name']: category['id']
+            for category in get_category_catalogue()
+        }
+        profile_categories, lemmas = set(), set()
+        for field, value in profile.items():
+            if value.strip():
+                if fields[field] in category_ids:
+                    profile_categories.add(category_ids[fields[field]])
+                lemmas |= title_lemmas(value)
+        return cls(
+            shares(categories), shares(authors), profile_categories, lemmas
+        )
+
+    @classmethod
+    def from_json(cls, data):
+        # JSON object keys are strings
+        categories, authors = (
+            {int(pk): share for pk, share in data.get(name, {}).items()}
+            for name in ('categories', 'authors')
+        )
+        return cls(
+            categories, authors, data.get('profile_categories', ()),
+            data.get('lemmas', ()),
+        )
+
+    def to_json(self):
+        return {
+            'categories': self.categories,
+            'authors': self.authors,
+            'profile_categories': sorted(self.profile_categories),
+            'lemmas': sorted(self.lemmas),
+        }
+
+    def affinity(self, category_id, author_id, lemmas):
+        weights = settings.BLOG_PERSONAL_FEED_WEIGHTS
+        affinity = (
+            weights['category'] * self.categories.get(category_id, 0.0)
+            + weights['author'] * self.authors.get(author_id, 0.0)
+        )
+        if category_id in self.profile_categories:
+            affinity += weights['profile_category']
+        if self.lemmas:
+            # One shared word counts half, two or more count fully
+            affinity += weights['interest'] * min(
+                len(self.lemmas & lemmas), 2
+            ) / 2
+        return affinity
+
+    def score(self, created_on, category_id, author_id, lemmas):
+        recency = decay_rate() * (created_on - EPOCH).total_seconds()
+        return round(
+            recency + math.log1p(
+                self.affinity(category_id, author_id, lemmas)
+            ),
+            SCORE_DIGITS
+        )
+
+
+# ---------------------
+# Building and Fan-out
+# ---------------------
+POST_FIELDS = ('pk', 'created_on', 'media_category_id', 'author_id',
+               'blog_title')
+
+
+def build_feed(user_id, now=None):
+    """
+    Scores the newest posts for a user and replaces their feed with the
+    best BLOG_PERSONAL_FEED_SIZE. Returns the number of entries.
+    """
+    now = now or timezone.now()
+    interests = Interests.load(user_id, now)
+    candidates = Blogpost.objects.filter(status=1).exclude(
+        author_id=user_id
+    ).order_by('-created_on', '-id').values_list(*POST_FIELDS)[
+        :settings.BLOG_PERSONAL_FEED_CANDIDATES
+    ]
+    scored = sorted(
+        (
+            (interests.score(
+                created_on, category_id, author_id, title_lemmas(title)
+            ), pk)
+            for pk, created_on, category_id, author_id, title in candidates
+        ),
+        reverse=True,
+    )[:settings.BLOG_PERSONAL_FEED_SIZE]
+    # The feed breaks ties on the entry id, so the newer of two posts
+    # with the same score is inserted last
+    scored.reverse()
+    with transaction.atomic():
+        PersonalFeed.objects.update_or_create(
+            user_id=user_id,
+            defaults={'interests': interests.to_json(), 'built_on': now},
+        )
+        FeedEntry.objects.filter(user_id=user_id).delete()
+        # A fan-out that ran meanwhile may have added some of the posts
+        FeedEntry.objects.bulk_create([
+            FeedEntry(user_id=user_id, blogpost_id=pk, score=score)
+            for score, pk in scored
+        ], batch_size=2000, ignore_conflicts=True)
+    bump_personal_feeds(user_id)
+    return len(scored)
+
+
+def fan_out_post(post_id, now=None, batch_size=2000):
+    """
+    Scores a saved post for every active user, and every user whose feed
+    already holds it, and writes it into their feeds. A post that is no
+    longer published is taken out of all feeds. Returns the number of
+    feeds the post is in.
+    """
+    now = now or timezone.now()
+    post = Blogpost.objects.filter(pk=post_id, status=1).values_list(
+        *POST_FIELDS
+    ).first()
+    entries = []
+    if post is not None:
+        _, created_on, category_id, author_id, title = post
+        lemmas = title_lemmas(title)
+        active_since = now - timedelta(
+            days=settings.BLOG_PERSONAL_FEED_ACTIVE_DAYS
+        )
+        feeds = PersonalFeed.objects.filter(
+            Q(last_seen__gte=active_since)
+            | Q(user_id__in=FeedEntry.objects.filter(
+                blogpost_id=post_id).values('user_id'))
+        ).exclude(user_id=author_id).values_list('user_id', 'interests')
+        entries = [
+            FeedEntry(
+                user_id=user_id, blogpost_id=post_id,
+                score=Interests.from_json(interests).score(
+                    created_on, category_id, author_id, lemmas
+                ),
+            )
+            for user_id, interests in feeds.iterator(chunk_size=batch_size)
+        ]
+    with transaction.atomic():
+        FeedEntry.objects.filter(blogpost_id=post_id).delete()
+        FeedEntry.objects.bulk_create(
+            entries, batch_size=batch_size, ignore_conflicts=True
+        )
+        trim_feeds([entry.user_id for entry in entries])
+    bump_personal_feeds()
+    return len(entries)
+
+
+def trim_feeds(user_ids, chunk_size=500):
+    """
+    Deletes the entries ranked below BLOG_PERSONAL_FEED_SIZE in the given
+    users' feeds. Returns the number deleted.
+    """
+    deleted = 0
+    for start in range(0, len(user_ids), chunk_size):
+        extra = list(FeedEntry.objects.filter(
+            user_id__in=user_ids[start:start + chunk_size]
+        ).annotate(position=Window(
+            RowNumber(), partition_by=F('user_id'),
+            order_by=[F('score').desc(), F('id').desc()],
+        )).filter(
+            position__gt=settings.BLOG_PERSONAL_FEED_SIZE
+        ).values_list('pk', flat=True))
+        if extra:
+            deleted += FeedEntry.objects.filter(pk__in=extra).delete()[0]
+    return deleted
+
+
+def feed_state(user_id, touch=True, now=None):
+    """
+    READY, STALE (built more than BLOG_PERSONAL_FEED_REBUILD_HOURS ago,
+    still worth showing while it is rebuilt) or MISSING (never built, or
+    its user was away and it has missed the posts fanned out since).
+    With 'touch', the user is recorded as active.
+    """
+    now = now or timezone.now()
+    state = PersonalFeed.objects.filter(user_id=user_id).values_list(
+        'built_on', 'last_seen'
+    ).first()
+    if state is None:
+        return MISSING
+    built_on, last_seen = state
+    if last_seen < now - timedelta(
+            days=settings.BLOG_PERSONAL_FEED_ACTIVE_DAYS):
+        drop_feeds(PersonalFeed.objects.filter(user_id=user_id))
+        return MISSING
+    if touch:
+        PersonalFeed.objects.filter(user_id=user_id).update(last_seen=now)
+    if built_on < now - timedelta(
+            hours=settings.BLOG_PERSONAL_FEED_REBUILD_HOURS):
+        return STALE
+    return READY
+
+
+def drop_feeds(feeds):
+    """
+    Deletes the given PersonalFeeds and their entries.
+    """
+    with transaction.atomic():
+        FeedEntry.objects.filter(user_id__in=feeds.values('user_id')).delete()
+        count, _ = feeds.delete()
+    return count
+
+
+def prune_inactive_feeds(now=None):
+    """
+    Drops the feeds of users who have not been seen for
+    BLOG_PERSONAL_FEED_ACTIVE_DAYS; they are built again when the users
+    return. Returns the number of feeds dropped.
+    """
+    return drop_feeds(PersonalFeed.objects.filter(
+        last_seen__lt=(now or timezone.now()) - timedelta(
+            days=settings.BLOG_PERSONAL_FEED_ACTIVE_DAYS
+        )
+    ))
@@ -0,0 +1,212 @@
+# ---------------------
+# Django Imports
+# ---------------------
+from django.db import connection
+from django.db.models import Q
+from .dutch import html_to_text, stem_text, tokenize, stem
+from .models import Blogpost
+
+# ---------------------
+# Blogpost Search
+# ---------------------
+# One search API over three interchangeable backends:
+#
+# - SQLite: an FTS5 virtual table ('blog_search_fts') holding the title,
+#   excerpt and tag-stripped body, pre-stemmed with the Dutch stemmer in
+#   blog/dutch.py because FTS5 has no Dutch tokenizer of its own.
+# - PostgreSQL: a 'blog_search_document' table with a weighted tsvector
+#   built with the 'dutch' text search configuration and a GIN index.
+# - Anything else: a plain icontains fallback on title and excerpt.
+#
+# The tables are created by migration 0005. Only published posts are
+# kept in the index; drafts are removed when they are saved.
+
+TITLE_WEIGHT, EXCERPT_WEIGHT, BODY_WEIGHT = 10.0, 4.0, 1.0
+
+
+def document_for(blogpost):
+    """
+    Returns the (title, excerpt, body) text that is indexed for a post.
+    """
+    return (
+        blogpost.blog_title,
+        blogpost.excerpt,
+        html_to_text(blogpost.content),
+    )
+
+
+class SQLiteSearchBackend:
+    table = 'blog_search_fts'
+
+    def remove(self, cursor, post_ids):
+        cursor.executemany(
+            f'DELETE FROM {self.table} WHERE rowid = %s',
+            [(pk,) for pk in post_ids]
+        )
+
+    def index(self, cursor, blogposts):
+        self.remove(cursor, [post.pk for post in blogposts])
+        cursor.executemany(
+            f'INSERT INTO {self.table} (rowid, blog_title, excerpt, body) '
+            f'VALUES (%s, %s, %s, %s)',
+            [
+                (post.pk, *(stem_text(part) for part in document_for(post)))
+                for post in blogposts
+            ]
+        )
+
+    def clear(self, cursor):
+        cursor.execute(f'DELETE FROM {self.table}')
+
+    def match(self, cursor, query, limit):
+        terms = sorted({stem(token) for token in tokenize(query)})
+        if not terms:
+            return []
+        # Each stem is quoted so FTS5 treats it as a literal term, and
+        # the prefix star lets partly typed words still match.
+        expression = ' AND '.join(f'"{term}"*' for term in terms)
+        cursor.execute(
+            f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s '
+            f'ORDER BY bm25({self.table}, %s, %s, %s) LIMIT %s',
+            [expression, TITLE_WEIGHT, EXCERPT_WEIGHT, BODY_WEIGHT, limit]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresSearchBackend:
+    table = 'blog_search_document'
+
+    def remove(self, cursor, post_ids):
+        cursor.execute(
+            f'DELETE FROM {self.table} WHERE blogpost_id = ANY(%s)',
+            [list(post_ids)]
+        )
+
+    def index(self, cursor, blogposts):
+        cursor.executemany(
+            f"INSERT INTO {self.table} (blogpost_id, document) VALUES ("
+            f"%s, setweight(to_tsvector('dutch', %s), 'A') "
+            f"|| setweight(to_tsvector('dutch', %s), 'B') "
+            f"|| setweight(to_tsvector('dutch', %s), 'C')) "
+            f"ON CONFLICT (blogpost_id) DO UPDATE "
+            f"SET document = EXCLUDED.document",
+            [(post.pk, *document_for(post)) for post in blogposts]
+        )
+
+    def clear(self, cursor):
+        cursor.execute(f'TRUNCATE {self.table}')
+
+    def match(self, cursor, query, limit):
+        cursor.execute(
+            f"SELECT blogpost_id FROM {self.table}, "
+            f"websearch_to_tsquery('dutch', %s) AS query "
+            f"WHERE document @@ query "
+            f"ORDER BY ts_rank_cd(document, query) DESC LIMIT %s",
+            [query, limit]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+class BasicSearchBackend:
+    """
+    Fallback for databases without a full-text engine. Nothing is
+    indexed; searches run straight against the Blogpost table.
+    """
+
+    def remove(self, cursor, post_ids):
+        pass
+
+    def index(self, cursor, blogposts):
+        pass
+
+    def clear(self, cursor):
+        pass
+
+    def match(self, cursor, query, limit):
+        queryset = Blogpost.objects.filter(status=1)
+        for token in tokenize(query):
+            queryset = queryset.filter(
+                Q(blog_title__icontains=token) | Q(excerpt__icontains=token)
+            )
+        return list(queryset.values_list('pk', flat=True)[:limit])
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_backend():
+    return BACKENDS.get(connection.vendor, BasicSearchBackend)()
+
+
+# ---------------------
+# Public API
+# ---------------------
+def index_posts(blogposts):
+    """
+    Adds or refreshes posts in the search index. Drafts are removed so
+    only published posts can be found.
+    """
+    backend = get_backend()
+    published = [post for post in blogposts if post.status == 1]
+    drafts = [post.pk for post in blogposts if post.status != 1]
+    with connection.cursor() as cursor:
+        if drafts:
+            backend.remove(cursor, drafts)
+        if published:
+            backend.index(cursor, published)
+
+
+def remove_posts(post_ids):
+    post_ids = list(post_ids)
+    if post_ids:
+        with connection.cursor() as cursor:
+            get_backend().remove(cursor, post_ids)
+
+
+def rebuild_index(batch_size=500):
+    """
+    Drops and rebuilds the whole index in batches. Returns the number of
+    posts indexed.
+    """
+    backend = get_backend()
+    with connection.cursor() as cursor:
+        backend.clear(cursor)
+    queryset = Blogpost.objects.filter(status=1).only(
+        'pk', 'status', 'blog_title', 'excerpt', 'content'
+    ).order_by('pk')
+    total, batch = 0, []
+    for blogpost in queryset.iterator(chunk_size=batch_size):
+        batch.append(blogpost)
+        if len(batch) >= batch_size:
+            index_posts(batch)
+            total, batch = total + len(batch), []
+    if batch:
+        index_posts(batch)
+        total += len(batch)
+    return total
+
+
+def search_post_ids(query, limit=50):
+    """
+    Returns the ids of published posts matching the query, best match
+    first.
+    """
+    if not query or not query.strip():
+        return []
+    with connection.cursor() as cursor:
+        return get_backend().match(cursor, query, limit)
+
+
+def search_posts(query, limit=50):
+    """
+    Returns the matching published posts, ranked, with the author and
+    media category already joined.
+    """
+    post_ids = search_post_ids(query, limit)
+    posts = Blogpost.objects.filter(pk__in=post_ids, status=1) \
+        .select_related('author', 'media_category').defer('content')
+    by_id = {post.pk: post for post in posts}
+    return [by_id[pk] for pk in post_ids if pk in by_id]
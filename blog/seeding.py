@@ -0,0 +1,207 @@
+# ---------------------
+# Standard Library Imports
+# ---------------------
+import random
+from datetime import timedelta
+
+# ---------------------
+# Django Imports
+# ---------------------
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.utils import timezone
+from .caching import bump_all_feeds, invalidate_categories
+from .models import Blogpost, Comment, MediaCategory, UserProfile, \
+    sync_engagement_counts
+from .search import rebuild_index
+from .trending import refresh_scores
+from .vocabulary import rebuild_vocabulary
+
+# ---------------------
+# Synthetic Data Seeder
+# ---------------------
+# Generates a production-like data set for benchmarking: users with
+# profiles, the twelve media categories, published and draft posts,
+# likes, bookmarks and comments. Engagement is skewed the way real sites
+# are: a few writers produce most posts, a few posts collect most likes
+# and a few readers do most of the liking. Everything is written with
+# bulk_create, so counters, trending scores, the search index and the
+# vocabulary profiles are rebuilt at the end.
+
+CATEGORY_NAMES = (
+    'Movies', 'Series', 'Books', 'Music', 'Podcasts', 'Miscellaneous',
+    'A1', 'A2', 'B1', 'B2', 'C1', 'C2',
+)
+
+DUTCH_WORDS = (
+    'de het een en van ik te dat die in is niet je op wat met zijn voor '
+    'maar er hij ze dit als om naar ook nog al bij kan uit zo dan was '
+    'film boek serie muziek verhaal taal woord zin leren lezen kijken '
+    'luisteren spreken begrijpen nederlands vlaams amsterdam utrecht fiets '
+    'gracht kaas stroopwafel regen zomer winter familie vriend school werk '
+    'moeilijk makkelijk mooi spannend grappig leuk interessant oud nieuw '
+    'hoofdpersoon ondertitels uitspraak grammatica werkwoord zelfstandig '
+    'naamwoord bijvoeglijk gezellig lekker typisch eigenlijk natuurlijk'
+).split()
+
+BATCH_SIZE = 1000
+
+
+class Seeder:
+    """
+    Creates the synthetic data set. All names start with 'prefix' so a
+    second run can use another prefix next to the first one.
+    """
+
+    def __init__(self, users=200, posts=1000, likes=20000, bookmarks=5000,
+                 comments=5000, draft_ratio=0.1, prefix='seed', seed=42):
+        self.sizes = {
+            'users': users, 'posts': posts, 'likes': likes,
+            'bookmarks': bookmarks, 'comments': comments,
+        }
+        self.draft_ratio = draft_ratio
+        self.prefix = prefix
+        self.random = random.Random(seed)
+
+    # ---------------------
+    # Helpers
+    # ---------------------
+    def skewed_choice(self, items, exponent=1.1):
+        """
+        Picks an item with Zipf-like weights: the first items in the
+        list are chosen far more often than the last ones.
+        """
+        index = int(len(items) * self.random.random() ** (1 + exponent))
+        return items[min(index, len(items) - 1)]
+
+    def sentence(self, low=6, high=16):
+        words = self.random.choices(DUTCH_WORDS, k=self.random.randint(
+            low, high))
+        return ' '.join(words).capitalize() + '.'
+
+    def paragraphs(self, count):
+        return ''.join(
+            '<p>' + ' '.join(self.sentence() for _ in range(5)) + '</p>'
+            for _ in range(count)
+        )
+
+    def bulk(self, model, objects, **kwargs):
+        for start in range(0, len(objects), BATCH_SIZE):
+            model.objects.bulk_create(
+                objects[start:start + BATCH_SIZE], **kwargs
+            )
+
+    # ---------------------
+    # Steps
+    # ---------------------
+    def create_users(self):
+        password = make_password('nederlearn')
+        users = [
+            User(username=f'{self.prefix}_user_{i}', password=password)
+            for i in range(self.sizes['users'])
+        ]
+        self.bulk(User, users)
+        users = list(User.objects.filter(
+            username__startswith=f'{self.prefix}_user_'
+        ).order_by('pk'))
+        self.bulk(UserProfile, [
+            UserProfile(
+                user=user, bio=self.sentence(), country='Nederland',
+                top_movies=self.sentence(2, 5), top_books=self.sentence(2, 5),
+            )
+            for user in users
+        ])
+        return users
+
+    def create_categories(self):
+        MediaCategory.objects.bulk_create(
+            [MediaCategory(media_name=name) for name in CATEGORY_NAMES],
+            ignore_conflicts=True
+        )
+        return list(MediaCategory.objects.filter(
+            media_name__in=CATEGORY_NAMES).order_by('pk'))
+
+    def create_posts(self, users, categories):
+        # Roughly one user in ten writes, and a few of them write most
+        writers = users[:max(1, len(users) // 10)]
+        now = timezone.now()
+        posts, created = [], []
+        for i in range(self.sizes['posts']):
+            title = f'{self.sentence(2, 5)[:-1]} {self.prefix} {i}'
+            posts.append(Blogpost(
+                blog_title=title,
+                slug=f'{self.prefix}-post-{i}',
+                author=self.skewed_choice(writers),
+                content=self.paragraphs(self.random.randint(2, 8)),
+                excerpt=self.sentence(),
+                status=0 if self.random.random() < self.draft_ratio else 1,
+                media_category=self.skewed_choice(categories, 0.5),
+                release_year=self.random.randint(1950, now.year),
+                media_link='https://example.com',
+            ))
+            created.append(now - timedelta(
+                minutes=self.random.randint(0, 60 * 24 * 730)
+            ))
+        self.bulk(Blogpost, posts)
+        # bulk_create applies auto_now_add, so the spread out creation
+        # dates are written afterwards.
+        posts = list(Blogpost.objects.filter(
+            slug__startswith=f'{self.prefix}-post-'
+        ).order_by('pk'))
+        for post, created_on in zip(posts, created):
+            post.created_on = created_on
+        Blogpost.objects.bulk_update(
+            posts, ['created_on'], batch_size=BATCH_SIZE
+        )
+        return posts
+
+    def create_m2m(self, m2m_name, count, users, posts):
+        through = getattr(Blogpost, m2m_name).through
+        # Popular posts are the ones readers engage with most
+        popular = self.random.sample(posts, len(posts))
+        rows = {
+            (self.skewed_choice(popular).pk, self.skewed_choice(users).pk)
+            for _ in range(count)
+        }
+        self.bulk(through, [
+            through(blogpost_id=post_id, user_id=user_id)
+            for post_id, user_id in rows
+        ], ignore_conflicts=True)
+        return len(rows)
+
+    def create_comments(self, users, posts):
+        popular = self.random.sample(posts, len(posts))
+        comments = [
+            Comment(
+                blogpost=self.skewed_choice(popular),
+                user=self.skewed_choice(users),
+                body=self.sentence(4, 30),
+                approved=self.random.random() < 0.8,
+            )
+            for _ in range(self.sizes['comments'])
+        ]
+        self.bulk(Comment, comments)
+        return len(comments)
+
+    def run(self):
+        users = self.create_users()
+        categories = self.create_categories()
+        posts = self.create_posts(users, categories)
+        published = [post for post in posts if post.status == 1] or posts
+        totals = {
+            'users': len(users),
+            'categories': len(categories),
+            'posts': len(posts),
+            'likes': self.create_m2m(
+                'likes', self.sizes['likes'], users, published),
+            'bookmarks': self.create_m2m(
+                'bookmarks', self.sizes['bookmarks'], users, published),
+            'comments': self.create_comments(users, published),
+        }
+        sync_engagement_counts([post.pk for post in posts])
+        refresh_scores([post.pk for post in posts])
+        rebuild_index()
+        rebuild_vocabulary()
+        invalidate_categories()
+        bump_all_feeds()
+        return totals
@@ -0,0 +1,379 @@
+# ---------------------
+# Django Imports
+# ---------------------
+from django.contrib.auth.models import User
+from django.db.models import DEFERRED
+from django.db.models.signals import m2m_changed, post_delete, post_init, \
+    post_save, pre_delete
+from django.dispatch import receiver
+from .models import Blogpost, Comment, MediaCategory, PersonalFeed, \
+    SimilarPost, UserProfile, sync_engagement_counts
+from .images import variants_outdated
+from . import tasks
+from .caching import bump_all_feeds, bump_card_versions, \
+    bump_feed_versions, comments_approved, image_variants_refreshed, \
+    invalidate_categories, invalidate_detail
+from .trending import event_score, record_engagement, refresh_scores
+from .events import record_event
+
+# ---------------------
+# Engagement Counter Signals
+# ---------------------
+# Keeps Blogpost.like_count and Blogpost.bookmark_count in step with the
+# 'likes' and 'bookmarks' M2M tables. The handlers fire for every path
+# that changes the relation: LikeUnlike.post, admin edits, the reverse
+# accessors on User (user.blogpost_likes.add(...)) and .clear() calls.
+
+
+def _changed_post_ids(instance, action, reverse, pk_set):
+    """
+    Works out which blogposts were affected by an M2M change. On the
+    forward side the instance is the blogpost itself; on the reverse
+    side (changes made through the user) pk_set holds blogpost ids.
+    """
+    if not reverse:
+        return [instance.pk]
+    if action == 'post_clear':
+        return getattr(instance, '_cleared_blogpost_ids', [])
+    return list(pk_set or [])
+
+
+def _update_counter(field, m2m_name, instance, action, reverse, pk_set):
+    # A reverse clear() does not tell us which posts were involved, so
+    # the ids are collected before the rows are deleted.
+    if action == 'pre_clear' and reverse:
+        instance._cleared_blogpost_ids = list(
+            getattr(instance, Blogpost._meta.get_field(m2m_name)
+                    .remote_field.related_name)
+            .values_list('pk', flat=True)
+        )
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    post_ids = _changed_post_ids(instance, action, reverse, pk_set)
+    sync_engagement_counts(post_ids, fields=[field])
+    if not reverse:
+        instance.refresh_from_db(fields=[field])
+
+
+@receiver(m2m_changed, sender=Blogpost.likes.through)
+def update_like_count(sender, instance, action, reverse, pk_set, **kwargs):
+    _update_counter('like_count', 'likes', instance, action, reverse, pk_set)
+
+
+@receiver(m2m_changed, sender=Blogpost.bookmarks.through)
+def update_bookmark_count(sender, instance, action, reverse, pk_set,
+                          **kwargs):
+    _update_counter(
+        'bookmark_count', 'bookmarks', instance, action, reverse, pk_set
+    )
+
+
+# ---------------------
+# Image Variant Signals
+# ---------------------
+# Queues the responsive image variants (blog/images.py) of a new featured
+# or profile image for the task worker (blog/tasks.py). Cached pages are
+# refreshed by the image_variants_refreshed receivers below once the
+# variants are stored.
+@receiver(post_save, sender=Blogpost)
+def queue_featured_image_variants(sender, instance, raw=False, **kwargs):
+    if not raw and variants_outdated(
+            instance, 'featured_image', 'featured_image_variants'):
+        tasks.build_blogpost_image_variants.enqueue(instance.pk)
+
+
+@receiver(post_save, sender=UserProfile)
+def queue_profile_image_variants(sender, instance, raw=False, **kwargs):
+    if not raw and variants_outdated(
+            instance, 'profile_image', 'profile_image_variants'):
+        tasks.build_profile_image_variants.enqueue(instance.pk)
+
+
+# ---------------------
+# Search Index Signals
+# ---------------------
+# Queues an update of the full-text search index (blog/search.py) for
+# saved and deleted blogposts.
+@receiver(post_save, sender=Blogpost)
+@receiver(post_delete, sender=Blogpost)
+def queue_blogpost_indexing(sender, instance, raw=False, **kwargs):
+    if not raw:
+        tasks.index_blogpost.enqueue(instance.pk)
+
+
+# ---------------------
+# Vocabulary Signals
+# ---------------------
+# Queues a fresh vocabulary profile (blog/vocabulary.py) of a saved post.
+# Deleted posts lose theirs through the foreign keys.
+@receiver(post_save, sender=Blogpost)
+def queue_vocabulary_analysis(sender, instance, raw=False, **kwargs):
+    if not raw:
+        tasks.analyze_blogpost_vocabulary.enqueue(instance.pk)
+
+
+# ---------------------
+# Similar Posts Signals
+# ---------------------
+# A saved post's similar posts are refreshed after its vocabulary (see
+# analyze_blogpost_vocabulary). When a post is deleted, its rows go with
+# it, so the posts that listed it are queued to fill the gap.
+@receiver(pre_delete, sender=Blogpost)
+def queue_similar_refresh(sender, instance, **kwargs):
+    listed_by = set(SimilarPost.objects.filter(
+        similar_id=instance.pk).values_list('blogpost_id', flat=True))
+    if listed_by:
+        tasks.refresh_similar.enqueue(sorted(listed_by))
+
+
+# ---------------------
+# Personal Feed Signals
+# ---------------------
+# Posts are fanned out to the personal feeds (blog/personal_feed.py) by a
+# task when they are published or unpublished, or when a field the feed
+# score depends on changes; other edits leave the feeds alone. The values
+# loaded with a post are remembered to tell. Deleted posts leave the
+# feeds through the foreign key. A profile edit changes its user's
+# interests, so their feed, if they have one, is rebuilt.
+FEED_FIELDS = (
+    'status', 'created_on', 'media_category_id', 'author_id', 'blog_title',
+)
+
+
+def _feed_fields(instance):
+    # Deferred fields are not loaded here; they count as changed
+    return tuple(instance.__dict__.get(name, DEFERRED) for name in FEED_FIELDS)
+
+
+@receiver(post_init, sender=Blogpost)
+def remember_feed_fields(sender, instance, **kwargs):
+    instance._feed_fields = _feed_fields(instance)
+
+
+@receiver(post_save, sender=Blogpost)
+def queue_feed_fan_out(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    loaded, instance._feed_fields = instance._feed_fields, \
+        _feed_fields(instance)
+    if (instance.status == 1 and created) or \
+            (not created and loaded != instance._feed_fields):
+        tasks.fan_out_blogpost.enqueue(instance.pk)
+
+
+@receiver(post_save, sender=UserProfile)
+def queue_personal_feed_rebuild(sender, instance, raw=False, **kwargs):
+    if not raw and PersonalFeed.objects.filter(
+            user_id=instance.user_id).exists():
+        tasks.build_personal_feed.enqueue(instance.user_id)
+
+
+# ---------------------
+# Detail Cache Signals
+# ---------------------
+# Drops the cached detail page HTML (blog/caching.py) when a post, or
+# one of its comments, is saved, deleted or approved.
+@receiver(post_save, sender=Blogpost)
+@receiver(post_delete, sender=Blogpost)
+def invalidate_blogpost_detail(sender, instance, **kwargs):
+    invalidate_detail(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_detail(sender, instance, **kwargs):
+    invalidate_detail(instance.blogpost_id)
+
+
+@receiver(comments_approved)
+def invalidate_approved_comments(sender, post_ids, **kwargs):
+    invalidate_detail(*post_ids)
+
+
+# ---------------------
+# Category Catalogue Signals
+# ---------------------
+# Drops the cached category catalogue when a category changes or when a
+# blogpost is added, removed or moved between categories or statuses.
+@receiver(post_save, sender=MediaCategory)
+@receiver(post_delete, sender=MediaCategory)
+@receiver(post_save, sender=Blogpost)
+@receiver(post_delete, sender=Blogpost)
+def invalidate_category_catalogue(sender, **kwargs):
+    invalidate_categories()
+
+
+# ---------------------
+# Feed Version Signals
+# ---------------------
+# Moves the feed version stamps (blog/caching.py) on so the list pages
+# stop answering 304 once their content has changed.
+@receiver(post_save, sender=MediaCategory)
+@receiver(post_delete, sender=MediaCategory)
+@receiver(post_save, sender=Blogpost)
+@receiver(post_delete, sender=Blogpost)
+def bump_feeds_on_post_change(sender, **kwargs):
+    bump_all_feeds()
+
+
+@receiver(m2m_changed, sender=Blogpost.likes.through)
+@receiver(m2m_changed, sender=Blogpost.bookmarks.through)
+def bump_feeds_on_engagement(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        category_ids = [instance.media_category_id]
+    else:
+        category_ids = Blogpost.objects.filter(
+            pk__in=_changed_post_ids(instance, action, reverse, pk_set)
+        ).values_list('media_category_id', flat=True).distinct()
+    bump_feed_versions(list(category_ids))
+
+
+# ---------------------
+# Post Card Signals
+# ---------------------
+# Cached post cards (blog/caching.py) are keyed by 'updated_on' and the
+# like count, so edits and likes need nothing here. These handlers bump
+# the card version for what the key cannot see: new image variants, and
+# an author's details changing (logins, which only touch 'last_login',
+# are ignored). Both also affect the cached detail page and the feeds.
+@receiver(image_variants_refreshed, sender=Blogpost)
+def refresh_cards_for_new_images(sender, instance, **kwargs):
+    bump_card_versions([instance.pk])
+    invalidate_detail(instance.pk)
+    bump_all_feeds()
+
+
+@receiver(post_save, sender=User)
+def refresh_cards_for_author(sender, instance, created, update_fields=None,
+                             raw=False, **kwargs):
+    if created or raw or (update_fields and
+                          set(update_fields) <= {'last_login'}):
+        return
+    post_ids = list(Blogpost.objects.filter(
+        author_id=instance.pk).values_list('pk', flat=True))
+    if post_ids:
+        bump_card_versions(post_ids)
+        invalidate_detail(*post_ids)
+        bump_all_feeds()
+
+
+# ---------------------
+# Trending Score Signals
+# ---------------------
+# Keeps Blogpost.hot_score (blog/trending.py) up to date. New posts start
+# at their publication weight, new likes, bookmarks and approved
+# comments are folded into the score, and anything that removes
+# engagement recomputes the post's score from the tables.
+@receiver(post_save, sender=Blogpost)
+def set_initial_hot_score(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        instance.hot_score = event_score('post', instance.created_on)
+        Blogpost.objects.filter(pk=instance.pk).update(
+            hot_score=instance.hot_score
+        )
+
+
+def _update_hot_scores(kind, instance, action, reverse, pk_set):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    post_ids = _changed_post_ids(instance, action, reverse, pk_set)
+    if action == 'post_add':
+        # On the forward side pk_set holds the users added to one post
+        record_engagement(
+            post_ids, kind, count=1 if reverse else len(pk_set or ())
+        )
+    else:
+        refresh_scores(post_ids)
+
+
+@receiver(m2m_changed, sender=Blogpost.likes.through)
+def update_like_hot_score(sender, instance, action, reverse, pk_set,
+                          **kwargs):
+    _update_hot_scores('like', instance, action, reverse, pk_set)
+
+
+@receiver(m2m_changed, sender=Blogpost.bookmarks.through)
+def update_bookmark_hot_score(sender, instance, action, reverse, pk_set,
+                              **kwargs):
+    _update_hot_scores('bookmark', instance, action, reverse, pk_set)
+
+
+@receiver(post_save, sender=Comment)
+def update_comment_hot_score(sender, instance, created, raw=False,
+                             **kwargs):
+    if raw or (created and not instance.approved):
+        return
+    if created:
+        record_engagement([instance.blogpost_id], 'comment')
+    else:
+        # An edit may have approved or unapproved the comment
+        refresh_scores([instance.blogpost_id])
+    bump_all_feeds()
+
+
+@receiver(post_delete, sender=Comment)
+def remove_comment_hot_score(sender, instance, **kwargs):
+    if instance.approved:
+        refresh_scores([instance.blogpost_id])
+        bump_all_feeds()
+
+
+@receiver(comments_approved)
+def refresh_moderated_hot_scores(sender, post_ids, **kwargs):
+    refresh_scores(post_ids)
+    bump_all_feeds()
+
+
+# ---------------------
+# Engagement Event Signals
+# ---------------------
+# Appends every like, bookmark and comment, and every unlike and removed
+# bookmark, to the engagement event log (blog/events.py). The M2M tables
+# stay the source of truth for who likes what; the log is history.
+def _log_engagement(m2m_name, added, removed, instance, action, reverse,
+                    pk_set):
+    if action == 'pre_clear':
+        # Which users or posts a clear() removes is only known before it
+        related = getattr(instance, Blogpost._meta.get_field(
+            m2m_name).remote_field.related_name) if reverse else \
+            getattr(instance, m2m_name)
+        instance._cleared_event_ids = list(
+            related.values_list('pk', flat=True)
+        )
+        return
+    if action == 'post_clear':
+        pk_set = getattr(instance, '_cleared_event_ids', [])
+    elif action not in ('post_add', 'post_remove'):
+        return
+    kind = added if action == 'post_add' else removed
+    for pk in pk_set or ():
+        if reverse:
+            record_event(kind, pk, instance.pk)
+        else:
+            record_event(kind, instance.pk, pk)
+
+
+@receiver(m2m_changed, sender=Blogpost.likes.through)
+def log_like_events(sender, instance, action, reverse, pk_set, **kwargs):
+    _log_engagement(
+        'likes', 'like', 'unlike', instance, action, reverse, pk_set
+    )
+
+
+@receiver(m2m_changed, sender=Blogpost.bookmarks.through)
+def log_bookmark_events(sender, instance, action, reverse, pk_set,
+                        **kwargs):
+    _log_engagement(
+        'bookmarks', 'bookmark', 'unbookmark', instance, action, reverse,
+        pk_set
+    )
+
+
+@receiver(post_save, sender=Comment)
+def log_comment_event(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record_event('comment', instance.blogpost_id, instance.user_id)
@@ -0,0 +1,423 @@
+# ---------------------
+# Standard Library Imports
+# ---------------------
+import math
+from collections import defaultdict
+
+# ---------------------
+# Django Imports
+# ---------------------
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from .dutch import tokenize
+from .models import Blogpost, SimilarPost, WordOccurrence
+from .vocabulary import cached_stem, numpy
+
+try:
+    from scipy import sparse
+except ImportError:  # pragma: no cover - scipy is optional
+    sparse = None
+
+# ---------------------
+# Similar Posts
+# ---------------------
+# Every published post keeps its BLOG_SIMILAR_POSTS most similar posts in
+# the SimilarPost table, so the detail page reads them with one indexed
+# query. Two posts are compared on
+#
+# - text: cosine similarity of TF-IDF vectors built from the word index
+#   of blog/vocabulary.py (sublinear counts, title words boosted, words
+#   used by one post only or by most posts left out),
+# - co-likes: cosine similarity of the sets of users who liked them,
+# - the same media category and the same release year,
+#
+# weighted by BLOG_SIMILAR_WEIGHTS. Only posts that share words or likes
+# are candidates. With NumPy and SciPy installed, a block of posts is
+# scored against all others with two sparse matrix products; otherwise
+# the same scores are summed through the inverted index in Python.
+#
+# rebuild_similar_posts recomputes every list. After a post is saved,
+# refresh_similar_posts loads only that post's neighbourhood (the posts
+# sharing a counted word or a liker with it), recomputes its list and
+# merges its new scores into the other lists. Word weights of unrelated
+# pairs drift slowly as the site grows; the nightly rebuild catches up.
+
+SCORE_DIGITS = 6
+# Lemmas per IN (...) lookup
+LEMMA_CHUNK = 500
+
+
+def chunked(items, size=LEMMA_CHUNK):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def document_frequencies(lemmas):
+    """
+    {lemma: number of published posts using it} for the given lemmas.
+    """
+    frequencies = {}
+    for chunk in chunked(sorted(lemmas)):
+        frequencies.update(WordOccurrence.objects.filter(
+            lemma__in=chunk, blogpost__status=1
+        ).values('lemma').annotate(
+            posts=Count('blogpost_id')
+        ).values_list('lemma', 'posts').order_by())
+    return frequencies
+
+
+class Corpus:
+    """
+    Feature vectors of all published posts or, with 'post_ids', of those
+    posts and every post that shares a counted word or a liker with one
+    of them: all a changed post can be compared with. Word weights use
+    the document frequencies of the whole site either way.
+    """
+
+    def __init__(self, post_ids=None):
+        published = Blogpost.objects.filter(status=1)
+        if post_ids is not None:
+            self.total = published.count()
+            published = published.filter(
+                pk__in=self.neighbourhood(post_ids)
+            )
+        posts = list(published.values_list(
+            'pk', 'blog_title', 'media_category_id', 'release_year'
+        ).order_by('pk'))
+        self.partial = post_ids is not None
+        self.ids = [pk for pk, _, _, _ in posts]
+        self.index = {pk: i for i, pk in enumerate(self.ids)}
+        self.categories = [category for _, _, category, _ in posts]
+        self.years = [year for _, _, _, year in posts]
+        if not self.partial:
+            self.total = len(self.ids)
+        self.load_terms({pk: title for pk, title, _, _ in posts})
+        self.load_likes()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def counted(self, document_frequency):
+        """
+        The lemmas that are neither unique to one post nor too common.
+        """
+        max_df = settings.BLOG_SIMILAR_MAX_DF * self.total
+        return {
+            lemma: df for lemma, df in document_frequency.items()
+            if 1 < df <= max_df
+        }
+
+    def neighbourhood(self, post_ids):
+        changed = set(Blogpost.objects.filter(
+            status=1, pk__in=list(post_ids)
+        ).values_list('pk', flat=True))
+        lemmas = set(WordOccurrence.objects.filter(
+            blogpost_id__in=changed
+        ).values_list('lemma', flat=True))
+        related = set(changed)
+        for chunk in chunked(list(self.counted(
+                document_frequencies(lemmas)))):
+            related.update(WordOccurrence.objects.filter(
+                lemma__in=chunk, blogpost__status=1
+            ).values_list('blogpost_id', flat=True))
+        likes = Blogpost.likes.through.objects
+        related.update(likes.filter(
+            user_id__in=likes.filter(
+                blogpost_id__in=changed).values('user_id'),
+            blogpost__status=1,
+        ).values_list('blogpost_id', flat=True))
+        return related
+
+    def load_terms(self, titles):
+        occurrences = WordOccurrence.objects.filter(blogpost__status=1)
+        if self.partial:
+            occurrences = occurrences.filter(blogpost_id__in=self.ids)
+        counts = defaultdict(dict)
+        for post_id, lemma, count in occurrences.values_list(
+                'blogpost_id', 'lemma', 'count').iterator(chunk_size=5000):
+            counts[self.index[post_id]][lemma] = 1 + math.log(count)
+        boost = settings.BLOG_SIMILAR_TITLE_BOOST
+        for post_id, title in titles.items():
+            terms = counts[self.index[post_id]]
+            for lemma in {cached_stem(word) for word in tokenize(title)}:
+                if lemma in terms:
+                    terms[lemma] += boost
+
+        if self.partial:
+            document_frequency = document_frequencies(
+                {lemma for terms in counts.values() for lemma in terms}
+            )
+        else:
+            document_frequency = defaultdict(int)
+            for terms in counts.values():
+                for lemma in terms:
+                    document_frequency[lemma] += 1
+        term_ids, idf = {}, []
+        for lemma, df in self.counted(document_frequency).items():
+            term_ids[lemma] = len(idf)
+            idf.append(math.log((self.total + 1) / (df + 1)) + 1)
+
+        # Unit length {term id: weight} per post, and the postings of
+        # each term
+        self.vectors = []
+        self.postings = defaultdict(list)
+        for i in range(len(self.ids)):
+            vector = {
+                term_ids[lemma]: tf * idf[term_ids[lemma]]
+                for lemma, tf in counts.get(i, {}).items()
+                if lemma in term_ids
+            }
+            norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+            vector = {term: w / norm for term, w in vector.items()}
+            self.vectors.append(vector)
+            for term, weight in vector.items():
+                self.postings[term].append((i, weight))
+        self.term_count = len(idf)
+
+    def load_likes(self):
+        likes = Blogpost.likes.through.objects.filter(blogpost__status=1)
+        if self.partial:
+            likes = likes.filter(blogpost_id__in=self.ids)
+        self.likers = [set() for _ in self.ids]
+        self.fans = defaultdict(list)
+        for post_id, user_id in likes.values_list(
+                'blogpost_id', 'user_id').iterator(chunk_size=5000):
+            i = self.index[post_id]
+            self.likers[i].add(user_id)
+            self.fans[user_id].append(i)
+        self.users = {user: u for u, user in enumerate(self.fans)}
+
+    def combine(self, i, j, text, colikes):
+        weights = settings.BLOG_SIMILAR_WEIGHTS
+        category = self.categories[i]
+        score = weights['text'] * text + weights['likes'] * colikes
+        if category is not None and category == self.categories[j]:
+            score += weights['category']
+        if self.years[i] == self.years[j]:
+            score += weights['year']
+        return round(score, SCORE_DIGITS)
+
+    # ---------------------
+    # Python Scoring
+    # ---------------------
+    def scores(self, i):
+        """
+        {j: score} of every candidate post for post i.
+        """
+        text = defaultdict(float)
+        for term, weight in self.vectors[i].items():
+            for j, other in self.postings[term]:
+                text[j] += weight * other
+        shared = defaultdict(int)
+        for user in self.likers[i]:
+            for j in self.fans[user]:
+                shared[j] += 1
+        return {
+            j: self.combine(i, j, text.get(j, 0.0), shared[j] / math.sqrt(
+                len(self.likers[i]) * len(self.likers[j])
+            ) if j in shared else 0.0)
+            for j in set(text) | set(shared) if j != i
+        }
+
+    # ---------------------
+    # Sparse Matrix Scoring
+    # ---------------------
+    def matrices(self):
+        if not hasattr(self, '_matrices'):
+            rows, columns, data = [], [], []
+            for i, vector in enumerate(self.vectors):
+                rows.extend([i] * len(vector))
+                columns.extend(vector)
+                data.extend(vector.values())
+            terms = sparse.csr_matrix(
+                (data, (rows, columns)),
+                shape=(len(self), max(self.term_count, 1))
+            )
+            rows, columns, data = [], [], []
+            for i, users in enumerate(self.likers):
+                if not users:
+                    continue
+                rows.extend([i] * len(users))
+                columns.extend(self.users[user] for user in users)
+                data.extend([1 / math.sqrt(len(users))] * len(users))
+            likes = sparse.csr_matrix(
+                (data, (rows, columns)),
+                shape=(len(self), max(len(self.users), 1))
+            )
+            weights = settings.BLOG_SIMILAR_WEIGHTS
+            categories = numpy.array(
+                [-1 if c is None else c for c in self.categories]
+            )
+            self._matrices = (
+                terms, likes, categories, numpy.array(self.years), weights
+            )
+        return self._matrices
+
+    def block_scores(self, indices):
+        """
+        Scores of the posts 'indices' against all posts, as a dense
+        (len(indices), len(corpus)) array with -inf for non-candidates.
+        """
+        terms, likes, categories, years, weights = self.matrices()
+        indices = numpy.asarray(indices)
+        text = (terms[indices] @ terms.T).toarray()
+        colikes = (likes[indices] @ likes.T).toarray()
+        candidates = (text > 0) | (colikes > 0)
+        score = weights['text'] * text + weights['likes'] * colikes
+        block_categories = categories[indices][:, None]
+        score += weights['category'] * (
+            (block_categories == categories[None, :]) &
+            (block_categories >= 0)
+        )
+        score += weights['year'] * (years[indices][:, None] == years[None, :])
+        score = numpy.round(score, SCORE_DIGITS)
+        score[~candidates] = -numpy.inf
+        score[numpy.arange(len(indices)), indices] = -numpy.inf
+        return score
+
+    # ---------------------
+    # Top K
+    # ---------------------
+    def neighbours(self, indices, limit=None, vectorized=None, block=256):
+        """
+        {post id: [(similar id, score), ...]} for the given post indices,
+        best first; ties go to the older post.
+        """
+        limit = limit or settings.BLOG_SIMILAR_POSTS
+        if vectorized is None:
+            vectorized = sparse is not None
+        indices = list(indices)
+        results = {}
+        if not vectorized:
+            for i in indices:
+                results[self.ids[i]] = self.top(self.scores(i).items(), limit)
+            return results
+        ids = numpy.array(self.ids)
+        for start in range(0, len(indices), block):
+            chunk = indices[start:start + block]
+            scores = self.block_scores(chunk)
+            for row, i in enumerate(chunk):
+                found = numpy.flatnonzero(scores[row] > -numpy.inf)
+                results[self.ids[i]] = self.top(
+                    ((j, scores[row, j]) for j in found.tolist()), limit
+                )
+        return results
+
+    def top(self, scored, limit):
+        best = sorted(scored, key=lambda item: (-item[1], self.ids[item[0]]))
+        return [(self.ids[j], float(score)) for j, score in best[:limit]]
+
+
+def store_neighbours(results):
+    """
+    Replaces the stored lists of the posts in 'results'.
+    """
+    with transaction.atomic():
+        SimilarPost.objects.filter(blogpost_id__in=list(results)).delete()
+        SimilarPost.objects.bulk_create([
+            SimilarPost(
+                blogpost_id=post_id, similar_id=similar_id, score=score,
+                rank=rank,
+            )
+            for post_id, neighbours in results.items()
+            for rank, (similar_id, score) in enumerate(neighbours, 1)
+        ], batch_size=2000)
+
+
+# ---------------------
+# Public API
+# ---------------------
+def rebuild_similar_posts(vectorized=None, batch_size=1000):
+    """
+    Recomputes the similar posts of every published post. Returns the
+    number of posts.
+    """
+    corpus = Corpus()
+    for start in range(0, len(corpus), batch_size):
+        store_neighbours(corpus.neighbours(
+            range(start, min(start + batch_size, len(corpus))),
+            vectorized=vectorized,
+        ))
+    # Drafts neither have nor appear in lists
+    SimilarPost.objects.filter(
+        Q(blogpost__status=0) | Q(similar__status=0)
+    ).delete()
+    return len(corpus)
+
+
+def refresh_similar_posts(post_ids, vectorized=None):
+    """
+    Brings the lists up to date after the given posts changed. Their own
+    lists are recomputed from their neighbourhood, and their new scores
+    are merged into the lists they were in or now belong in. Returns the
+    ids of the posts whose lists were rewritten.
+    """
+    post_ids = set(post_ids)
+    limit = settings.BLOG_SIMILAR_POSTS
+    corpus = Corpus(post_ids)
+    changed = [corpus.index[pk] for pk in post_ids if pk in corpus.index]
+    # Deleted or unpublished
+    gone = post_ids - set(corpus.index)
+
+    # Similarity is symmetric, so a changed post's scores are also its
+    # scores in the other posts' lists
+    new_scores = defaultdict(dict)
+    for i in changed:
+        for j, score in corpus.scores(i).items():
+            new_scores[corpus.ids[j]][corpus.ids[i]] = score
+    others = set(new_scores) | set(SimilarPost.objects.filter(
+        similar_id__in=post_ids
+    ).values_list('blogpost_id', flat=True))
+    others -= post_ids
+    stored = defaultdict(list)
+    for post_id, similar_id, score in SimilarPost.objects.filter(
+            blogpost_id__in=others).order_by('rank').values_list(
+            'blogpost_id', 'similar_id', 'score'):
+        stored[post_id].append((similar_id, score))
+
+    results, recompute = {}, set()
+    for post_id in others:
+        entries = stored.get(post_id, [])
+        scores = new_scores.get(post_id, {})
+        # A full list that loses a changed post, or ranks it lower, may
+        # now have room for a post that is not in it
+        if len(entries) >= limit and any(
+                similar_id in post_ids
+                and scores.get(similar_id, -math.inf) < score
+                for similar_id, score in entries):
+            recompute.add(post_id)
+            continue
+        merged = sorted(
+            [entry for entry in entries if entry[0] not in post_ids]
+            + list(scores.items()),
+            key=lambda entry: (-entry[1], entry[0])
+        )[:limit]
+        if merged != entries:
+            results[post_id] = merged
+
+    SimilarPost.objects.filter(
+        Q(blogpost_id__in=gone) | Q(similar_id__in=gone)
+    ).delete()
+    results.update(corpus.neighbours(changed, vectorized=vectorized))
+    if recompute:
+        corpus = Corpus(recompute)
+        results.update(corpus.neighbours(
+            [corpus.index[pk] for pk in recompute if pk in corpus.index],
+            vectorized=vectorized,
+        ))
+    store_neighbours(results)
+    return set(results) | gone
+
+
+def similar_posts(post_id):
+    """
+    The stored similar posts of a post, best first, with their authors.
+    """
+    return [
+        link.similar for link in SimilarPost.objects.filter(
+            blogpost_id=post_id
+        ).select_related('similar__author').defer(
+            'similar__content'
+        ).order_by('rank')
+    ]
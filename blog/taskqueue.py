@@ -0,0 +1,271 @@
+# ---------------------
+# Standard Library Imports
+# ---------------------
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+# ---------------------
+# Django Imports
+# ---------------------
+from django.conf import settings
+from django.db import close_old_connections, connection, connections, \
+    transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+# ---------------------
+# Database Task Queue
+# ---------------------
+# Slow work that follows a save (image variants, search indexing, ...)
+# is queued as a Task row in the same transaction as the save and run
+# later by 'manage.py run_tasks', so the request returns without waiting
+# for it and a rolled back save queues nothing.
+#
+# Functions become tasks with the @task decorator and are queued with
+# their .enqueue(*args); arguments must be JSON serialisable, normally
+# primary keys. Workers take the oldest due task with
+# SELECT ... FOR UPDATE SKIP LOCKED where the database supports it
+# (PostgreSQL), so any number of workers can poll the same table without
+# waiting on each other. On SQLite, which has no row locks and lets one
+# writer in at a time, a task is taken with a conditional UPDATE on its
+# status instead.
+#
+# A task that raises is retried after an exponential backoff with jitter
+# (BLOG_TASK_RETRY_DELAY doubled per attempt) until max_attempts, then
+# left as Failed with its traceback. A task held by a worker for longer
+# than BLOG_TASK_TIMEOUT seconds (a crashed process) is queued again.
+#
+# With BLOG_TASKS_EAGER, .enqueue() runs the function at once instead,
+# as before the queue existed.
+
+QUEUED, RUNNING, FAILED = 0, 1, 2
+
+registry = {}
+
+
+class TaskFunction:
+    """
+    A registered task: call it directly, or queue it with .enqueue().
+    """
+
+    def __init__(self, function, name, max_attempts, unique):
+        self.function = function
+        self.name = name
+        self.max_attempts = max_attempts
+        self.unique = unique
+        self.__doc__ = function.__doc__
+
+    def __call__(self, *args):
+        return self.function(*args)
+
+    def enqueue(self, *args, delay=0):
+        """
+        Queues one call. Unique tasks are not queued again while an
+        identical call is still waiting. Returns the Task, or None if
+        the call ran eagerly or was a duplicate.
+        """
+        if settings.BLOG_TASKS_EAGER:
+            self.function(*args)
+            return None
+        args = list(args)
+        key = task_key(self.name, args)
+        if self.unique and Task.objects.filter(
+                key=key, status=QUEUED).exists():
+            return None
+        return Task.objects.create(
+            name=self.name, args=args, key=key,
+            max_attempts=self.max_attempts,
+            run_after=timezone.now() + timedelta(seconds=delay),
+        )
+
+
+def task(function=None, *, name=None, max_attempts=5, unique=True):
+    """
+    Registers a function as a task under its dotted path.
+    """
+    def register(function):
+        task_function = TaskFunction(
+            function, name or f'{function.__module__}.{function.__name__}',
+            max_attempts, unique,
+        )
+        registry[task_function.name] = task_function
+        return task_function
+    return register(function) if function else register
+
+
+def task_key(name, args):
+    return f'{name}:{json.dumps(args, sort_keys=True)}'[:255]
+
+
+def retry_delay(attempts):
+    """
+    Seconds before retrying a task that has failed 'attempts' times.
+    """
+    delay = settings.BLOG_TASK_RETRY_DELAY * 2 ** (attempts - 1)
+    delay = min(delay, settings.BLOG_TASK_MAX_RETRY_DELAY)
+    return delay * random.uniform(0.8, 1.2)
+
+
+# ---------------------
+# Claiming and Running
+# ---------------------
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def claim_task(worker=None):
+    """
+    Marks the oldest due task as running for this worker and returns it,
+    or None when nothing is due.
+    """
+    worker = worker or worker_name()
+    now = timezone.now()
+    due = Task.objects.filter(status=QUEUED, run_after__lte=now).order_by(
+        'run_after', 'id'
+    )
+    claimed = {
+        'status': RUNNING, 'locked_by': worker, 'locked_on': now,
+        'attempts': F('attempts') + 1,
+    }
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            task_id = due.select_for_update(skip_locked=True).values_list(
+                'pk', flat=True
+            ).first()
+            if task_id is None:
+                return None
+            Task.objects.filter(pk=task_id).update(**claimed)
+    else:
+        # Another worker may take a candidate first; try the next one
+        for task_id in due.values_list('pk', flat=True)[:10]:
+            if Task.objects.filter(pk=task_id, status=QUEUED).update(
+                    **claimed):
+                break
+        else:
+            return None
+    return Task.objects.get(pk=task_id)
+
+
+def run_task(queued):
+    """
+    Runs a claimed task: deletes it when it succeeds, otherwise queues
+    a retry or marks it Failed. Returns True on success.
+    """
+    task_function = registry.get(queued.name)
+    try:
+        if task_function is None:
+            raise LookupError(f'Unknown task {queued.name!r}')
+        task_function(*queued.args)
+    except Exception:
+        error = traceback.format_exc()
+        if task_function is not None and \
+                queued.attempts < queued.max_attempts:
+            logger.warning(
+                'Task %s failed (attempt %d of %d), retrying', queued,
+                queued.attempts, queued.max_attempts
+            )
+            Task.objects.filter(pk=queued.pk).update(
+                status=QUEUED, locked_by='', locked_on=None,
+                last_error=error,
+                run_after=timezone.now() + timedelta(
+                    seconds=retry_delay(queued.attempts)
+                ),
+            )
+        else:
+            logger.error('Task %s failed for good', queued)
+            Task.objects.filter(pk=queued.pk).update(
+                status=FAILED, locked_by='', last_error=error
+            )
+        return False
+    Task.objects.filter(pk=queued.pk).delete()
+    return True
+
+
+def run_next(worker=None):
+    """
+    Claims and runs one task. Returns False when none was due.
+    """
+    queued = claim_task(worker)
+    if queued is None:
+        return False
+    run_task(queued)
+    return True
+
+
+def run_pending(limit=None):
+    """
+    Runs due tasks in this thread until none are left (or 'limit' have
+    run). Returns the number run.
+    """
+    count = 0
+    while (limit is None or count < limit) and run_next():
+        count += 1
+    return count
+
+
+def requeue_stale(timeout=None):
+    """
+    Queues again the tasks held longer than 'timeout' seconds by a
+    worker that has probably died, unless they are out of attempts.
+    Returns the number requeued.
+    """
+    timeout = settings.BLOG_TASK_TIMEOUT if timeout is None else timeout
+    stale = Task.objects.filter(
+        status=RUNNING,
+        locked_on__lt=timezone.now() - timedelta(seconds=timeout),
+    )
+    # A task that keeps killing its worker is not tried forever
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=FAILED, locked_by='', last_error='Worker timed out.'
+    )
+    return stale.update(status=QUEUED, locked_by='', locked_on=None)
+
+
+# ---------------------
+# Worker
+# ---------------------
+class Worker:
+    """
+    Runs tasks on 'threads' threads of this process until 'stop' is set.
+    Idle threads poll every 'poll_interval' seconds.
+    """
+
+    def __init__(self, threads=1, poll_interval=1.0, stop=None):
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.stop = stop or threading.Event()
+
+    def run(self):
+        workers = [
+            threading.Thread(target=self.loop, name=f'task-worker-{i}')
+            for i in range(self.threads)
+        ]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+    def loop(self):
+        name = worker_name()
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                try:
+                    if run_next(name):
+                        continue
+                    requeue_stale()
+                except Exception:
+                    # Database errors: log, wait and try again
+                    logger.exception('Task worker %s failed', name)
+                self.stop.wait(self.poll_interval)
+        finally:
+            connections.close_all()
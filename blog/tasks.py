@@ -0,0 +1,98 @@
+# ---------------------
+# Django Imports
+# ---------------------
+from .caching import invalidate_detail
+from .images import refresh_variants
+from .models import Blogpost, UserProfile
+from .personal_feed import build_feed, fan_out_post
+from .search import index_posts, remove_posts
+from .similarity import refresh_similar_posts
+from .taskqueue import task
+from .vocabulary import analyze_posts
+
+# ---------------------
+# Background Tasks
+# ---------------------
+# Work queued by the save signals in blog/signals.py and run by
+# 'manage.py run_tasks' (see blog/taskqueue.py). Tasks take primary keys
+# and load the current row, so a task queued several times, or run after
+# later edits, still does the right thing.
+
+
+@task
+def build_blogpost_image_variants(post_id):
+    blogpost = Blogpost.objects.filter(pk=post_id).only(
+        'id', 'featured_image', 'featured_image_variants'
+    ).first()
+    if blogpost is not None:
+        refresh_variants(
+            blogpost, 'featured_image', 'featured_image_variants', 'featured'
+        )
+
+
+@task
+def build_profile_image_variants(profile_id):
+    profile = UserProfile.objects.filter(pk=profile_id).only(
+        'id', 'profile_image', 'profile_image_variants'
+    ).first()
+    if profile is not None:
+        refresh_variants(
+            profile, 'profile_image', 'profile_image_variants', 'profile'
+        )
+
+
+@task
+def index_blogpost(post_id):
+    """
+    Brings one post's search index entry up to date, removing it if the
+    post has been deleted.
+    """
+    blogpost = Blogpost.objects.filter(pk=post_id).only(
+        'id', 'status', 'blog_title', 'excerpt', 'content'
+    ).first()
+    if blogpost is None:
+        remove_posts([post_id])
+    else:
+        index_posts([blogpost])
+
+
+@task
+def analyze_blogpost_vocabulary(post_id):
+    """
+    Refreshes one post's vocabulary profile and word index entries.
+    """
+    blogpost = Blogpost.objects.filter(pk=post_id).only(
+        'id', 'blog_title', 'content'
+    ).first()
+    if blogpost is not None:
+        # One post is counted faster without building NumPy arrays
+        analyze_posts([blogpost], vectorized=False)
+        # The detail page header shows the profile
+        invalidate_detail(post_id)
+    # The similar posts are computed from the word index
+    refresh_similar.enqueue([post_id])
+
+
+@task
+def refresh_similar(post_ids):
+    """
+    Updates the similar posts lists affected by changes to the posts.
+    """
+    invalidate_detail(*refresh_similar_posts(post_ids))
+
+
+@task
+def build_personal_feed(user_id):
+    """
+    Rebuilds one user's personal feed from their current interests.
+    """
+    build_feed(user_id)
+
+
+@task
+def fan_out_blogpost(post_id):
+    """
+    Writes a saved post into the personal feeds, or takes it out of them
+    once it is no longer published.
+    """
+    fan_out_post(post_id)
@@ -1,3 +1,1627 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.contrib.staticfiles.management.commands import collectstatic
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.core.cache import cache
+from django.db import connection, connections, OperationalError, \
+    transaction
+from django.db.models.query import QuerySet
+from django.template.loader import render_to_string
+from django.templatetags.static import static
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, reverse
+from django.utils import timezone
+from nederlearn.dbconnections import install_connection_metrics, \
+    metrics as connection_metrics
+from nederlearn.staticfiles import StaticFilesMiddleware
+from .admin import CommentAdmin, moderate_comments
+from .caching import invalidate_detail
+from .events import daily_engagement, event_buffer, rollup_events
+from .models import Blogpost, Bookmark, Comment, EngagementEvent, \
+    EngagementRollup, FeedEntry, Like, MediaCategory, PersonalFeed, \
+    PostVocabulary, RESERVED_SLUGS, SimilarPost, Task, UserProfile, \
+    WordOccurrence, toggle_like
+from .pagination import CursorPaginator, decode_cursor, InvalidCursor
+from .personal_feed import build_feed, fan_out_post
+from .search import search_post_ids
+from . import similarity
+from .similarity import rebuild_similar_posts, similar_posts
+from .taskqueue import claim_task, FAILED, QUEUED, requeue_stale, \
+    run_pending, task
+from .transfer import JsonlImporter
+from .trending import compute_scores, refresh_scores
+from . import vocabulary
+from .vocabulary import analyze_posts, posts_using_word, rebuild_vocabulary
+
+
+# ---------------------
+# Test Helpers
+# ---------------------
+def make_post(author, index, category=None, **extra):
+    """
+    Creates a published blogpost with the minimum required fields.
+    """
+    fields = {
+        'blog_title': f'Post {index}',
+        'slug': f'post-{index}',
+        'author': author,
+        'content': '<p>Hallo wereld</p>',
+        'excerpt': 'Hallo',
+        'media_category': category,
+        'release_year': 2000,
+        'media_link': 'https://example.com',
+    }
+    fields.update(extra)
+    return Blogpost.objects.create(**fields)
+
+
+# The Cloudinary static storage needs network access, so the tests use
+# the plain filesystem storage instead. The shared database cache would
+# add its own queries to the counts, so the budgets are measured with
+# the local memory cache.
+@override_settings(
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+    CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }},
+)
+class QueryBudgetTestCase(TestCase):
+    """
+    Base class for tests that pin the number of queries a page may run.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader', password='pass')
+        cls.category = MediaCategory.objects.create(media_name='Movies')
+        MediaCategory.objects.create(media_name='Books')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def create_posts(self, count, category=None):
+        writers = [
+            User.objects.create_user(f'writer{i}') for i in range(count)
+        ]
+        posts = []
+        for i, writer in enumerate(writers):
+            post = make_post(writer, i, category or self.category)
+            post.likes.add(self.user, writer)
+            Comment.objects.create(
+                blogpost=post, user=writer, body='Leuk', approved=True
+            )
+            posts.append(post)
+        return posts
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+
+# ---------------------
+# Query Budget Tests
+# ---------------------
+class BlogPostListQueryTests(QueryBudgetTestCase):
+    # session + user + category catalogue + page of posts + viewer's
+    # likes/bookmarks for the page (no COUNT(*) in cursor mode)
+    BUDGET = 5
+    # the category catalogue comes from the cache
+    WARM_BUDGET = 4
+
+    def test_home_page_query_budget(self):
+        self.create_posts(8)
+        with self.assertNumQueries(self.BUDGET):
+            response = self.client.get(reverse('home'))
+        self.assertEqual(len(response.context['blogposts']), 8)
+        self.assertContains(response, 'writer7')
+        with self.assertNumQueries(self.WARM_BUDGET):
+            self.client.get(reverse('home'))
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        self.create_posts(1)
+        single = self.count_queries(reverse('home'))
+        for i in range(1, 8):
+            make_post(User.objects.create_user(f'extra{i}'), 100 + i)
+        self.assertEqual(single, self.count_queries(reverse('home')))
+
+    def test_category_filter_query_budget(self):
+        self.create_posts(8)
+        url = reverse('home') + '?category=Movies'
+        with self.assertNumQueries(self.BUDGET):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['blogposts']), 8)
+
+    def test_category_filter_excludes_other_categories(self):
+        self.create_posts(3)
+        books = MediaCategory.objects.get(media_name='Books')
+        make_post(self.user, 99, books)
+        for value in (books.pk, 'Books'):
+            response = self.client.get(reverse('home'), {'category': value})
+            self.assertEqual(
+                [post.slug for post in response.context['blogposts']],
+                ['post-99']
+            )
+        response = self.client.get(reverse('home'), {'category': 'Opera'})
+        self.assertEqual(list(response.context['blogposts']), [])
+
+    def test_category_catalogue_counts_published_posts(self):
+        self.create_posts(2)
+        make_post(self.user, 98, self.category, status=0)
+        counts = {
+            category['media_name']: category['post_count']
+            for category in self.client.get(
+                reverse('home')).context['categories']
+        }
+        self.assertEqual(counts, {'Books': 0, 'Movies': 2})
+        MediaCategory.objects.create(media_name='Podcasts')
+        self.assertEqual(
+            len(self.client.get(reverse('home')).context['categories']), 3
+        )
+
+
+    @override_settings(BLOG_FEED_PAGINATION='offset')
+    def test_offset_mode_adds_only_the_count_query(self):
+        self.create_posts(8)
+        with self.assertNumQueries(self.BUDGET + 1):
+            self.client.get(reverse('home'))
+
+    def test_engagement_state_is_resolved_for_the_whole_page(self):
+        posts = self.create_posts(8)
+        posts[0].bookmarks.add(self.user)
+        posts[1].likes.remove(self.user)
+        response = self.client.get(reverse('home'))
+        state = {
+            post.slug: (post.is_liked, post.is_bookmarked)
+            for post in response.context['blogposts']
+        }
+        self.assertEqual(state['post-0'], (True, True))
+        self.assertEqual(state['post-1'], (False, False))
+        self.assertEqual(state['post-2'], (True, False))
+        self.assertContains(response, 'fas fa-bookmark', count=1)
+
+
+# ---------------------
+# Cursor Pagination Tests
+# ---------------------
+class CursorPaginationTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        super().setUp()
+        posts = [make_post(self.user, i, self.category) for i in range(10)]
+        # Give every post the same timestamp so the id tie-breaker is used.
+        Blogpost.objects.update(created_on=timezone.now())
+        self.expected = [post.pk for post in reversed(posts)]
+
+    def test_walks_forward_and_back_without_gaps(self):
+        paginator = CursorPaginator(Blogpost.objects.all(), 3)
+        seen, pages, token = [], [], None
+        while True:
+            page = paginator.page(token)
+            pages.append(page)
+            seen.extend(post.pk for post in page)
+            if not page.has_next():
+                break
+            token = page.next_cursor
+        self.assertEqual(seen, self.expected)
+        self.assertFalse(pages[0].has_previous())
+
+        back = paginator.page(pages[-1].previous_cursor)
+        self.assertEqual([post.pk for post in back], self.expected[6:9])
+        self.assertTrue(back.has_next())
+
+    def test_cursor_keeps_category_filter(self):
+        books = MediaCategory.objects.get(media_name='Books')
+        make_post(self.user, 50, books)
+        response = self.client.get(reverse('home') + '?category=Movies')
+        query = response.context['next_page_query']
+        self.assertIn('category=Movies', query)
+        response = self.client.get(reverse('home') + '?' + query)
+        self.assertNotIn(
+            'post-50', [post.slug for post in response.context['blogposts']]
+        )
+
+    def test_invalid_cursor_returns_404(self):
+        with self.assertRaises(InvalidCursor):
+            decode_cursor('not-a-cursor')
+        response = self.client.get(reverse('home') + '?cursor=garbage')
+        self.assertEqual(response.status_code, 404)
+
+
+class EngagementFeedTests(QueryBudgetTestCase):
+    # session + user + category catalogue + page of through rows with
+    # their posts + viewer's likes/bookmarks for the page
+    BUDGET = 5
+
+    def test_feed_is_ordered_by_engagement_time(self):
+        posts = self.create_posts(3)
+        # create_posts liked them in creation order; bookmark in reverse
+        for post in reversed(posts):
+            post.bookmarks.add(self.user)
+        make_post(self.user, 50, status=0).bookmarks.add(self.user)
+        with self.assertNumQueries(self.BUDGET):
+            response = self.client.get(reverse('my_bookmarks'))
+        self.assertEqual(
+            [post.slug for post in response.context['blogposts']],
+            ['post-0', 'post-1', 'post-2']
+        )
+        self.assertTrue(all(
+            post.is_liked and post.is_bookmarked
+            for post in response.context['blogposts']
+        ))
+        response = self.client.get(reverse('my_likes'))
+        self.assertEqual(
+            [post.slug for post in response.context['blogposts']],
+            ['post-2', 'post-1', 'post-0']
+        )
+
+    def test_feed_query_count_does_not_grow_with_page_size(self):
+        self.create_posts(1)
+        single = self.count_queries(reverse('my_likes'))
+        for i in range(1, 8):
+            make_post(User.objects.create_user(f'extra{i}'), 100 + i) \
+                .likes.add(self.user)
+        self.assertEqual(single, self.count_queries(reverse('my_likes')))
+
+    def test_feed_requires_login(self):
+        self.client.logout()
+        response = self.client.get(reverse('my_bookmarks'))
+        self.assertRedirects(
+            response, reverse('account_login'), fetch_redirect_response=False
+        )
+
+
+class BlogPostDetailQueryTests(QueryBudgetTestCase):
+    # session + user + post stub + full post + first comment page +
+    # comment count + similar posts + liked check
+    COLD_BUDGET = 8
+    # session + user + post stub + liked check
+    WARM_BUDGET = 4
+
+    def setUp(self):
+        super().setUp()
+        self.post = self.create_posts(1)[0]
+        self.url = reverse('blogpost_detail', args=[self.post.slug])
+
+    def test_detail_page_query_budget(self):
+        for i in range(20):
+            writer = User.objects.create_user(f'commenter{i}')
+            Comment.objects.create(
+                blogpost=self.post, user=writer, body='Mooi', approved=True
+            )
+        with self.assertNumQueries(self.COLD_BUDGET):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'commenter8')
+        self.assertNotContains(response, 'commenter9')
+        self.assertEqual(response.context['fragments']['comment_count'], 21)
+        with self.assertNumQueries(self.WARM_BUDGET):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'commenter8')
+
+    def test_later_comment_pages_come_from_the_fragment_endpoint(self):
+        for i in range(24):
+            writer = User.objects.create_user(f'commenter{i}')
+            Comment.objects.create(
+                blogpost=self.post, user=writer, body='Mooi', approved=True
+            )
+        Comment.objects.create(
+            blogpost=self.post, user=self.user, body='Verborgen'
+        )
+        cursor = self.client.get(
+            self.url
+        ).context['fragments']['next_comments_cursor']
+        url = reverse('comment_page', args=[self.post.slug])
+        # post id + comment page with authors joined + session
+        with self.assertNumQueries(3):
+            page = self.client.get(url, {'cursor': cursor}).json()
+        self.assertIn('commenter9', page['html'])
+        self.assertIn('commenter18', page['html'])
+        self.assertNotIn('commenter8', page['html'])
+        last = self.client.get(url, {'cursor': page['next_cursor']}).json()
+        self.assertIn('commenter23', last['html'])
+        self.assertNotIn('Verborgen', last['html'])
+        self.assertIsNone(last['next_cursor'])
+
+    def test_liked_state_is_per_viewer(self):
+        self.client.get(self.url)
+        self.assertTrue(self.client.get(self.url).context['liked'])
+        self.client.force_login(User.objects.create_user('stranger'))
+        self.assertFalse(self.client.get(self.url).context['liked'])
+
+    def test_cache_is_invalidated_by_edits_and_comment_approval(self):
+        self.client.get(self.url)
+        self.post.content = '<p>Nieuwe tekst</p>'
+        self.post.save()
+        self.assertContains(self.client.get(self.url), 'Nieuwe tekst')
+
+        pending = Comment.objects.create(
+            blogpost=self.post, user=self.user, body='Wacht even'
+        )
+        self.assertNotContains(self.client.get(self.url), 'Wacht even')
+        CommentAdmin(Comment, admin.site).approved_comments(
+            None, Comment.objects.filter(pk=pending.pk)
+        )
+        self.assertContains(self.client.get(self.url), 'Wacht even')
+
+
+# ---------------------
+# Engagement Counter Tests
+# ---------------------
+class EngagementCounterTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.post = make_post(User.objects.create_user('writer'), 1)
+        self.other = User.objects.create_user('other')
+
+    def counts(self):
+        self.post.refresh_from_db(fields=['like_count', 'bookmark_count'])
+        return self.post.like_count, self.post.bookmark_count
+
+    def test_forward_add_and_remove(self):
+        self.post.likes.add(self.user, self.other)
+        self.post.bookmarks.add(self.user)
+        self.assertEqual(self.counts(), (2, 1))
+        self.post.likes.remove(self.other)
+        self.post.bookmarks.remove(self.user)
+        self.assertEqual(self.counts(), (1, 0))
+
+    def test_reverse_add_and_clear(self):
+        second = make_post(self.other, 2)
+        self.user.blogpost_likes.add(self.post, second)
+        self.assertEqual(self.counts(), (1, 0))
+        second.refresh_from_db(fields=['like_count'])
+        self.assertEqual(second.like_count, 1)
+        self.user.blogpost_likes.clear()
+        self.assertEqual(self.counts(), (0, 0))
+        second.refresh_from_db(fields=['like_count'])
+        self.assertEqual(second.like_count, 0)
+        self.post.likes.add(self.user, self.other)
+        self.post.likes.clear()
+        self.assertEqual(self.counts(), (0, 0))
+
+    def test_recount_check_reports_drift(self):
+        self.post.likes.add(self.user)
+        call_command('recount_engagement', check=True, stdout=StringIO())
+        Blogpost.objects.filter(pk=self.post.pk).update(like_count=5)
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('recount_engagement', check=True, stdout=out)
+        self.assertIn(
+            f'Blogpost {self.post.pk}: like_count is 5, expected 1',
+            out.getvalue()
+        )
+        call_command('recount_engagement', stdout=StringIO())
+        self.assertEqual(self.counts(), (1, 0))
+
+
+# ---------------------
+# Post Card Cache Tests
+# ---------------------
+class PostCardCacheTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.posts = self.create_posts(3)
+
+    def rendered_cards(self):
+        with mock.patch('blog.caching.render_to_string',
+                        wraps=render_to_string) as render:
+            response = self.client.get(reverse('home'))
+        return response, [
+            call.args[1]['blogpost'].slug for call in render.call_args_list
+        ]
+
+    def test_only_stale_cards_are_rendered(self):
+        response, rendered = self.rendered_cards()
+        self.assertEqual(len(rendered), 3)
+        self.assertContains(response, 'Post 1')
+        self.assertEqual(self.rendered_cards()[1], [])
+
+        self.posts[1].excerpt = 'Nieuw'
+        self.posts[1].save()
+        self.posts[2].likes.remove(self.user)
+        response, rendered = self.rendered_cards()
+        self.assertEqual(sorted(rendered), ['post-1', 'post-2'])
+        self.assertContains(response, 'Nieuw')
+
+    def test_author_changes_bump_the_card_version(self):
+        self.rendered_cards()
+        author = self.posts[0].author
+        author.username = 'schrijver'
+        author.save()
+        response, rendered = self.rendered_cards()
+        self.assertEqual(rendered, ['post-0'])
+        self.assertContains(response, 'schrijver')
+        author.last_login = timezone.now()
+        author.save(update_fields=['last_login'])
+        self.assertEqual(self.rendered_cards()[1], [])
+
+    def test_cards_show_each_viewers_own_state(self):
+        self.rendered_cards()
+        self.client.force_login(User.objects.create_user('stranger'))
+        response, rendered = self.rendered_cards()
+        self.assertEqual(len(rendered), 3)
+        self.assertNotContains(response, 'fas fa-heart')
+
+
+# ---------------------
+# Trending Feed Tests
+# ---------------------
+class TrendingTests(QueryBudgetTestCase):
+
+    def assertScoresExact(self):
+        exact = compute_scores()
+        for pk, score in Blogpost.objects.values_list('pk', 'hot_score'):
+            self.assertAlmostEqual(score, exact[pk], places=6)
+
+    def test_incremental_scores_match_a_rebuild(self):
+        posts = self.create_posts(3)
+        posts[0].bookmarks.add(self.user)
+        Comment.objects.create(
+            blogpost=posts[1], user=self.user, body='Top', approved=True
+        )
+        self.assertScoresExact()
+        posts[0].likes.remove(self.user)
+        posts[1].comments.get(body='Top').delete()
+        self.assertScoresExact()
+        Blogpost.objects.update(hot_score=0)
+        call_command('rebuild_trending', stdout=StringIO())
+        self.assertScoresExact()
+
+    def test_recent_engagement_outranks_newer_posts(self):
+        old, new = self.create_posts(2)
+        Blogpost.objects.filter(pk=old.pk).update(
+            created_on=timezone.now() - timezone.timedelta(days=3)
+        )
+        refresh_scores([old.pk])
+        url = reverse('trending')
+        self.assertEqual(
+            [post.pk for post in self.client.get(url).context['blogposts']],
+            [new.pk, old.pk]
+        )
+        for i in range(10):
+            old.likes.add(User.objects.create_user(f'fan{i}'))
+        self.assertLessEqual(
+            self.count_queries(url), BlogPostListQueryTests.BUDGET
+        )
+        self.assertEqual(
+            [post.pk for post in self.client.get(url).context['blogposts']],
+            [old.pk, new.pk]
+        )
+
+    def test_trending_pages_use_score_cursors(self):
+        self.create_posts(10)
+        url = reverse('trending')
+        first = self.client.get(url)
+        second = self.client.get(url + '?' + first.context['next_page_query'])
+        seen = [post.pk for post in first.context['blogposts']] + \
+            [post.pk for post in second.context['blogposts']]
+        self.assertEqual(len(set(seen)), 10)
+        self.assertEqual(
+            seen, list(Blogpost.objects.order_by(
+                '-hot_score', '-id').values_list('pk', flat=True))
+        )
+
+
+# ---------------------
+# Engagement Event Log Tests
+# ---------------------
+@override_settings(BLOG_EVENT_BACKGROUND_FLUSH=False, BLOG_EVENT_FLUSH_SIZE=3)
+class EngagementEventTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        super().setUp()
+        event_buffer.reset()
+        self.addCleanup(event_buffer.reset)
+        self.post = self.create_posts(1)[0]
+
+    def test_events_are_buffered_and_flushed_in_batches(self):
+        url = reverse('like_unlike', args=[self.post.slug])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url)
+        self.assertEqual(event_buffer.snapshot()['buffered'], 2)
+        self.assertFalse(EngagementEvent.objects.exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.bookmarks.add(self.user)
+        self.assertEqual(
+            list(EngagementEvent.objects.order_by('pk').values_list(
+                'kind', 'blogpost_id', 'user_id')),
+            [(2, self.post.pk, self.user.pk), (1, self.post.pk, self.user.pk),
+             (3, self.post.pk, self.user.pk)]
+        )
+        self.assertEqual(event_buffer.snapshot()['buffered'], 0)
+
+    def test_rolled_back_changes_log_nothing(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.post.bookmarks.add(self.user)
+                    raise OperationalError
+            except OperationalError:
+                pass
+        self.assertEqual(event_buffer.snapshot()['buffered'], 0)
+
+    def test_failed_flush_keeps_events(self):
+        event_buffer.append('like', self.post.pk, self.user.pk)
+        with mock.patch.object(event_buffer, 'write',
+                               side_effect=OperationalError):
+            with self.assertLogs('blog.events', 'ERROR'):
+                self.assertEqual(event_buffer.flush(), 0)
+        self.assertEqual(event_buffer.snapshot()['buffered'], 1)
+        self.assertEqual(event_buffer.flush(), 1)
+
+    @override_settings(BLOG_EVENT_BACKGROUND_FLUSH=True,
+                       BLOG_EVENT_FLUSH_INTERVAL=60)
+    def test_flusher_thread_writes_full_buffers_and_on_stop(self):
+        written = []
+        flushed = threading.Event()
+
+        def write(events):
+            written.append(len(events))
+            flushed.set()
+
+        with mock.patch.object(event_buffer, 'write', side_effect=write):
+            for _ in range(3):
+                event_buffer.append('like', self.post.pk)
+            self.assertTrue(flushed.wait(5))
+            event_buffer.append('comment', self.post.pk)
+            event_buffer.stop()
+        self.assertEqual(written, [3, 1])
+        self.assertFalse(event_buffer.snapshot()['flusher_running'])
+
+    def test_rollup_follows_insert_order(self):
+        now = timezone.now()
+        old = now - timezone.timedelta(days=1, minutes=10)
+        EngagementEvent.objects.bulk_create([
+            EngagementEvent(kind=kind, blogpost_id=self.post.pk,
+                            created_on=when)
+            for kind, when in ((1, old), (1, old), (2, old), (5, old),
+                               (1, now))
+        ])
+        # Just inserted, however old: left for a later run
+        self.assertEqual(rollup_events(), 0)
+        EngagementRollup.objects.update(
+            seen_on=now - timezone.timedelta(minutes=10)
+        )
+        # Created long ago, but inserted after the last run
+        EngagementEvent.objects.create(
+            kind=1, blogpost_id=self.post.pk, created_on=old
+        )
+        call_command('rollup_engagement', stdout=StringIO())
+        self.assertEqual(
+            [(row.likes, row.unlikes, row.comments)
+             for row in daily_engagement(self.post.pk)],
+            [(2, 1, 1), (1, 0, 0)]
+        )
+        self.assertEqual(rollup_events(lag=0), 1)
+        self.assertEqual(rollup_events(lag=0), 0)
+        self.assertEqual(
+            [row.likes for row in daily_engagement(self.post.pk)], [3, 1]
+        )
+
+
+# ---------------------
+# URL Tests
+# ---------------------
+class ReservedSlugTests(TestCase):
+
+    def test_fixed_top_level_routes_are_reserved(self):
+        def first_segments(patterns, prefix=''):
+            for pattern in patterns:
+                route = prefix + str(pattern.pattern)
+                if hasattr(pattern, 'url_patterns') and not route:
+                    yield from first_segments(pattern.url_patterns)
+                elif route and '<' not in route.split('/')[0]:
+                    yield route.split('/')[0]
+        segments = set(first_segments(get_resolver().url_patterns))
+        self.assertIn('trending', segments)
+        self.assertEqual(segments - RESERVED_SLUGS, set())
+
+    def test_post_with_a_reserved_slug_is_rejected(self):
+        post = Blogpost(
+            blog_title='Trending', slug='trending', content='<p>Hoi</p>',
+            author=User.objects.create_user('writer'), release_year=2000,
+            media_link='https://example.com',
+        )
+        with self.assertRaisesMessage(ValidationError, 'trending'):
+            post.full_clean()
+        post.slug = 'trending-2'
+        post.full_clean()
+
+
+# ---------------------
+# Task Queue Tests
+# ---------------------
+@task(name='tests.flaky', max_attempts=2)
+def flaky_task(fail):
+    if fail:
+        raise ValueError('Not yet')
+
+
+class TaskQueueTests(QueryBudgetTestCase):
+
+    def test_saves_queue_indexing_and_image_variants(self):
+        post = make_post(
+            self.user, 1, featured_image='image/upload/v1/a.jpg',
+            blog_title='Fietsen in Amsterdam'
+        )
+        self.assertEqual(
+            sorted(Task.objects.values_list('name', flat=True)),
+            ['blog.tasks.analyze_blogpost_vocabulary',
+             'blog.tasks.build_blogpost_image_variants',
+             'blog.tasks.fan_out_blogpost',
+             'blog.tasks.index_blogpost']
+        )
+        self.assertEqual(search_post_ids('fietsen'), [])
+        post.save()
+        # Still queued tasks are not queued twice
+        self.assertEqual(Task.objects.count(), 4)
+        call_command('run_tasks', '--once', stdout=StringIO())
+        self.assertFalse(Task.objects.exists())
+        self.assertEqual(search_post_ids('fietsen'), [post.pk])
+        post.refresh_from_db()
+        self.assertIn('w_320', post.featured_image_variants['thumbnail'])
+
+    def test_failed_tasks_are_retried_with_backoff(self):
+        flaky_task.enqueue(True)
+        with self.assertLogs('blog.taskqueue', 'WARNING'):
+            self.assertEqual(run_pending(), 1)
+        queued = Task.objects.get()
+        self.assertEqual((queued.status, queued.attempts), (QUEUED, 1))
+        self.assertIn('Not yet', queued.last_error)
+        self.assertGreater(queued.run_after, timezone.now())
+        # Not due yet
+        self.assertEqual(run_pending(), 0)
+        Task.objects.update(run_after=timezone.now())
+        with self.assertLogs('blog.taskqueue', 'ERROR'):
+            run_pending()
+        self.assertEqual(Task.objects.get().status, FAILED)
+
+    def test_claimed_tasks_are_not_taken_twice(self):
+        first = flaky_task.enqueue(False)
+        second = flaky_task.enqueue(True)
+        self.assertEqual(claim_task('a').pk, first.pk)
+        self.assertEqual(claim_task('b').pk, second.pk)
+        self.assertIsNone(claim_task('c'))
+        Task.objects.filter(pk=first.pk).update(
+            locked_on=timezone.now() - timezone.timedelta(hours=1)
+        )
+        self.assertEqual(requeue_stale(), 1)
+        self.assertEqual(claim_task('c').pk, first.pk)
+
+    @override_settings(BLOG_TASKS_EAGER=True)
+    def test_eager_mode_runs_tasks_at_once(self):
+        self.assertIsNone(flaky_task.enqueue(False))
+        self.assertFalse(Task.objects.exists())
+
+
+# ---------------------
+# Vocabulary Tests
+# ---------------------
+class VocabularyTests(QueryBudgetTestCase):
+    EASY = '<p>Ik heb een boek. Het is een goed boek en ik lees het graag.</p>'
+    HARD = ('<p>De omvangrijke hervorming van het hoger onderwijs leidde '
+            'tot ongenoegen bij universiteiten en studentenorganisaties.</p>')
+
+    def test_saved_posts_are_analyzed_by_a_task(self):
+        post = make_post(self.user, 1, content=self.EASY)
+        self.assertFalse(PostVocabulary.objects.exists())
+        run_pending()
+        profile = PostVocabulary.objects.get(blogpost=post)
+        # 'Post' from the title plus fourteen words in the body
+        self.assertEqual(profile.word_count, 15)
+        self.assertEqual(profile.level, 'A1')
+        self.assertEqual(
+            WordOccurrence.objects.get(blogpost=post, lemma='boek').count, 2
+        )
+        post.content = self.HARD
+        post.save()
+        run_pending()
+        profile.refresh_from_db()
+        self.assertIn(profile.level, ('C1', 'C2'))
+        self.assertFalse(WordOccurrence.objects.filter(
+            blogpost=post, lemma='boek').exists())
+
+    def test_word_lookup_matches_inflections_in_one_query(self):
+        easy = make_post(self.user, 1, content=self.EASY)
+        make_post(self.user, 2, content=self.HARD)
+        make_post(self.user, 3, content='<p>Boeken!</p>', status=0)
+        rebuild_vocabulary()
+        self.assertEqual(
+            [post.pk for post in posts_using_word('Boeken')], [easy.pk]
+        )
+        url = reverse('word_posts', args=['boeken'])
+        with self.assertNumQueries(1):
+            response = self.client_class().get(url)
+        self.assertContains(response, 'Used 2 times')
+        self.assertContains(response, 'Level A1')
+
+    @unittest.skipIf(vocabulary.numpy is None, 'NumPy is not installed')
+    def test_numpy_and_plain_counts_agree(self):
+        posts = [
+            make_post(self.user, i, content=content)
+            for i, content in enumerate((self.EASY, self.HARD, '<p></p>'))
+        ]
+        results = []
+        for vectorized in (True, False):
+            analyze_posts(posts, vectorized=vectorized)
+            results.append((
+                sorted(PostVocabulary.objects.values_list(
+                    'blogpost', 'word_count', 'unique_lemmas', 'coverage',
+                    'level')),
+                sorted(WordOccurrence.objects.values_list(
+                    'blogpost', 'lemma', 'count')),
+            ))
+        self.assertEqual(results[0], results[1])
+
+    def test_rebuild_command(self):
+        make_post(self.user, 1, content=self.EASY)
+        out = StringIO()
+        call_command('rebuild_vocabulary', '--no-numpy', stdout=out)
+        self.assertIn('Analyzed 1 blogpost(s).', out.getvalue())
+
+
+# ---------------------
+# Similar Posts Tests
+# ---------------------
+@override_settings(BLOG_SIMILAR_MAX_DF=1.0)
+class SimilarPostsTests(QueryBudgetTestCase):
+    TEXTS = (
+        '<p>De fiets staat bij het station in Amsterdam.</p>',
+        '<p>Met de fiets naar het station, elke dag in Amsterdam.</p>',
+        '<p>Het boek over de oorlog is spannend.</p>',
+        '<p>Een spannend boek over de oorlog in Europa.</p>',
+    )
+
+    def create_corpus(self):
+        books = MediaCategory.objects.get(media_name='Books')
+        posts = [
+            make_post(
+                self.user, i, self.category if i < 2 else books,
+                content=text, release_year=2000 + i // 2,
+            )
+            for i, text in enumerate(self.TEXTS)
+        ]
+        rebuild_vocabulary()
+        return posts
+
+    def stored(self):
+        return sorted(SimilarPost.objects.values_list(
+            'blogpost', 'rank', 'similar', 'score'))
+
+    def test_posts_sharing_words_rank_first(self):
+        posts = self.create_corpus()
+        rebuild_similar_posts()
+        self.assertEqual(
+            [post.pk for post in similar_posts(posts[0].pk)][:1],
+            [posts[1].pk]
+        )
+        self.assertEqual(
+            [post.pk for post in similar_posts(posts[2].pk)][:1],
+            [posts[3].pk]
+        )
+
+    @unittest.skipIf(similarity.sparse is None, 'SciPy is not installed')
+    def test_sparse_and_plain_scores_agree(self):
+        posts = self.create_corpus()
+        posts[0].likes.add(self.user)
+        posts[2].likes.add(self.user)
+        results = []
+        for vectorized in (True, False):
+            rebuild_similar_posts(vectorized=vectorized)
+            results.append(self.stored())
+        self.assertEqual(results[0], results[1])
+        self.assertTrue(results[0])
+
+    def test_saved_and_deleted_posts_refresh_the_lists(self):
+        posts = self.create_corpus()
+        rebuild_similar_posts()
+        posts[2].content = self.TEXTS[0]
+        posts[2].save()
+        run_pending()
+        refreshed = self.stored()
+        rebuild_similar_posts()
+        self.assertEqual(refreshed, self.stored())
+        self.assertIn(posts[2].pk, [
+            post.pk for post in similar_posts(posts[0].pk)
+        ])
+        posts[1].delete()
+        run_pending()
+        refreshed = self.stored()
+        rebuild_similar_posts()
+        self.assertEqual(refreshed, self.stored())
+
+    @override_settings(BLOG_SIMILAR_MAX_DF=0.5)
+    def test_refresh_loads_only_the_neighbourhood(self):
+        posts = self.create_corpus()
+        rebuild_similar_posts()
+        corpus = similarity.Corpus([posts[0].pk])
+        self.assertEqual(corpus.ids, [posts[0].pk, posts[1].pk])
+        stored = self.stored()
+        similarity.refresh_similar_posts([posts[0].pk])
+        self.assertEqual(stored, self.stored())
+
+    def test_detail_page_lists_similar_posts(self):
+        posts = self.create_corpus()
+        call_command('rebuild_similar_posts', stdout=StringIO())
+        response = self.client.get(
+            reverse('blogpost_detail', args=[posts[0].slug])
+        )
+        self.assertContains(response, 'Similar posts')
+        self.assertContains(response, posts[1].blog_title)
+
+
+# ---------------------
+# Personal Feed Tests
+# ---------------------
+class PersonalFeedTests(QueryBudgetTestCase):
+
+    def feed(self, url=None):
+        response = self.client.get(url or reverse('personal_feed'))
+        return [post.pk for post in response.context['blogposts']]
+
+    def make_posts(self):
+        books = MediaCategory.objects.get(media_name='Books')
+        posts = [
+            make_post(User.objects.create_user(f'writer{i}'), i, category,
+                      blog_title=title)
+            for i, (category, title) in enumerate((
+                (books, 'Het Achterhuis'), (books, 'De Avonden'),
+                (self.category, 'Zwartboek'),
+            ))
+        ]
+        posts.append(make_post(self.user, 3, self.category))
+        # Hours apart, newest last: liked, book, own, movie
+        for hours, post in zip((4, 3, 1, 2), posts):
+            Blogpost.objects.filter(pk=post.pk).update(
+                created_on=timezone.now() - timezone.timedelta(hours=hours)
+            )
+        return posts
+
+    @override_settings(BLOG_TASKS_EAGER=True)
+    def test_feed_follows_engagement_and_profile(self):
+        liked, book, movie, own = self.make_posts()
+        # Latest first without any history, own posts left out
+        self.assertEqual(self.feed(), [movie.pk, book.pk, liked.pk])
+        liked.likes.add(self.user)
+        # The profile edit rebuilds the feed with the like in it
+        UserProfile.objects.create(user=self.user, top_books='De Avonden')
+        self.assertEqual(self.feed(), [liked.pk, book.pk, movie.pk])
+
+    def test_missing_feed_shows_latest_posts_until_built(self):
+        liked, book, movie, own = self.make_posts()
+        Task.objects.all().delete()
+        self.assertEqual(self.feed(), [movie.pk, own.pk, book.pk, liked.pk])
+        self.assertEqual(
+            list(Task.objects.values_list('name', flat=True)),
+            ['blog.tasks.build_personal_feed']
+        )
+        run_pending()
+        self.assertEqual(self.feed(), [movie.pk, book.pk, liked.pk])
+
+    def test_new_posts_are_fanned_out_to_active_users(self):
+        liked, book, movie, own = self.make_posts()
+        away = User.objects.create_user('away')
+        build_feed(self.user.pk)
+        build_feed(away.pk)
+        PersonalFeed.objects.filter(user=away).update(
+            last_seen=timezone.now() - timezone.timedelta(days=30)
+        )
+        post = make_post(liked.author, 5, blog_title='Nieuw')
+        self.assertEqual(fan_out_post(post.pk), 1)
+        self.assertEqual(self.feed()[0], post.pk)
+        self.assertFalse(FeedEntry.objects.filter(user=away, blogpost=post))
+        post.status = 0
+        post.save()
+        fan_out_post(post.pk)
+        self.assertFalse(FeedEntry.objects.filter(blogpost=post).exists())
+        # An inactive user's feed is built again when they return
+        self.client.force_login(away)
+        with self.settings(BLOG_TASKS_EAGER=True):
+            self.assertEqual(len(self.feed()), 4)
+        self.assertGreater(
+            PersonalFeed.objects.get(user=away).last_seen,
+            timezone.now() - timezone.timedelta(minutes=1)
+        )
+
+    def test_only_feed_relevant_edits_fan_out(self):
+        post = make_post(self.user, 1)
+        fan_outs = Task.objects.filter(name='blog.tasks.fan_out_blogpost')
+        fan_outs.delete()
+        post = Blogpost.objects.get(pk=post.pk)
+        post.content = '<p>Nieuwe tekst</p>'
+        post.save()
+        self.assertFalse(fan_outs.exists())
+        post.blog_title = 'Nieuwe titel'
+        post.save()
+        self.assertTrue(fan_outs.exists())
+        fan_outs.delete()
+        post.status = 0
+        post.save()
+        self.assertTrue(fan_outs.exists())
+
+    @override_settings(BLOG_PERSONAL_FEED_SIZE=3)
+    def test_fan_out_trims_feeds_to_their_size(self):
+        liked, book, movie, own = self.make_posts()
+        build_feed(self.user.pk)
+        post = make_post(liked.author, 5, blog_title='Nieuw')
+        fan_out_post(post.pk)
+        self.assertEqual(self.feed(), [post.pk, movie.pk, book.pk])
+        self.assertEqual(FeedEntry.objects.filter(user=self.user).count(), 3)
+
+    def test_feed_pages_cost_the_same_as_the_latest_feed(self):
+        self.create_posts(10)
+        build_feed(self.user.pk)
+        url = reverse('personal_feed')
+        first = self.client.get(url)
+        second = self.client.get(url + '?' + first.context['next_page_query'])
+        seen = [post.pk for post in first.context['blogposts']] + \
+            [post.pk for post in second.context['blogposts']]
+        self.assertEqual(len(set(seen)), 10)
+        self.assertLessEqual(
+            self.count_queries(url), BlogPostListQueryTests.BUDGET
+        )
+        call_command('rebuild_personal_feeds', stdout=StringIO())
+        self.assertEqual(FeedEntry.objects.filter(user=self.user).count(), 10)
+
+
+# ---------------------
+# Conditional GET Tests
+# ---------------------
+class ConditionalGetTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.post = self.create_posts(1)[0]
+        self.detail_url = reverse('blogpost_detail', args=[self.post.slug])
+
+    def revalidate(self, url, response):
+        return self.client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        ).status_code
+
+    def test_detail_page_answers_304_until_it_changes(self):
+        first = self.client.get(self.detail_url)
+        self.assertIn('private', first['Cache-Control'])
+        self.assertEqual(self.revalidate(self.detail_url, first), 304)
+
+        Comment.objects.create(
+            blogpost=self.post, user=self.user, body='Nieuw', approved=True
+        )
+        self.assertEqual(self.revalidate(self.detail_url, first), 200)
+        second = self.client.get(self.detail_url)
+        self.post.likes.remove(self.user)
+        self.assertEqual(self.revalidate(self.detail_url, second), 200)
+
+    def test_rebuilt_fragments_change_the_detail_etag(self):
+        first = self.client.get(self.detail_url)
+        # The author is renamed without the post being saved
+        User.objects.filter(pk=self.post.author_id).update(
+            username='schrijver'
+        )
+        invalidate_detail(self.post.pk)
+        self.assertEqual(self.revalidate(self.detail_url, first), 200)
+        self.assertContains(self.client.get(self.detail_url), 'schrijver')
+
+    def test_unlike_is_not_hidden_by_if_modified_since(self):
+        first = self.client.get(self.detail_url)
+        self.assertNotIn('Last-Modified', first)
+        self.post.likes.remove(self.user)
+        response = self.client.get(
+            self.detail_url,
+            HTTP_IF_MODIFIED_SINCE='Sun, 18 Oct 2099 00:00:00 GMT',
+        )
+        self.assertContains(response, 'far fa-heart')
+
+    def test_detail_etag_depends_on_the_viewer(self):
+        first = self.client.get(self.detail_url)
+        self.client.force_login(User.objects.create_user('stranger'))
+        self.assertEqual(self.revalidate(self.detail_url, first), 200)
+
+    def test_feed_versions_are_per_filter(self):
+        books = MediaCategory.objects.get(media_name='Books')
+        books_url = reverse('home') + f'?category={books.pk}'
+        home = self.client.get(reverse('home'))
+        books_feed = self.client.get(books_url)
+        self.assertEqual(self.revalidate(reverse('home'), home), 304)
+
+        # A like in Movies changes the unfiltered feed but not Books
+        self.post.likes.remove(self.user)
+        self.assertEqual(self.revalidate(reverse('home'), home), 200)
+        self.assertEqual(self.revalidate(books_url, books_feed), 304)
+
+        # A new post changes every feed
+        make_post(self.user, 40, books)
+        self.assertEqual(self.revalidate(books_url, books_feed), 200)
+
+
+# ---------------------
+# Admin Changelist Tests
+# ---------------------
+class AdminChangelistTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.admin_user = User.objects.create_superuser('moderator')
+        self.client.force_login(self.admin_user)
+        self.posts = self.create_posts(3)
+        self.url = reverse('admin:blog_comment_changelist')
+
+    def test_comment_changelist_queries_do_not_grow_with_rows(self):
+        few = self.count_queries(self.url)
+        for post in self.posts:
+            for i in range(5):
+                Comment.objects.create(
+                    blogpost=post, user=User.objects.create_user(
+                        f'c{post.pk}-{i}'), body='Hoi'
+                )
+        self.assertEqual(few, self.count_queries(self.url))
+
+    def test_search_matches_exact_username_and_slug(self):
+        response = self.client.get(self.url, {'q': 'writer1'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+        response = self.client.get(self.url, {'q': 'post-2'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+    def test_search_finds_recent_comment_bodies(self):
+        Comment.objects.filter(blogpost=self.posts[0]).update(
+            body='Koop goedkope horloges'
+        )
+        response = self.client.get(self.url, {'q': 'goedkope'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+        Comment.objects.update(
+            created_on=timezone.now() - timezone.timedelta(days=60)
+        )
+        response = self.client.get(self.url, {'q': 'goedkope'})
+        self.assertEqual(response.context['cl'].result_count, 0)
+
+    def test_post_search_finds_drafts_and_unindexed_posts_by_body(self):
+        draft = make_post(self.admin_user, 10, status=0,
+                          content='<p>Een geheime schets</p>')
+        url = reverse('admin:blog_blogpost_changelist')
+        response = self.client.get(url, {'q': 'schets'})
+        self.assertEqual(list(response.context['cl'].result_list), [draft])
+        # Published, but the index task has not run yet
+        Blogpost.objects.filter(pk=draft.pk).update(status=1)
+        response = self.client.get(url, {'q': 'schets'})
+        self.assertEqual(list(response.context['cl'].result_list), [draft])
+
+    def test_unfiltered_changelist_uses_estimated_count(self):
+        with self.settings(BLOG_ADMIN_APPROXIMATE_COUNT_THRESHOLD=1):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(
+                    reverse('admin:blog_blogpost_changelist')
+                )
+        self.assertEqual(response.context['cl'].result_count, 3)
+        sql = ' '.join(query['sql'] for query in context.captured_queries)
+        self.assertNotIn('COUNT(*)', sql)
+        self.assertIn('MAX(', sql)
+
+    def test_post_form_edits_likes_and_bookmarks_inline(self):
+        post = self.posts[0]
+        url = reverse('admin:blog_blogpost_change', args=[post.pk])
+        response = self.client.get(url)
+        formsets = [
+            inline.formset for inline in
+            response.context['inline_admin_formsets']
+        ]
+        self.assertEqual(
+            [formset.model for formset in formsets], [Like, Bookmark]
+        )
+        self.assertEqual(formsets[0].queryset.count(), 2)
+
+    def test_bulk_moderation_runs_in_batches(self):
+        post = self.posts[0]
+        for i in range(5):
+            Comment.objects.create(blogpost=post, user=self.user, body='Wacht')
+        detail = reverse('blogpost_detail', args=[post.slug])
+        self.client.get(detail)
+        changed = moderate_comments(
+            Comment.objects.filter(blogpost=post), True, batch_size=2
+        )
+        self.assertEqual(changed, 5)
+        self.assertEqual(
+            Comment.objects.filter(approved=False).count(), 0
+        )
+        self.assertContains(self.client.get(detail), 'Wacht')
+        response = self.client.post(self.url, {
+            'action': 'unapproved_comments',
+            '_selected_action': Comment.objects.filter(
+                body='Wacht').values_list('pk', flat=True),
+        }, follow=True)
+        self.assertContains(response, '5 comment(s) unapproved.')
+        self.assertNotContains(self.client.get(detail), 'Wacht')
+
+
+# ---------------------
+# Search Tests
+# ---------------------
+# Indexing and image variants run inline here; TaskQueueTests covers
+# queueing them.
+@override_settings(BLOG_TASKS_EAGER=True)
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('writer')
+
+    def test_matches_stemmed_dutch_words_in_tag_stripped_content(self):
+        post = make_post(
+            self.user, 1, content='<p class="rood">Wij lezen <b>boeken</b></p>'
+        )
+        self.assertEqual(search_post_ids('boek'), [post.pk])
+        self.assertEqual(search_post_ids('rood'), [])
+
+    def test_title_matches_rank_above_body_matches(self):
+        body = make_post(self.user, 1, content='<p>Een film over fietsen</p>')
+        title = make_post(self.user, 2, blog_title='Fietsen in Utrecht')
+        self.assertEqual(search_post_ids('fiets'), [title.pk, body.pk])
+
+    def test_drafts_and_deleted_posts_are_removed_from_the_index(self):
+        post = make_post(self.user, 1, blog_title='Stroopwafels')
+        post.status = 0
+        post.save()
+        self.assertEqual(search_post_ids('stroopwafels'), [])
+        post.status = 1
+        post.save()
+        self.assertEqual(search_post_ids('stroopwafels'), [post.pk])
+        post.delete()
+        self.assertEqual(search_post_ids('stroopwafels'), [])
+
+    def test_search_view_is_public(self):
+        make_post(self.user, 1, blog_title='Drop en kaas')
+        response = self.client.get(reverse('search'), {'q': 'kaas'})
+        self.assertContains(response, 'Drop en kaas')
+
+
+# ---------------------
+# Like Toggle Tests
+# ---------------------
+class LikeToggleTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader')
+        cls.post = make_post(cls.user, 1)
+
+    def test_api_toggles_and_returns_state_and_count(self):
+        self.client.force_login(self.user)
+        url = reverse('like_toggle_api', args=[self.post.slug])
+        self.assertEqual(
+            self.client.post(url).json(), {'liked': True, 'like_count': 1}
+        )
+        self.assertEqual(
+            self.client.post(url).json(), {'liked': False, 'like_count': 0}
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 0)
+
+    def test_racing_like_is_counted_once(self):
+        toggle_like(self.post.pk, self.user)
+        self.post.refresh_from_db()
+        hot_score = self.post.hot_score
+        # A second request that did not see the first like also inserts
+        with mock.patch.object(QuerySet, 'delete', return_value=(0, {})):
+            self.assertEqual(toggle_like(self.post.pk, self.user), (True, 1))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.hot_score, hot_score)
+        self.assertEqual(self.post.likes.count(), 1)
+
+    def test_api_requires_login_and_post(self):
+        url = reverse('like_toggle_api', args=[self.post.slug])
+        self.assertEqual(self.client.post(url).status_code, 401)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url).status_code, 405)
+        missing = reverse('like_toggle_api', args=['missing'])
+        self.assertEqual(self.client.post(missing).status_code, 404)
+
+    def test_form_fallback_still_redirects(self):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('like_unlike', args=[self.post.slug])
+        )
+        self.assertRedirects(
+            response, reverse('blogpost_detail', args=[self.post.slug]),
+            fetch_redirect_response=False
+        )
+        self.assertTrue(self.post.likes.filter(pk=self.user.pk).exists())
+
+
+# ---------------------
+# Image Variant Tests
+# ---------------------
+@override_settings(BLOG_TASKS_EAGER=True)
+class ImageVariantTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('writer')
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+
+    def save_original(self, name, size=(800, 600)):
+        from PIL import Image
+        buffer = BytesIO()
+        Image.new('RGB', size, 'orange').save(buffer, 'JPEG')
+        path = f'{self.media_root}/{name}'
+        with open(path, 'wb') as original:
+            original.write(buffer.getvalue())
+
+    def test_local_backend_builds_variants_on_upload(self):
+        with self.settings(BLOG_IMAGE_BACKEND='local',
+                           MEDIA_ROOT=self.media_root):
+            self.save_original('tulip.jpg')
+            post = make_post(self.user, 1, featured_image='tulip.jpg')
+        post.refresh_from_db()
+        variants = post.featured_image_variants
+        self.assertEqual(variants['source'], 'image/upload/tulip.jpg')
+        # 1024 is wider than the original, so it is not generated
+        self.assertIn('tulip-640.webp 640w', variants['webp_srcset'])
+        self.assertNotIn('1024w', variants['srcset'])
+        self.assertTrue(variants['thumbnail'].endswith('tulip-320.jpg'))
+
+    def test_variants_are_only_rebuilt_when_the_image_changes(self):
+        post = make_post(self.user, 1, featured_image='image/upload/v1/a.jpg')
+        post.refresh_from_db()
+        built = post.featured_image_variants
+        self.assertIn('w_320', built['thumbnail'])
+        self.assertIn('.webp 1024w', built['webp_srcset'])
+        post.blog_title = 'Nieuwe titel'
+        with self.settings(BLOG_IMAGE_BACKEND='missing'):
+            post.save()
+        post.featured_image = 'image/upload/v2/b.jpg'
+        post.save()
+        post.refresh_from_db()
+        self.assertIn('/v2/b.jpg', post.featured_image_variants['src'])
+
+    def test_placeholders_and_profiles(self):
+        post = make_post(self.user, 1)
+        post.refresh_from_db()
+        self.assertEqual(
+            post.featured_image_variants, {'source': 'image/upload/placeholder'}
+        )
+        with self.settings(BLOG_IMAGE_BACKEND='local',
+                           MEDIA_ROOT=self.media_root):
+            self.save_original('me.png', size=(150, 150))
+            profile = UserProfile.objects.create(
+                user=self.user, profile_image='me.png'
+            )
+        profile.refresh_from_db()
+        self.assertEqual(
+            profile.profile_image_variants['srcset'].count('w,'), 0
+        )
+        self.assertTrue(profile.profile_image_variants['src'].endswith(
+            'variants/profile/me-96.jpg'
+        ))
+
+
+# ---------------------
+# Import/Export Tests
+# ---------------------
+class TransferTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = f'{self.directory}/dump.jsonl'
+        writer = User.objects.create_user('writer')
+        reader = User.objects.create_user('reader')
+        movies = MediaCategory.objects.create(media_name='Movies')
+        for i in range(5):
+            post = make_post(writer, i, movies)
+            post.likes.add(reader)
+            post.bookmarks.add(writer, reader)
+            Comment.objects.create(
+                blogpost=post, user=reader, body=f'Reactie {i}',
+                approved=True
+            )
+        Blogpost.objects.filter(slug='post-0').update(
+            created_on=timezone.make_aware(timezone.datetime(2020, 1, 1))
+        )
+        Blogpost.likes.through.objects.update(
+            created_on=timezone.make_aware(timezone.datetime(2021, 5, 1))
+        )
+        call_command('export_blog', self.path, stdout=StringIO())
+
+    def wipe(self):
+        Blogpost.objects.all().delete()
+        MediaCategory.objects.all().delete()
+        User.objects.all().delete()
+
+    def test_round_trip_restores_content_counters_and_dates(self):
+        self.wipe()
+        Task.objects.all().delete()
+        call_command(
+            'import_blog', self.path, batch_size=3, stdout=StringIO()
+        )
+        self.assertEqual(Blogpost.objects.count(), 5)
+        self.assertEqual(Comment.objects.count(), 5)
+        post = Blogpost.objects.get(slug='post-0')
+        self.assertEqual(post.created_on.year, 2020)
+        self.assertEqual(post.media_category.media_name, 'Movies')
+        self.assertEqual((post.like_count, post.bookmark_count), (1, 2))
+        # Likes keep their own dates, so they do not look fresh
+        self.assertEqual(
+            {like.created_on.year for like in
+             Blogpost.likes.through.objects.all()}, {2021}
+        )
+        reader = User.objects.get(username='reader')
+        self.assertFalse(reader.has_usable_password())
+        self.assertEqual(len(search_post_ids('hallo')), 5)
+        # What post_save would have queued for the imported posts
+        queued = list(Task.objects.values_list('name', flat=True))
+        self.assertEqual(queued.count('blog.tasks.fan_out_blogpost'), 5)
+        self.assertIn('blog.tasks.refresh_similar', queued)
+
+    def test_conflicting_slugs_are_skipped_or_renamed(self):
+        call_command('import_blog', self.path, stdout=StringIO())
+        self.assertEqual(Blogpost.objects.count(), 5)
+        self.assertEqual(Comment.objects.count(), 5)
+        call_command(
+            'import_blog', self.path, on_conflict='rename', stdout=StringIO()
+        )
+        renamed = Blogpost.objects.get(slug='post-1-2')
+        self.assertEqual(renamed.blog_title, 'Post 1 (2)')
+        self.assertEqual(renamed.comments.count(), 1)
+        self.assertEqual(renamed.like_count, 1)
+
+    def test_interrupted_import_resumes_from_checkpoint(self):
+        self.wipe()
+        checkpoint = f'{self.directory}/dump.checkpoint'
+        importer = JsonlImporter(batch_size=4, checkpoint_path=checkpoint)
+
+        def fail(records):
+            raise ValueError('disk full')
+        importer.import_comments = fail
+        with open(self.path, encoding='utf-8') as stream:
+            with self.assertRaises(ValueError):
+                importer.run(stream)
+        self.assertEqual(Comment.objects.count(), 0)
+        self.assertGreater(Blogpost.objects.count(), 0)
+
+        with self.assertRaisesMessage(CommandError, '--resume'):
+            call_command(
+                'import_blog', self.path, checkpoint=checkpoint,
+                on_conflict='rename', stdout=StringIO()
+            )
+        importer = JsonlImporter(batch_size=4, checkpoint_path=checkpoint)
+        with open(self.path, encoding='utf-8') as stream:
+            importer.run(stream, resume=True)
+        self.assertEqual(Blogpost.objects.count(), 5)
+        self.assertEqual(Comment.objects.count(), 5)
+
+
+# ---------------------
+# Instrumentation Tests
+# ---------------------
+@override_settings(PERF_SAMPLE_RATE=1.0, PERF_SLOW_REQUEST_MS=10000)
+class PerformanceMiddlewareTests(QueryBudgetTestCase):
+
+    def test_server_timing_header_reports_queries_and_phases(self):
+        self.create_posts(2)
+        response = self.client.get(reverse('home'))
+        header = response['Server-Timing']
+        for metric in ('db;dur=', 'desc="5 queries"', 'tpl;dur=',
+                       'view;dur=', 'total;dur='):
+            self.assertIn(metric, header)
+
+    def test_slow_requests_are_logged_with_their_slowest_queries(self):
+        with self.settings(PERF_SLOW_REQUEST_MS=0):
+            with self.assertLogs('nederlearn.performance', 'WARNING') as logs:
+                self.client.get(reverse('home'))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['path'], '/')
+        self.assertEqual(record['queries'], 4)
+        self.assertEqual(len(record['slowest_queries']), 3)
+
+    def test_unsampled_requests_are_not_measured(self):
+        with self.settings(PERF_SAMPLE_RATE=0):
+            response = self.client.get(reverse('home'))
+        self.assertNotIn('Server-Timing', response)
+
+
+# ---------------------
+# Database Connection Metrics Tests
+# ---------------------
+class ConnectionMetricsTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        super().setUp()
+        install_connection_metrics()
+        connection_metrics.reset()
+
+    def test_new_and_failed_connections_are_counted(self):
+        fresh = connections.create_connection('default')
+        fresh.ensure_connection()
+        fresh.close()
+        broken = connections.create_connection('default')
+        broken.settings_dict = {
+            **broken.settings_dict, 'NAME': '/missing/directory/db.sqlite3'
+        }
+        with self.assertRaises(OperationalError):
+            broken.ensure_connection()
+        snapshot = connection_metrics.snapshot()
+        self.assertEqual((snapshot['opened'], snapshot['failed']), (1, 1))
+        self.assertIsNotNone(snapshot['mean_connect_ms'])
+
+    def test_endpoint_is_staff_only_and_reports_reuse(self):
+        url = reverse('db_connections')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.user.is_staff = True
+        self.user.save()
+        self.client.get(reverse('home'))
+        report = self.client.get(url).json()
+        self.assertEqual(report['settings']['mode'], 'persistent')
+        self.assertEqual(report['metrics']['requests'], 3)
+        self.assertEqual(report['metrics']['reused'], 3)
+
+
+# ---------------------
+# Local Static Pipeline Tests
+# ---------------------
+class LocalStaticFilesTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.root = tempfile.mkdtemp()
+        storage = 'nederlearn.staticfiles.CompressedManifestStaticFilesStorage'
+        with override_settings(STATIC_ROOT=cls.root,
+                               STATICFILES_STORAGE=storage):
+            # Django's command; cloudinary_storage's one is installed first
+            call_command(
+                collectstatic.Command(), interactive=False, verbosity=0
+            )
+            cls.css_url = static('css/style.css')
+        cls.app = StaticFilesMiddleware(
+            lambda environ, start_response: 'django', root=cls.root
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.root, ignore_errors=True)
+        super().tearDownClass()
+
+    def request(self, path, **environ):
+        environ.update(PATH_INFO=path, REQUEST_METHOD='GET')
+        captured = {}
+
+        def start_response(status, headers):
+            captured['status'] = status
+            captured['headers'] = dict(headers)
+
+        body = self.app(environ, start_response)
+        if body == 'django':
+            return None, {}, body
+        content = b''.join(body)
+        getattr(body, 'close', lambda: None)()
+        return captured['status'], captured['headers'], content
+
+    def test_collectstatic_writes_hashed_and_precompressed_files(self):
+        self.assertRegex(self.css_url, r'^/static/css/style\.[0-9a-f]{12}\.css$')
+        hashed = self.root + self.css_url[len('/static'):]
+        for suffix in ('', '.gz', '.br'):
+            self.assertTrue(os.path.exists(hashed + suffix), suffix)
+
+    def test_serves_the_best_accepted_encoding_with_cache_headers(self):
+        status, headers, content = self.request(
+            self.css_url, HTTP_ACCEPT_ENCODING='gzip, deflate, br'
+        )
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers['Content-Encoding'], 'br')
+        self.assertIn('immutable', headers['Cache-Control'])
+        self.assertEqual(headers['Vary'], 'Accept-Encoding')
+        status, headers, content = self.request(
+            self.css_url, HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        status, headers, plain = self.request(self.css_url)
+        self.assertNotIn('Content-Encoding', headers)
+        self.assertEqual(gzip.decompress(content), plain)
+
+    def test_q_values_pick_or_refuse_encodings(self):
+        for accept_encoding, expected in (
+                ('gzip, br;q=0', 'gzip'),
+                ('gzip;q=1.0, br;q=0.5', 'gzip'),
+                ('*;q=0.5, gzip;q=0', 'br'),
+                ('gzip;q=0, br;q=0', None),
+                ('identity', None)):
+            _, headers, _ = self.request(
+                self.css_url, HTTP_ACCEPT_ENCODING=accept_encoding
+            )
+            self.assertEqual(
+                headers.get('Content-Encoding'), expected, accept_encoding
+            )
+
+    def test_each_encoding_has_its_own_etag(self):
+        etags = {}
+        for accept_encoding in ('', 'gzip', 'br'):
+            _, headers, _ = self.request(
+                self.css_url, HTTP_ACCEPT_ENCODING=accept_encoding
+            )
+            etags[accept_encoding] = headers['ETag']
+        self.assertEqual(len(set(etags.values())), 3)
+        status, _, _ = self.request(
+            self.css_url, HTTP_ACCEPT_ENCODING='br',
+            HTTP_IF_NONE_MATCH=etags['gzip'],
+        )
+        self.assertEqual(status, '200 OK')
+        status, _, _ = self.request(
+            self.css_url, HTTP_ACCEPT_ENCODING='br',
+            HTTP_IF_NONE_MATCH=etags['br'],
+        )
+        self.assertEqual(status, '304 Not Modified')
+
+    def test_revalidation_and_fallthrough(self):
+        _, headers, _ = self.request(self.css_url)
+        status, _, content = self.request(
+            self.css_url, HTTP_IF_NONE_MATCH=headers['ETag']
+        )
+        self.assertEqual((status, content), ('304 Not Modified', b''))
+        _, headers, _ = self.request('/static/css/style.css')
+        self.assertNotIn('immutable', headers['Cache-Control'])
+        self.assertEqual(self.request('/about-us/')[2], 'django')
+        self.assertEqual(self.request('/static/missing.css')[2], 'django')
+
+
+# ---------------------
+# Seeder and Benchmark Tests
+# ---------------------
+@override_settings(PERF_SAMPLE_RATE=0)
+class SeedAndBenchmarkTests(QueryBudgetTestCase):
+
+    def test_seed_and_benchmark_commands(self):
+        call_command(
+            'seed_blog', users=20, posts=30, likes=200, bookmarks=50,
+            comments=60, stdout=StringIO()
+        )
+        self.assertEqual(User.objects.filter(
+            username__startswith='seed_user_').count(), 20)
+        self.assertEqual(UserProfile.objects.count(), 20)
+        self.assertEqual(Blogpost.objects.filter(
+            slug__startswith='seed-post-').count(), 30)
+        call_command('recount_engagement', check=True, stdout=StringIO())
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        baseline = f'{directory}/baseline.json'
+        call_command(
+            'benchmark_blog', iterations=5, warmup=1, save=baseline,
+            stdout=StringIO()
+        )
+        with open(baseline, encoding='utf-8') as saved:
+            results = json.load(saved)
+        self.assertEqual(
+            set(results['scenarios']),
+            {'home', 'category', 'detail', 'like', 'search'}
+        )
+        home = results['scenarios']['home']
+        self.assertLessEqual(home['p50_ms'], home['p99_ms'])
+        self.assertLessEqual(home['queries_per_request'], 4)
+
+        output = StringIO()
+        call_command(
+            'benchmark_blog', iterations=5, warmup=1, scenarios=['home'],
+            compare=baseline, stdout=output
+        )
+        self.assertIn('queries_per_request', output.getvalue())
+        self.assertIn('connections_per_request', output.getvalue())
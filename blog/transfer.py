@@ -0,0 +1,397 @@
+# ---------------------
+# Standard Library Imports
+# ---------------------
+import gzip
+import json
+import os
+from itertools import groupby
+
+# ---------------------
+# Django Imports
+# ---------------------
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .caching import bump_all_feeds, invalidate_categories
+from .models import Blogpost, Comment, MediaCategory, RESERVED_SLUGS, \
+    sync_engagement_counts
+from .search import index_posts
+from .trending import refresh_scores
+from .vocabulary import analyze_posts
+from . import tasks
+
+# ---------------------
+# Blog Content Import/Export
+# ---------------------
+# Blog content is moved as JSON Lines, one record per line, in the order
+# categories, posts, comments, likes, bookmarks. Records refer to each
+# other by natural keys (media_name, slug, username) instead of ids, so
+# a dump can be loaded into a database that already has content.
+#
+# Export streams every table with .iterator(), and import works through
+# the file in batches, resolving the natural keys of one batch at a time.
+# Neither side holds a whole table in memory.
+
+POST_FIELDS = (
+    'slug', 'blog_title', 'content', 'excerpt', 'status', 'release_year',
+    'media_link',
+)
+
+M2M_TYPES = {'like': 'likes', 'bookmark': 'bookmarks'}
+
+# Importer method used for each record type
+HANDLERS = {
+    'category': 'import_categories',
+    'post': 'import_posts',
+    'comment': 'import_comments',
+    'like': 'import_likes',
+    'bookmark': 'import_bookmarks',
+}
+
+
+def open_stream(path, mode):
+    """
+    Opens a dump file, transparently (de)compressing '.gz' paths.
+    """
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+# ---------------------
+# Export
+# ---------------------
+def export_records(chunk_size=1000):
+    """
+    Yields every exported record as a dict.
+    """
+    categories = MediaCategory.objects.order_by('pk').values_list(
+        'media_name', flat=True
+    )
+    for media_name in categories.iterator(chunk_size=chunk_size):
+        yield {'type': 'category', 'media_name': media_name}
+
+    posts = Blogpost.objects.select_related(
+        'author', 'media_category'
+    ).order_by('pk')
+    for post in posts.iterator(chunk_size=chunk_size):
+        record = {'type': 'post'}
+        record.update({field: getattr(post, field) for field in POST_FIELDS})
+        record.update({
+            'author': post.author.username,
+            'media_category': (
+                post.media_category.media_name
+                if post.media_category else None
+            ),
+            'featured_image': Blogpost._meta.get_field(
+                'featured_image').value_to_string(post),
+            'created_on': post.created_on,
+            'updated_on': post.updated_on,
+        })
+        yield record
+
+    comments = Comment.objects.order_by('pk').values(
+        'blogpost__slug', 'user__username', 'body', 'approved', 'created_on'
+    )
+    for comment in comments.iterator(chunk_size=chunk_size):
+        yield {
+            'type': 'comment',
+            'post': comment['blogpost__slug'],
+            'user': comment['user__username'],
+            'body': comment['body'],
+            'approved': comment['approved'],
+            'created_on': comment['created_on'],
+        }
+
+    for record_type, m2m_name in M2M_TYPES.items():
+        rows = getattr(Blogpost, m2m_name).through.objects.order_by(
+            'pk').values_list('blogpost__slug', 'user__username', 'created_on')
+        for slug, username, created_on in rows.iterator(
+                chunk_size=chunk_size):
+            yield {
+                'type': record_type, 'post': slug, 'user': username,
+                'created_on': created_on,
+            }
+
+
+def export_jsonl(stream, chunk_size=1000):
+    """
+    Writes the export to a text stream. Returns the number of records.
+    """
+    total = 0
+    for record in export_records(chunk_size):
+        stream.write(json.dumps(record, cls=DjangoJSONEncoder) + '\n')
+        total += 1
+    return total
+
+
+# ---------------------
+# Import
+# ---------------------
+class CheckpointExists(Exception):
+    """
+    Raised when an import is started from the top while the checkpoint of
+    an interrupted one is still there.
+    """
+
+
+class JsonlImporter:
+    """
+    Loads a JSONL dump in batches of 'batch_size' records. Each batch is
+    written in its own transaction and followed by a checkpoint, so an
+    interrupted import can be resumed from the last committed line.
+
+    Posts whose slug or title already exists, or whose slug is reserved
+    for a route of the site, are handled according to 'on_conflict':
+    'skip' keeps the existing post and drops the imported one together
+    with its comments, likes and bookmarks; 'rename' imports it under a
+    new unique slug and title.
+    """
+
+    def __init__(self, batch_size=500, on_conflict='skip',
+                 checkpoint_path=None):
+        self.batch_size = batch_size
+        self.on_conflict = on_conflict
+        self.checkpoint_path = checkpoint_path
+        self.line = 0
+        # Only conflicting slugs are remembered, not every imported post
+        self.renamed = {}
+        self.skipped = set()
+        self.counts = {}
+
+    # ---------------------
+    # Checkpoints
+    # ---------------------
+    def load_checkpoint(self):
+        if not self.checkpoint_path or \
+                not os.path.exists(self.checkpoint_path):
+            return
+        with open(self.checkpoint_path, encoding='utf-8') as checkpoint:
+            state = json.load(checkpoint)
+        self.line = state['line']
+        self.renamed = state['renamed']
+        self.skipped = set(state['skipped'])
+        self.counts = state['counts']
+
+    def save_checkpoint(self):
+        if not self.checkpoint_path:
+            return
+        state = {
+            'line': self.line, 'renamed': self.renamed,
+            'skipped': sorted(self.skipped), 'counts': self.counts,
+        }
+        temporary = self.checkpoint_path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as checkpoint:
+            json.dump(state, checkpoint)
+        os.replace(temporary, self.checkpoint_path)
+
+    # ---------------------
+    # Main Loop
+    # ---------------------
+    def run(self, stream, resume=False):
+        # Starting over would import the committed batches a second time,
+        # under new slugs with on_conflict='rename'
+        if resume:
+            self.load_checkpoint()
+        elif self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            raise CheckpointExists(
+                f'{self.checkpoint_path} is left from an interrupted import'
+            )
+        start = self.line
+        batch = []
+        for number, raw in enumerate(stream, start=1):
+            if number <= start or not raw.strip():
+                continue
+            batch.append(json.loads(raw))
+            if len(batch) >= self.batch_size:
+                self.flush(batch, number)
+                batch = []
+        if batch:
+            self.flush(batch, number)
+        invalidate_categories()
+        bump_all_feeds()
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        return self.counts
+
+    def flush(self, batch, last_line):
+        with transaction.atomic():
+            for record_type, records in groupby(
+                    batch, key=lambda record: record['type']):
+                handler = getattr(self, HANDLERS[record_type])
+                created = handler(list(records))
+                self.counts[record_type] = \
+                    self.counts.get(record_type, 0) + created
+        self.line = last_line
+        self.save_checkpoint()
+
+    # ---------------------
+    # Natural Key Lookups
+    # ---------------------
+    def user_ids(self, usernames):
+        """
+        Maps usernames to ids, creating missing users without a usable
+        password so that they can only log in after a password reset.
+        """
+        usernames = set(usernames)
+        found = dict(User.objects.filter(
+            username__in=usernames).values_list('username', 'pk'))
+        missing = usernames - set(found)
+        if missing:
+            User.objects.bulk_create([
+                User(username=name, password=make_password(None))
+                for name in missing
+            ], ignore_conflicts=True)
+            found.update(User.objects.filter(
+                username__in=missing).values_list('username', 'pk'))
+        return found
+
+    def post_ids(self, slugs):
+        """
+        Maps source slugs to post ids, following renamed slugs and
+        leaving out posts that were skipped.
+        """
+        wanted = {
+            self.renamed.get(slug, slug): slug
+            for slug in slugs if slug not in self.skipped
+        }
+        return {
+            wanted[slug]: pk for slug, pk in Blogpost.objects.filter(
+                slug__in=wanted).values_list('slug', 'pk')
+        }
+
+    def unique_slug_and_title(self, slug, title):
+        suffix = 2
+        while True:
+            new_slug = f'{slug}-{suffix}'
+            new_title = f'{title} ({suffix})'
+            if not Blogpost.objects.filter(slug=new_slug).exists() and \
+                    not Blogpost.objects.filter(
+                        blog_title=new_title).exists():
+                return new_slug, new_title
+            suffix += 1
+
+    # ---------------------
+    # Record Handlers
+    # ---------------------
+    def import_categories(self, records):
+        names = {record['media_name'] for record in records}
+        existing = set(MediaCategory.objects.filter(
+            media_name__in=names).values_list('media_name', flat=True))
+        MediaCategory.objects.bulk_create(
+            [MediaCategory(media_name=name) for name in names - existing],
+            ignore_conflicts=True
+        )
+        return len(names - existing)
+
+    def import_posts(self, records):
+        slugs = {record['slug'] for record in records}
+        titles = {record['blog_title'] for record in records}
+        taken_slugs = set(Blogpost.objects.filter(
+            slug__in=slugs).values_list('slug', flat=True))
+        taken_titles = set(Blogpost.objects.filter(
+            blog_title__in=titles).values_list('blog_title', flat=True))
+        authors = self.user_ids(record['author'] for record in records)
+        categories = dict(MediaCategory.objects.filter(
+            media_name__in={record['media_category'] for record in records}
+        ).values_list('media_name', 'pk'))
+
+        posts = []
+        for record in records:
+            slug, title = record['slug'], record['blog_title']
+            if slug in taken_slugs or slug in RESERVED_SLUGS or \
+                    title in taken_titles:
+                if self.on_conflict == 'skip':
+                    self.skipped.add(slug)
+                    continue
+                new_slug, title = self.unique_slug_and_title(slug, title)
+                self.renamed[slug] = new_slug
+                slug = new_slug
+            taken_slugs.add(slug)
+            taken_titles.add(title)
+            fields = {field: record[field] for field in POST_FIELDS}
+            fields.update(slug=slug, blog_title=title)
+            posts.append(Blogpost(
+                **fields,
+                author_id=authors[record['author']],
+                media_category_id=categories.get(record['media_category']),
+                featured_image=record['featured_image'],
+                created_on=parse_datetime(record['created_on']),
+                updated_on=parse_datetime(record['updated_on']),
+            ))
+
+        timestamps = [
+            (post.created_on, post.updated_on) for post in posts
+        ]
+        Blogpost.objects.bulk_create(posts)
+        # bulk_create applies auto_now/auto_now_add, so the original
+        # timestamps are written back in one bulk_update per batch.
+        for post, (created_on, updated_on) in zip(posts, timestamps):
+            post.created_on, post.updated_on = created_on, updated_on
+        Blogpost.objects.bulk_update(posts, ['created_on', 'updated_on'])
+        post_ids = [post.pk for post in posts]
+        refresh_scores(post_ids)
+        index_posts(posts)
+        analyze_posts(posts)
+        # bulk_create skips post_save, so the similar posts refresh and
+        # the personal feed fan-out its receivers queue are queued here
+        if post_ids:
+            tasks.refresh_similar.enqueue(post_ids)
+        for post in posts:
+            if post.status == 1:
+                tasks.fan_out_blogpost.enqueue(post.pk)
+        return len(posts)
+
+    def import_comments(self, records):
+        posts = self.post_ids(record['post'] for record in records)
+        users = self.user_ids(record['user'] for record in records)
+        comments, timestamps = [], []
+        for record in records:
+            if record['post'] not in posts:
+                continue
+            comments.append(Comment(
+                blogpost_id=posts[record['post']],
+                user_id=users[record['user']],
+                body=record['body'],
+                approved=record['approved'],
+            ))
+            timestamps.append(parse_datetime(record['created_on']))
+        Comment.objects.bulk_create(comments)
+        for comment, created_on in zip(comments, timestamps):
+            comment.created_on = created_on
+        Comment.objects.bulk_update(comments, ['created_on'])
+        refresh_scores({
+            comment.blogpost_id for comment in comments if comment.approved
+        })
+        return len(comments)
+
+    def import_m2m(self, records, m2m_name):
+        through = getattr(Blogpost, m2m_name).through
+        posts = self.post_ids(record['post'] for record in records)
+        users = self.user_ids(record['user'] for record in records)
+        # Dumps written before likes and bookmarks were timestamped have
+        # no 'created_on'; those rows get the time of the import.
+        rows = [
+            through(blogpost_id=posts[record['post']],
+                    user_id=users[record['user']],
+                    created_on=parse_datetime(record['created_on'])
+                    if record.get('created_on') else timezone.now())
+            for record in records if record['post'] in posts
+        ]
+        through.objects.bulk_create(rows, ignore_conflicts=True)
+        # The through table insert bypasses m2m_changed, so the stored
+        # counters and hot scores of the touched posts are recomputed here.
+        field = 'like_count' if m2m_name == 'likes' else 'bookmark_count'
+        post_ids = {row.blogpost_id for row in rows}
+        sync_engagement_counts(post_ids, fields=[field])
+        refresh_scores(post_ids)
+        return len(rows)
+
+    def import_likes(self, records):
+        return self.import_m2m(records, 'likes')
+
+    def import_bookmarks(self, records):
+        return self.import_m2m(records, 'bookmarks')
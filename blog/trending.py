@@ -0,0 +1,122 @@
+# ---------------------
+# Standard Library Imports
+# ---------------------
+import math
+from datetime import datetime, timezone as dt_timezone
+
+# ---------------------
+# Django Imports
+# ---------------------
+from django.conf import settings
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Exp, Greatest, Least, Ln
+from django.utils import timezone
+from .models import Blogpost, Comment
+
+# ---------------------
+# Trending Score
+# ---------------------
+# Every post has a stored 'hot_score': the log of the time-decayed sum of
+# its publication and its likes, bookmarks and approved comments,
+#
+#     hot_score = ln( sum of weight * exp(rate * (t - EPOCH)) )
+#
+# where t is when each of them happened and 'rate' follows from the
+# BLOG_TRENDING_HALF_LIFE_HOURS setting. Instead of shrinking every
+# score as time passes, newer events count for more, so all scores decay
+# at the same speed and their order never needs refreshing. A post with
+# a burst of recent engagement outranks one with more, older engagement,
+# and new posts start at their publication weight.
+#
+# Adding an event is one atomic UPDATE that folds its term into the
+# stored log (log-sum-exp). Removals (unlikes, deleted or unapproved
+# comments) and bulk imports recompute the affected posts exactly from
+# the engagement tables, as does the rebuild_trending command. The
+# trending feed reads posts in (status, hot_score, id) index order.
+
+EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def decay_rate():
+    """
+    Per-second growth rate of new event weights.
+    """
+    return math.log(2) / (settings.BLOG_TRENDING_HALF_LIFE_HOURS * 3600)
+
+
+def event_score(kind, when):
+    """
+    The log of one event's term in the sum.
+    """
+    weight = settings.BLOG_TRENDING_WEIGHTS[kind]
+    return math.log(weight) + decay_rate() * (when - EPOCH).total_seconds()
+
+
+def log_add(a, b):
+    """
+    ln(exp(a) + exp(b)) without overflowing.
+    """
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def record_engagement(post_ids, kind, when=None, count=1):
+    """
+    Adds 'count' 'like', 'bookmark' or 'comment' events to each post's
+    score.
+    """
+    post_ids = list(post_ids)
+    if not post_ids or count < 1:
+        return 0
+    score = event_score(kind, when or timezone.now()) + math.log(count)
+    term = Value(score, output_field=FloatField())
+    high = Greatest(F('hot_score'), term)
+    low = Least(F('hot_score'), term)
+    return Blogpost.objects.filter(pk__in=post_ids).update(
+        hot_score=high + Ln(Value(1.0) + Exp(low - high))
+    )
+
+
+def compute_scores(post_ids=None, chunk_size=2000):
+    """
+    Computes the exact scores of the given posts (all posts when None)
+    from the engagement tables. Returns {post_id: score}.
+    """
+    posts = Blogpost.objects.all()
+    if post_ids is not None:
+        posts = posts.filter(pk__in=list(post_ids))
+    scores = {
+        pk: event_score('post', created_on)
+        for pk, created_on in posts.values_list(
+            'pk', 'created_on').iterator(chunk_size=chunk_size)
+    }
+    sources = (
+        ('like', Blogpost.likes.through.objects.all()),
+        ('bookmark', Blogpost.bookmarks.through.objects.all()),
+        ('comment', Comment.objects.filter(approved=True)),
+    )
+    for kind, rows in sources:
+        if post_ids is not None:
+            rows = rows.filter(blogpost_id__in=list(scores))
+        rows = rows.values_list('blogpost_id', 'created_on').order_by()
+        for post_id, created_on in rows.iterator(chunk_size=chunk_size):
+            if post_id in scores:
+                scores[post_id] = log_add(
+                    scores[post_id], event_score(kind, created_on)
+                )
+    return scores
+
+
+def refresh_scores(post_ids=None, batch_size=1000):
+    """
+    Recomputes and stores the exact scores of the given posts, or of
+    every post when 'post_ids' is None. Returns the number of posts.
+    """
+    if post_ids is not None:
+        post_ids = list(post_ids)
+        if not post_ids:
+            return 0
+    scores = compute_scores(post_ids)
+    posts = [Blogpost(pk=pk, hot_score=score) for pk, score in scores.items()]
+    Blogpost.objects.bulk_update(posts, ['hot_score'], batch_size=batch_size)
+    return len(posts)
@@ -13,9 +13,20 @@ from django.views.generic.base import TemplateView
 
 urlpatterns = [
     path("", views.BlogPostList.as_view(), name="home"),
+    path('trending/', views.TrendingPostList.as_view(), name='trending'),
+    path('for-you/', views.PersonalFeedList.as_view(), name='personal_feed'),
     path('about-us/', TemplateView.as_view(template_name='about_us.html'),
         name='about_us'),
+    path('search/', views.SearchView.as_view(), name='search'),
+    path('words/<str:word>/', views.WordPostsView.as_view(),
+        name='word_posts'),
+    path('my/likes/', views.MyLikes.as_view(), name='my_likes'),
+    path('my/bookmarks/', views.MyBookmarks.as_view(), name='my_bookmarks'),
     path('<slug:slug>/', views.BlogPostDetail.as_view(), name='blogpost_detail'),
     path('like/<slug:slug>/', views.LikeUnlike.as_view(), name='like_unlike'),
+    path('comments/<slug:slug>/', views.CommentPage.as_view(),
+        name='comment_page'),
+    path('api/like/<slug:slug>/', views.LikeToggleAPI.as_view(),
+        name='like_toggle_api'),
 
 ]
@@ -1,14 +1,35 @@
+# ---------------------
+# Standard Library Imports
+# ---------------------
+import time
+
 # ---------------------
 # Django Imports
 # ---------------------
 from django.shortcuts import render, get_object_or_404, redirect, reverse
 from django.views import generic, View
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, Http404, JsonResponse
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.shortcuts import redirect
-from .models import Blogpost
+from .models import Blogpost, Comment, FeedEntry, toggle_like
+from .pagination import CursorPage, CursorPaginator, InvalidCursor
+from .search import search_posts
+from .vocabulary import posts_using_word
+from .similarity import similar_posts
+from .personal_feed import feed_state, MISSING, READY
+from . import tasks
+from .engagement import attach_engagement
+from .caching import attach_post_cards, get_category_catalogue, \
+    get_detail_fragments, get_feed_version, render_detail_fragments, \
+    resolve_category
+from .conditional import Validators
+from django.db.models import Count, Max
 from django.contrib import messages
 from django.contrib.auth.forms import UserCreationForm
 from django.urls import reverse_lazy
+from django.template.loader import render_to_string
+from django.utils.dateparse import parse_datetime
 
 # ---------------------
 # Define the home view
@@ -26,6 +47,11 @@ class BlogPostList(generic.ListView):
     context_object_name = 'blogposts'
     template_name = 'index.html'
     paginate_by = 8
+    # The feed's sort column (newest first) and how its cursor values are
+    # read back
+    ordering_field = 'created_on'
+    cursor_parse = staticmethod(parse_datetime)
+    feed_name = 'latest'
 
     # ---------------------
     # Dispatch Method
@@ -36,39 +62,337 @@ class BlogPostList(generic.ListView):
             return redirect('account_login')
         return super().dispatch(request, *args, **kwargs)
 
-class LikeUnlike(View):
-    def post(self, request, slug, *args, **kwargs):
-        blogpost = get_object_or_404(Blogpost, slug=slug)
-        if blogpost.likes.filter(id=request.user.id).exists():
-            blogpost.likes.remove(request.user)
-        else:
-            blogpost.likes.add(request.user)
+    # ---------------------
+    # Get Method
+    # ---------------------
+    # Answers 304 Not Modified when the viewer already has this version of
+    # the page. The version is the feed's version stamp (blog/caching.py),
+    # the query string (filter and page) and the viewer, so it is known
+    # before the page of posts is loaded.
+    def get(self, request, *args, **kwargs):
+        version, last_modified = self.get_version()
+        validators = Validators(
+            self.__class__.__name__, version, request.GET.urlencode(),
+            request.user.pk, last_modified=last_modified,
+        )
+        response = validators.not_modified(request)
+        if response is not None:
+            return response
+        return validators.apply(super().get(request, *args, **kwargs))
 
-        return HttpResponseRedirect(reverse('blogpost_detail', args=[slug]))
+    def get_version(self):
+        return get_feed_version(self.get_feed_category())
+
+    # ---------------------
+    # Get Feed Category Method
+    # ---------------------
+    # The category id whose feed version covers this page, or None for the
+    # unfiltered feed.
+    def get_feed_category(self):
+        value = self.request.GET.get('category')
+        category = resolve_category(value) if value else None
+        return category['id'] if category else None
 
     # ---------------------
     # Get Queryset Method
     # ---------------------
     # This method filters blogposts by media category and orders them by creation date.
+    # The author and media category are joined in the same query and the
+    # like total is read from the stored counter, so the number of queries
+    # does not grow with the page size. The long 'content' column is not
+    # shown on the cards and is left out of the SELECT.
     def get_queryset(self):
-        queryset = Blogpost.objects.filter(status=1).order_by('-created_on')
+        queryset = (
+            Blogpost.objects.filter(status=1)
+            .select_related('author', 'media_category')
+            .defer('content')
+            .order_by(f'-{self.ordering_field}', '-id')
+        )
+        # The category is resolved by primary key from the cached catalogue,
+        # so the filter is a plain media_category_id comparison.
+        self.category = None
         media_category = self.request.GET.get('category')
         if media_category:
-            queryset = queryset.filter(
-                media_category__media_name=media_category
-                )
+            self.category = resolve_category(media_category)
+            if self.category is None:
+                return queryset.none()
+            queryset = queryset.filter(media_category_id=self.category['id'])
         return queryset
 
     # ---------------------
     # Get Context Data Method
     # ---------------------
-    # This method adds media categories to the context for filtering in the template.
+    # This method adds media categories (with their published post counts) to the context for filtering in the template.
+    # The cards themselves come from the card fragment cache.
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['categories'] = MediaCategory.objects.all()
+        context['categories'] = get_category_catalogue()
+        context['current_category'] = self.category
+        context['feed_name'] = self.feed_name
+        context['engagement'] = attach_engagement(
+            context['object_list'], self.request.user
+        )
+        attach_post_cards(context['object_list'])
+        context.update(self.get_page_links(context['page_obj']))
+        return context
+
+    # ---------------------
+    # Paginate Queryset Method
+    # ---------------------
+    # In 'cursor' mode (settings.BLOG_FEED_PAGINATION) the feed is paged by
+    # (created_on, id) keyset tokens instead of OFFSET and page numbers.
+    def paginate_queryset(self, queryset, page_size):
+        if settings.BLOG_FEED_PAGINATION != 'cursor':
+            return super().paginate_queryset(queryset, page_size)
+        paginator = CursorPaginator(
+            queryset, page_size, field=self.ordering_field,
+            parse=self.cursor_parse
+        )
+        try:
+            page = paginator.page(self.request.GET.get('cursor'))
+        except InvalidCursor:
+            raise Http404('Invalid cursor.')
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    # ---------------------
+    # Get Page Links Method
+    # ---------------------
+    # Builds the query strings for the NEXT/PREV links, keeping the
+    # category filter in place.
+    def get_page_links(self, page):
+        links = {'next_page_query': None, 'previous_page_query': None}
+        if page is None:
+            return links
+        if isinstance(page, CursorPage):
+            targets = {
+                'next_page_query': ('cursor', page.next_cursor),
+                'previous_page_query': ('cursor', page.previous_cursor),
+            }
+        else:
+            targets = {
+                'next_page_query': ('page', page.has_next()
+                                    and page.next_page_number()),
+                'previous_page_query': ('page', page.has_previous()
+                                        and page.previous_page_number()),
+            }
+        for name, (key, value) in targets.items():
+            if value:
+                query = self.request.GET.copy()
+                query.pop('page', None)
+                query.pop('cursor', None)
+                query[key] = value
+                links[name] = query.urlencode()
+        return links
+
+
+# ---------------------
+# TrendingPostList View
+# ---------------------
+# The same feed ordered by the precomputed hot score (blog/trending.py)
+# instead of the creation date. Pages are read from the trending indexes
+# with the same keyset pagination.
+class TrendingPostList(BlogPostList):
+    ordering_field = 'hot_score'
+    cursor_parse = staticmethod(float)
+    feed_name = 'trending'
+
+
+# ---------------------
+# PersonalFeedList View
+# ---------------------
+# "For you": the viewer's own feed, materialized by
+# blog/personal_feed.py. It is read from the viewer's FeedEntry rows in
+# (user, score, id) index order with the posts joined in, so a page runs
+# the same queries as the latest feed. Whether the feed is built and
+# fresh is checked at most every BLOG_PERSONAL_FEED_CHECK_INTERVAL
+# seconds per session; a missing feed is queued for building, and the
+# latest feed is shown until it is ready.
+class PersonalFeedList(BlogPostList):
+    ordering_field = 'score'
+    cursor_parse = staticmethod(float)
+    feed_name = 'personal'
+    session_key = 'personal_feed_checked'
+
+    def get(self, request, *args, **kwargs):
+        self.personal = self.check_feed()
+        if not self.personal:
+            self.ordering_field = BlogPostList.ordering_field
+            self.cursor_parse = BlogPostList.cursor_parse
+        return super().get(request, *args, **kwargs)
+
+    def check_feed(self):
+        session = self.request.session
+        checked = session.get(self.session_key, 0)
+        if time.time() - checked < settings.BLOG_PERSONAL_FEED_CHECK_INTERVAL:
+            return True
+        user_id = self.request.user.pk
+        state = feed_state(user_id)
+        if state != READY:
+            tasks.build_personal_feed.enqueue(user_id)
+            if state == MISSING:
+                # Tasks run eagerly may have built it already
+                state = feed_state(user_id, touch=False)
+        if state == MISSING:
+            return False
+        session[self.session_key] = time.time()
+        return True
+
+    # Rebuilding the viewer's feed, or fanning out new posts, changes
+    # the page as well
+    def get_version(self):
+        return get_feed_version(
+            self.get_feed_category(), user_id=self.request.user.pk
+        )
+
+    def get_queryset(self):
+        if not self.personal:
+            return super().get_queryset()
+        self.category = None
+        queryset = (
+            FeedEntry.objects.filter(
+                user_id=self.request.user.pk, blogpost__status=1
+            )
+            .select_related('blogpost__author', 'blogpost__media_category')
+            .defer('blogpost__content')
+        )
+        media_category = self.request.GET.get('category')
+        if media_category:
+            self.category = resolve_category(media_category)
+            if self.category is None:
+                return queryset.none()
+            queryset = queryset.filter(
+                blogpost__media_category_id=self.category['id']
+            )
+        return queryset
+
+    # The personal feed is always cursor paginated. The page holds feed
+    # entries; the template gets their posts.
+    def paginate_queryset(self, queryset, page_size):
+        if not self.personal:
+            return super().paginate_queryset(queryset, page_size)
+        paginator = CursorPaginator(
+            queryset, page_size, field=self.ordering_field,
+            parse=self.cursor_parse
+        )
+        try:
+            page = paginator.page(self.request.GET.get('cursor'))
+        except InvalidCursor:
+            raise Http404('Invalid cursor.')
+        page.object_list = [entry.blogpost for entry in page.object_list]
+        return (
+            paginator, page, page.object_list, page.has_other_pages()
+        )
+
+
+# ---------------------
+# EngagementFeed View
+# ---------------------
+# "My likes" and "My bookmarks": the published posts the user liked or
+# saved, most recent first. The feed is read from the through table, so
+# it is ordered and paged by when the post was liked or saved, using the
+# (user, created_on, id) index, with the post, its author and category
+# joined into the same query.
+class EngagementFeed(BlogPostList):
+    template_name = 'engagement_feed.html'
+    m2m_name = None
+    heading = None
+    engaged_label = None
+
+    def get_queryset(self):
+        self.category = None
+        through = getattr(Blogpost, self.m2m_name).through
+        return (
+            through.objects.filter(
+                user_id=self.request.user.pk, blogpost__status=1
+            )
+            .select_related('blogpost__author', 'blogpost__media_category')
+            .defer('blogpost__content')
+        )
+
+    # The feed is always cursor paginated. The page holds through rows;
+    # the posts are handed to the template with the time of the like or
+    # bookmark as 'engaged_on'.
+    def paginate_queryset(self, queryset, page_size):
+        paginator = CursorPaginator(queryset, page_size)
+        try:
+            page = paginator.page(self.request.GET.get('cursor'))
+        except InvalidCursor:
+            raise Http404('Invalid cursor.')
+        posts = []
+        for row in page.object_list:
+            row.blogpost.engaged_on = row.created_on
+            posts.append(row.blogpost)
+        page.object_list = posts
+        return (paginator, page, posts, page.has_other_pages())
+
+    # Likes and bookmarks on any post move the unfiltered feed's version,
+    # which therefore also covers this page.
+    def get_feed_category(self):
+        return None
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['heading'] = self.heading
+        context['engaged_label'] = self.engaged_label
         return context
 
-    paginate_by = 8
+
+class MyLikes(EngagementFeed):
+    m2m_name = 'likes'
+    heading = 'My Likes'
+    engaged_label = 'Liked on'
+
+
+class MyBookmarks(EngagementFeed):
+    m2m_name = 'bookmarks'
+    heading = 'Saved for Later'
+    engaged_label = 'Saved on'
+
+
+# ---------------------
+# LikeUnlike View
+# ---------------------
+# This view toggles the current user's like on a blogpost and sends them back to the post.
+# It is the no-JavaScript fallback for LikeToggleAPI below.
+class LikeUnlike(View):
+    def post(self, request, slug, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return redirect('account_login')
+        blogpost = get_object_or_404(Blogpost.objects.only('id'), slug=slug)
+        toggle_like(blogpost.pk, request.user)
+
+        return HttpResponseRedirect(reverse('blogpost_detail', args=[slug]))
+
+
+# ---------------------
+# Like Toggle API
+# ---------------------
+# This async view toggles a like and answers with JSON, so the detail page
+# can update the heart without a redirect and full re-render. Its only
+# handler is async, so it runs natively under nederlearn/asgi.py; the
+# database work (including the lazy request.user lookup) runs in one
+# sync_to_async call on a single thread and connection.
+def _toggle_like_for_request(request, slug):
+    if not request.user.is_authenticated:
+        return None
+    blogpost = Blogpost.objects.filter(slug=slug, status=1).only('id').first()
+    if blogpost is None:
+        raise Http404('No published blogpost matches the given slug.')
+    return toggle_like(blogpost.pk, request.user)
+
+
+class LikeToggleAPI(View):
+    async def post(self, request, slug, *args, **kwargs):
+        try:
+            result = await sync_to_async(_toggle_like_for_request)(
+                request, slug
+            )
+        except Http404 as error:
+            return JsonResponse({'error': str(error)}, status=404)
+        if result is None:
+            return JsonResponse({'error': 'Login required.'}, status=401)
+        liked, like_count = result
+        return JsonResponse({'liked': liked, 'like_count': like_count})
 
 # ---------------------
 # BlogPostDetail Class
@@ -78,20 +402,154 @@ class BlogPostDetail(View):
     # ---------------------
     # Get Method
     # ---------------------
+    # The shared HTML of the page comes from the detail cache, so a hot
+    # post only needs a small lookup for the post id, 'updated_on' and
+    # like count, plus the viewer's liked check. Those values, with the
+    # newest approved comment and the time the cached fragments were
+    # built, also make up the page's ETag, so a viewer who already has
+    # this version gets a 304 without the template being rendered. There
+    # is no Last-Modified: an unlike changes the page without leaving a
+    # newer timestamp anywhere, so only the ETag can tell.
     def get(self, request, slug, *args, **kwargs):
-        queryset = Blogpost.objects.filter(status=1)
+        queryset = Blogpost.objects.filter(status=1).only(
+            'id', 'slug', 'status', 'updated_on', 'like_count'
+        )
         blogpost = get_object_or_404(queryset, slug=slug)
-        comments = blogpost.comments.filter(approved=False).order_by("created_on")
+        fragments = get_detail_fragments(
+            blogpost, lambda: self.build_fragments(blogpost.pk)
+        )
         liked = False
-        if blogpost.likes.filter(id=self.request.user.id).exists():
+        if request.user.is_authenticated and blogpost.likes.filter(
+                id=request.user.id).exists():
             liked = True
 
-        return render(
+        validators = Validators(
+            blogpost.pk, blogpost.updated_on.isoformat(),
+            fragments.get('latest_comment_on'), fragments['comment_count'],
+            blogpost.like_count, liked, repr(fragments['built_on']),
+            request.user.pk,
+        )
+        response = validators.not_modified(request)
+        if response is not None:
+            return response
+
+        return validators.apply(render(
             request,
             "blogpost_detail.html",
             {
                 "blogpost": blogpost,
-                "comments": comments,
+                "fragments": fragments,
                 "liked": liked
             },
+        ))
+
+    # ---------------------
+    # Build Fragments Method
+    # ---------------------
+    # Loads the full post and the first page of its approved comments and
+    # renders the cacheable parts of the page. The total and the newest
+    # comment time are only queried when the thread is longer than one
+    # page.
+    def build_fragments(self, post_id):
+        blogpost = Blogpost.objects.select_related(
+            'author', 'vocabulary'
+        ).get(pk=post_id)
+        comments = approved_comments(post_id)
+        comment_page = CursorPaginator(
+            comments, CommentPage.paginate_by, newest_first=False
+        ).page()
+        if comment_page.has_next():
+            totals = comments.aggregate(
+                count=Count('id'), latest=Max('created_on')
+            )
+            comment_count, latest_comment_on = \
+                totals['count'], totals['latest']
+        else:
+            comment_count = len(comment_page)
+            latest_comment_on = max(
+                (comment.created_on for comment in comment_page),
+                default=None
+            )
+        return render_detail_fragments(
+            blogpost, comment_page, comment_count, latest_comment_on,
+            similar_posts(post_id)
+        )
+
+
+# ---------------------
+# Approved Comments Helper
+# ---------------------
+# Approved comments of one post with their authors joined in. Filtering on
+# (blogpost, approved) and ordering by created_on matches the
+# comment_thread_idx index.
+def approved_comments(post_id):
+    return Comment.objects.filter(
+        blogpost_id=post_id, approved=True
+    ).select_related('user')
+
+
+# ---------------------
+# CommentPage View
+# ---------------------
+# This view returns one further page of a post's approved comments as an
+# HTML fragment in JSON, for the "Load more comments" button.
+class CommentPage(View):
+    paginate_by = 10
+
+    def get(self, request, slug, *args, **kwargs):
+        blogpost = get_object_or_404(
+            Blogpost.objects.filter(status=1).only('id'), slug=slug
+        )
+        paginator = CursorPaginator(
+            approved_comments(blogpost.pk), self.paginate_by,
+            newest_first=False
+        )
+        try:
+            page = paginator.page(request.GET.get('cursor'))
+        except InvalidCursor:
+            raise Http404('Invalid cursor.')
+        html = render_to_string(
+            'includes/comment_list.html', {'comments': page.object_list}
+        )
+        return JsonResponse({'html': html, 'next_cursor': page.next_cursor})
+
+
+# ---------------------
+# SearchView Class
+# ---------------------
+# This public view runs a ranked full-text search over published blogposts.
+class SearchView(View):
+    results_limit = 50
+
+    def get(self, request, *args, **kwargs):
+        query = request.GET.get('q', '').strip()
+        results = search_posts(query, self.results_limit) if query else []
+        attach_engagement(results, request.user)
+        return render(
+            request,
+            "search.html",
+            {
+                "query": query,
+                "blogposts": results,
+            },
+        )
+
+
+# ---------------------
+# WordPostsView Class
+# ---------------------
+# This public view lists the published posts that use a Dutch word, in
+# any of its inflections, most uses first. It reads the word index built
+# by blog/vocabulary.py with one query.
+class WordPostsView(View):
+    results_limit = 50
+
+    def get(self, request, word, *args, **kwargs):
+        return render(
+            request,
+            "word_posts.html",
+            {
+                "word": word,
+                "blogposts": posts_using_word(word, self.results_limit),
+            },
         )
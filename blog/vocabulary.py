@@ -0,0 +1,216 @@
+# ---------------------
+# Standard Library Imports
+# ---------------------
+from collections import Counter
+from functools import lru_cache
+
+# ---------------------
+# Django Imports
+# ---------------------
+from django.conf import settings
+from django.db import transaction
+from .dutch import FREQUENT_WORDS, html_to_text, stem, tokenize
+from .models import Blogpost, PostVocabulary, WordOccurrence
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover - numpy is optional
+    numpy = None
+
+# ---------------------
+# Dutch Vocabulary Profile
+# ---------------------
+# Every post's title and tag-stripped body are split into words with the
+# helpers in blog/dutch.py, and each word is reduced to its Snowball stem,
+# used here as its lemma. From that, two things are stored:
+#
+# - WordOccurrence: an inverted index of lemma -> (post, count), so the
+#   posts that use a word are one query on the (lemma, count, post) index.
+# - PostVocabulary: the post's word count, number of distinct lemmas,
+#   reading time at BLOG_READING_WORDS_PER_MINUTE, and 'coverage', the
+#   share of its running words that are among the frequent Dutch words
+#   in blog/dutch.py. The lower the coverage, the more rare words a
+#   reader needs, and BLOG_VOCABULARY_LEVELS maps it onto the A1-C2
+#   levels used by the media categories.
+#
+# A saved post is analyzed again by a background task (blog/tasks.py).
+# rebuild_vocabulary re-analyzes everything; it counts all posts of a
+# batch at once with NumPy when it is installed, and falls back to
+# per-post Counters otherwise. Both give the same results.
+
+MAX_LEMMA_LENGTH = 64
+
+FREQUENT_LEMMAS = frozenset(stem(word) for word in FREQUENT_WORDS)
+
+# Texts repeat the same few thousand words, so each is stemmed once
+cached_stem = lru_cache(maxsize=100000)(stem)
+
+
+def post_lemmas(blogpost):
+    """
+    The lemmas of a post's title and body, in text order.
+    """
+    text = f'{blogpost.blog_title} {html_to_text(blogpost.content)}'
+    return [
+        stemmed for stemmed in map(cached_stem, tokenize(text))
+        if stemmed and len(stemmed) <= MAX_LEMMA_LENGTH
+    ]
+
+
+def cefr_level(coverage):
+    """
+    Maps a coverage share onto a CEFR level, A1 being the easiest.
+    """
+    for level, minimum in settings.BLOG_VOCABULARY_LEVELS:
+        if coverage >= minimum:
+            return level
+    return 'C2'
+
+
+def make_profile(post_id, word_count, unique_lemmas, frequent_count):
+    coverage = frequent_count / word_count if word_count else 1.0
+    return PostVocabulary(
+        blogpost_id=post_id,
+        word_count=word_count,
+        unique_lemmas=unique_lemmas,
+        reading_minutes=round(
+            word_count / settings.BLOG_READING_WORDS_PER_MINUTE, 1
+        ),
+        coverage=round(coverage, 4),
+        level=cefr_level(coverage),
+    )
+
+
+# ---------------------
+# Counting
+# ---------------------
+def count_lemmas(posts_lemmas):
+    """
+    Counts {post_id: [lemma, ...]}. Returns the PostVocabulary profiles
+    and the WordOccurrence rows, unsaved.
+    """
+    profiles, occurrences = [], []
+    for post_id, lemmas in posts_lemmas.items():
+        counts = Counter(lemmas)
+        profiles.append(make_profile(
+            post_id, len(lemmas), len(counts),
+            sum(count for lemma, count in counts.items()
+                if lemma in FREQUENT_LEMMAS),
+        ))
+        occurrences.extend(
+            WordOccurrence(lemma=lemma, blogpost_id=post_id, count=count)
+            for lemma, count in counts.items()
+        )
+    return profiles, occurrences
+
+
+def count_lemmas_vectorized(posts_lemmas):
+    """
+    count_lemmas() for a whole batch with NumPy: each (post, lemma) pair
+    becomes one integer code, and np.unique counts them all at once.
+    """
+    post_ids = list(posts_lemmas)
+    lemma_ids = {}
+    codes = [
+        [lemma_ids.setdefault(lemma, len(lemma_ids)) for lemma in lemmas]
+        for lemmas in posts_lemmas.values()
+    ]
+    lemmas = list(lemma_ids)
+    lengths = numpy.array([len(row) for row in codes], dtype=numpy.int64)
+    rows = numpy.repeat(numpy.arange(len(post_ids)), lengths)
+    columns = numpy.fromiter(
+        (code for row in codes for code in row), dtype=numpy.int64,
+        count=int(lengths.sum())
+    )
+    pairs, counts = numpy.unique(
+        rows * max(len(lemmas), 1) + columns, return_counts=True
+    )
+    pair_rows, pair_columns = numpy.divmod(pairs, max(len(lemmas), 1))
+
+    frequent = numpy.array(
+        [lemma in FREQUENT_LEMMAS for lemma in lemmas], dtype=bool
+    )
+    frequent_counts = numpy.bincount(
+        rows, weights=frequent[columns] if len(columns) else None,
+        minlength=len(post_ids)
+    )
+    unique_counts = numpy.bincount(pair_rows, minlength=len(post_ids))
+
+    profiles = [
+        make_profile(
+            post_id, int(lengths[i]), int(unique_counts[i]),
+            int(frequent_counts[i]),
+        )
+        for i, post_id in enumerate(post_ids)
+    ]
+    occurrences = [
+        WordOccurrence(
+            lemma=lemmas[column], blogpost_id=post_ids[row], count=int(count)
+        )
+        for row, column, count in zip(
+            pair_rows.tolist(), pair_columns.tolist(), counts.tolist()
+        )
+    ]
+    return profiles, occurrences
+
+
+# ---------------------
+# Public API
+# ---------------------
+def analyze_posts(blogposts, vectorized=None):
+    """
+    Re-analyzes the given posts and replaces their stored profile and
+    index entries. Returns the number of posts.
+    """
+    if vectorized is None:
+        vectorized = numpy is not None
+    posts_lemmas = {post.pk: post_lemmas(post) for post in blogposts}
+    if not posts_lemmas:
+        return 0
+    counter = count_lemmas_vectorized if vectorized else count_lemmas
+    profiles, occurrences = counter(posts_lemmas)
+    with transaction.atomic():
+        WordOccurrence.objects.filter(
+            blogpost_id__in=list(posts_lemmas)
+        ).delete()
+        PostVocabulary.objects.filter(pk__in=list(posts_lemmas)).delete()
+        PostVocabulary.objects.bulk_create(profiles)
+        WordOccurrence.objects.bulk_create(occurrences, batch_size=2000)
+    return len(profiles)
+
+
+def rebuild_vocabulary(batch_size=500, vectorized=None):
+    """
+    Re-analyzes every post in batches. Returns the number of posts.
+    """
+    queryset = Blogpost.objects.only(
+        'pk', 'blog_title', 'content'
+    ).order_by('pk')
+    total, batch = 0, []
+    for blogpost in queryset.iterator(chunk_size=batch_size):
+        batch.append(blogpost)
+        if len(batch) >= batch_size:
+            total += analyze_posts(batch, vectorized)
+            batch = []
+    return total + analyze_posts(batch, vectorized)
+
+
+def posts_using_word(word, limit=50):
+    """
+    Returns the published posts that use 'word' (in any inflection that
+    shares its stem), most uses first, each with 'word_uses' set.
+    """
+    words = tokenize(word or '')
+    if not words:
+        return []
+    occurrences = WordOccurrence.objects.filter(
+        lemma=cached_stem(words[0]), blogpost__status=1
+    ).select_related(
+        'blogpost__author', 'blogpost__media_category',
+        'blogpost__vocabulary',
+    ).defer('blogpost__content').order_by('-count', '-blogpost_id')[:limit]
+    posts = []
+    for occurrence in occurrences:
+        occurrence.blogpost.word_uses = occurrence.count
+        posts.append(occurrence.blogpost)
+    return posts
@@ -0,0 +1,12 @@
+"""
+Gunicorn settings for nederlearn, read automatically by the Procfile's
+'gunicorn nederlearn.wsgi'.
+"""
+
+
+def worker_exit(server, worker):
+    # Write the engagement events still buffered in this worker
+    # (blog/events.py) before it goes away
+    from blog.events import shutdown_events
+
+    shutdown_events()
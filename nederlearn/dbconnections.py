@@ -0,0 +1,174 @@
+"""
+Database connection metrics for nederlearn.
+
+Connection reuse is configured in settings (DB_CONNECTION_MODE,
+DB_CONN_MAX_AGE, DB_CONN_HEALTH_CHECKS). This module counts, per worker
+process, what those settings do in practice:
+
+- opened: new database connections, and the time spent opening them
+- failed: connection attempts that raised an error
+- reused: requests that started on a connection left open by an
+  earlier request
+- health_check_failures: persistent connections found broken at the
+  start of a request and replaced
+
+The counters are read from the 'db_connections' endpoint (staff only)
+or printed by the 'db_connections' management command, which can also
+measure the cost of opening a connection against reusing one.
+"""
+
+# ---------------------
+# Standard library imports
+# ---------------------
+import threading
+import time
+
+# ---------------------
+# Django imports
+# ---------------------
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.http import JsonResponse
+
+
+class ConnectionMetrics:
+    """
+    Process-wide connection counters. Gunicorn workers each have their
+    own.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.opened = 0
+            self.failed = 0
+            self.reused = 0
+            self.requests = 0
+            self.health_check_failures = 0
+            self.connect_ms = 0.0
+
+    def add(self, **counts):
+        with self.lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'opened': self.opened,
+                'reused': self.reused,
+                'failed': self.failed,
+                'health_check_failures': self.health_check_failures,
+                'connect_ms': round(self.connect_ms, 2),
+                'mean_connect_ms': round(
+                    self.connect_ms / self.opened, 2
+                ) if self.opened else None,
+            }
+
+
+metrics = ConnectionMetrics()
+
+
+# ---------------------
+# Instrumentation
+# ---------------------
+# Django sends no signal for failed connection attempts or health checks,
+# so the two BaseDatabaseWrapper methods involved are wrapped once, in the
+# same way as the template timer in nederlearn/middleware.py.
+def install_connection_metrics():
+    if getattr(BaseDatabaseWrapper.connect, '_nederlearn_counted', False):
+        return
+    original_connect = BaseDatabaseWrapper.connect
+    original_health_check = BaseDatabaseWrapper.close_if_health_check_failed
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            original_connect(self)
+        except Exception:
+            metrics.add(failed=1)
+            raise
+        metrics.add(
+            opened=1, connect_ms=(time.perf_counter() - start) * 1000
+        )
+
+    def close_if_health_check_failed(self):
+        was_open = self.connection is not None
+        original_health_check(self)
+        if was_open and self.connection is None:
+            metrics.add(health_check_failures=1)
+
+    connect._nederlearn_counted = True
+    BaseDatabaseWrapper.connect = connect
+    BaseDatabaseWrapper.close_if_health_check_failed = \
+        close_if_health_check_failed
+    # Connected after Django's close_old_connections, so a connection
+    # still open here is going to be reused by this request.
+    request_started.connect(
+        count_request_connections, dispatch_uid='nederlearn_db_reuse'
+    )
+
+
+def count_request_connections(sender, **kwargs):
+    reused = sum(
+        1 for connection in connections.all(initialized_only=True)
+        if connection.connection is not None
+    )
+    metrics.add(requests=1, reused=reused)
+
+
+# ---------------------
+# Reporting
+# ---------------------
+def connection_settings(alias='default'):
+    settings_dict = connections[alias].settings_dict
+    return {
+        'mode': settings.DB_CONNECTION_MODE,
+        'vendor': connections[alias].vendor,
+        'conn_max_age': settings_dict['CONN_MAX_AGE'],
+        'health_checks': settings_dict['CONN_HEALTH_CHECKS'],
+        'server_side_cursors': not settings_dict.get(
+            'DISABLE_SERVER_SIDE_CURSORS', False
+        ),
+    }
+
+
+@staff_member_required
+def connection_metrics_view(request):
+    """
+    This worker's connection settings and counters as JSON.
+    """
+    return JsonResponse({
+        'settings': connection_settings(),
+        'metrics': metrics.snapshot(),
+    })
+
+
+def measure_connection_overhead(rounds=50, alias='default'):
+    """
+    Times 'SELECT 1' on a fresh connection against the same query on an
+    already open one. Returns the mean milliseconds of each.
+    """
+    connection = connections[alias]
+
+    def timed(reconnect):
+        durations = []
+        for _ in range(rounds):
+            if reconnect:
+                connection.close()
+            start = time.perf_counter()
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+            durations.append((time.perf_counter() - start) * 1000)
+        return round(sum(durations) / rounds, 3)
+
+    connection.ensure_connection()
+    return {'new_connection_ms': timed(True), 'reused_ms': timed(False)}
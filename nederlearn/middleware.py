@@ -0,0 +1,202 @@
+"""
+Request performance instrumentation for nederlearn.
+
+PerformanceMiddleware measures, for a sample of requests, the number of
+SQL queries and their total time, the slowest statements, template
+render time, view time and total time. The numbers are sent back in a
+Server-Timing header (visible in the browser's network panel) and logged
+as one JSON line on the 'nederlearn.performance' logger. Requests slower
+than PERF_SLOW_REQUEST_MS are logged as warnings with their slowest SQL.
+
+Requests that are not sampled skip all of this, so the middleware can be
+left on under gunicorn.
+"""
+
+# ---------------------
+# Standard library imports
+# ---------------------
+import heapq
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+# ---------------------
+# Django imports
+# ---------------------
+from django.conf import settings
+from django.db import connections
+from django.template.base import Template
+from nederlearn.dbconnections import install_connection_metrics
+
+logger = logging.getLogger('nederlearn.performance')
+
+# The metrics of the request being handled on this thread/task, if sampled
+_current = ContextVar('nederlearn_performance', default=None)
+
+
+class RequestMetrics:
+    """
+    Timings collected for one request, in milliseconds.
+    """
+
+    def __init__(self, slowest_limit):
+        self.slowest_limit = slowest_limit
+        self.query_count = 0
+        self.sql_ms = 0.0
+        self.slowest = []
+        self.template_ms = 0.0
+        self.template_depth = 0
+        self.view_ms = 0.0
+        self.extra = {}
+
+    def add_query(self, sql, duration_ms):
+        self.query_count += 1
+        self.sql_ms += duration_ms
+        entry = (duration_ms, sql[:300])
+        if len(self.slowest) < self.slowest_limit:
+            heapq.heappush(self.slowest, entry)
+        elif self.slowest and duration_ms > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def add_timing(self, name, duration_ms):
+        self.extra[name] = self.extra.get(name, 0.0) + duration_ms
+
+    def __call__(self, execute, sql, params, many, context):
+        # Database execute_wrapper hook
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add_query(sql, (time.perf_counter() - start) * 1000)
+
+
+@contextmanager
+def timing(name):
+    """
+    Adds the time spent in the block to the current request's metrics
+    under 'name', e.g. ``with timing('cloudinary'): ...``. Does nothing
+    when the request is not sampled.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_timing(name, (time.perf_counter() - start) * 1000)
+
+
+# ---------------------
+# Template timing
+# ---------------------
+# Django has no hook around template rendering outside the test runner,
+# so Template.render is wrapped once. Only the outermost render is timed;
+# included templates are part of their parent's time.
+def _install_template_timer():
+    if getattr(Template.render, '_nederlearn_timed', False):
+        return
+    original_render = Template.render
+
+    def render(self, context):
+        metrics = _current.get()
+        if metrics is None:
+            return original_render(self, context)
+        metrics.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return original_render(self, context)
+        finally:
+            metrics.template_depth -= 1
+            if metrics.template_depth == 0:
+                metrics.template_ms += (time.perf_counter() - start) * 1000
+
+    render._nederlearn_timed = True
+    Template.render = render
+
+
+# ---------------------
+# PerformanceMiddleware
+# ---------------------
+class PerformanceMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.PERF_SAMPLE_RATE
+        self.slow_ms = settings.PERF_SLOW_REQUEST_MS
+        self.slowest_limit = settings.PERF_SLOWEST_QUERIES
+        self.server_timing = settings.PERF_SERVER_TIMING
+        _install_template_timer()
+        install_connection_metrics()
+
+    def __call__(self, request):
+        if not self.sample_rate or random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        metrics = RequestMetrics(self.slowest_limit)
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                request._performance_view_start = None
+                response = self.get_response(request)
+                if request._performance_view_start is not None:
+                    metrics.view_ms = (
+                        time.perf_counter() - request._performance_view_start
+                    ) * 1000
+        finally:
+            _current.reset(token)
+        total_ms = (time.perf_counter() - start) * 1000
+
+        if self.server_timing:
+            response['Server-Timing'] = self.server_timing_header(
+                metrics, total_ms
+            )
+        self.log(request, response, metrics, total_ms)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._performance_view_start = time.perf_counter()
+
+    def server_timing_header(self, metrics, total_ms):
+        entries = [
+            f'db;dur={metrics.sql_ms:.1f};desc="{metrics.query_count} queries"',
+            f'tpl;dur={metrics.template_ms:.1f}',
+            f'view;dur={metrics.view_ms:.1f}',
+        ]
+        entries += [
+            f'{name};dur={duration:.1f}'
+            for name, duration in metrics.extra.items()
+        ]
+        entries.append(f'total;dur={total_ms:.1f}')
+        return ', '.join(entries)
+
+    def log(self, request, response, metrics, total_ms):
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total_ms, 1),
+            'view_ms': round(metrics.view_ms, 1),
+            'template_ms': round(metrics.template_ms, 1),
+            'sql_ms': round(metrics.sql_ms, 1),
+            'queries': metrics.query_count,
+        }
+        record.update({
+            f'{name}_ms': round(duration, 1)
+            for name, duration in metrics.extra.items()
+        })
+        if total_ms >= self.slow_ms:
+            record['slowest_queries'] = [
+                {'ms': round(duration, 1), 'sql': sql}
+                for duration, sql in sorted(metrics.slowest, reverse=True)
+            ]
+            logger.warning(json.dumps(record))
+        else:
+            logger.info(json.dumps(record))
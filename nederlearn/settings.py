@@ -17,6 +17,7 @@ from pathlib import Path
 import os
 import dj_database_url
 from django.contrib.messages import constants as messages
+from django.core.exceptions import ImproperlyConfigured
 
 if os.path.isfile("env.py"):
     import env
@@ -80,6 +81,7 @@ MESSAGE_TAGS = {
 CRISPY_TEMPLATE_PACK = 'bootstrap4'
 
 MIDDLEWARE = [
+    'nederlearn.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -92,6 +94,35 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'nederlearn.urls'
 
+# ---------------------
+# Performance instrumentation (nederlearn/middleware.py)
+# PERF_SAMPLE_RATE is the share of requests (0-1) that are measured.
+# Sampled requests get a Server-Timing header and a JSON log line;
+# those slower than PERF_SLOW_REQUEST_MS are logged as warnings with
+# their PERF_SLOWEST_QUERIES slowest SQL statements.
+# ---------------------
+PERF_SAMPLE_RATE = float(os.environ.get('PERF_SAMPLE_RATE', '0.1'))
+PERF_SLOW_REQUEST_MS = float(os.environ.get('PERF_SLOW_REQUEST_MS', '500'))
+PERF_SLOWEST_QUERIES = 3
+PERF_SERVER_TIMING = True
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'nederlearn.performance': {
+            'handlers': ['console'],
+            'level': os.environ.get('PERF_LOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
 # ---------------------
 # Templates Definition
 # ---------------------
@@ -132,9 +163,39 @@ WSGI_APPLICATION = 'nederlearn.wsgi.application'
 
 
 # Set up the production database using dj-database-url.
+# ---------------------
+# Database connection lifecycle
+# 'persistent' keeps each worker's connection open for DB_CONN_MAX_AGE
+#   seconds and checks it is still usable before reusing it.
+# 'per-request' opens and closes a connection for every request.
+# 'pooled' connects through an external pooler such as PgBouncer in
+#   transaction mode (DATABASE_POOL_URL, falling back to DATABASE_URL),
+#   for worker counts that would exceed the server's connection limit.
+#   Server-side cursors do not survive transaction pooling, so they are
+#   turned off.
+# Counters for opened/reused/failed connections: nederlearn/dbconnections.py
+# ---------------------
+DB_CONNECTION_MODE = os.environ.get('DB_CONNECTION_MODE', 'persistent')
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', '60'))
+DB_CONN_HEALTH_CHECKS = os.environ.get(
+    'DB_CONN_HEALTH_CHECKS', 'true').lower() in ('1', 'true', 'yes')
+
+if DB_CONNECTION_MODE == 'pooled':
+    DATABASE_URL = os.environ.get('DATABASE_POOL_URL') or \
+        os.environ.get('DATABASE_URL')
+else:
+    DATABASE_URL = os.environ.get('DATABASE_URL')
+
 DATABASES = {
-    'default': dj_database_url.parse(os.environ.get('DATABASE_URL'))
+    'default': dj_database_url.parse(
+        DATABASE_URL,
+        conn_max_age=0 if DB_CONNECTION_MODE == 'per-request'
+        else DB_CONN_MAX_AGE,
+    )
 }
+DATABASES['default']['CONN_HEALTH_CHECKS'] = DB_CONN_HEALTH_CHECKS
+if DB_CONNECTION_MODE == 'pooled':
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
 
 # TEMPORARY TEST SECTION
 """
@@ -183,6 +244,7 @@ USE_TZ = True
 # <https://docs.djangoproject.com/en/3.2/howto/static-files/>
 # ---------------------
 MEDIA_URL = '/media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 
 STATIC_URL = '/static/'
@@ -190,6 +252,36 @@ STATICFILES_STORAGE = 'cloudinary_storage.storage.StaticHashedCloudinaryStorage'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static'), ]
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# ---------------------
+# Static file serving
+# 'cloudinary' uploads static files to Cloudinary on collectstatic;
+# 'local' hashes and precompresses them into STATIC_ROOT and serves them
+# from the WSGI process (nederlearn/staticfiles.py). STATIC_MAX_AGE is
+# the Cache-Control max-age, in seconds, of files without a hash in
+# their name; hashed files are cached for a year.
+# ---------------------
+STATIC_SERVING = os.environ.get('STATIC_SERVING', 'cloudinary')
+if STATIC_SERVING == 'local':
+    STATICFILES_STORAGE = \
+        'nederlearn.staticfiles.CompressedManifestStaticFilesStorage'
+    # cloudinary_storage's collectstatic only uploads hashed files, so
+    # Django's own command is put first again
+    INSTALLED_APPS.remove('cloudinary_storage')
+    INSTALLED_APPS.insert(
+        INSTALLED_APPS.index('django.contrib.staticfiles') + 1,
+        'cloudinary_storage'
+    )
+STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE', '60'))
+
+# ---------------------
+# Responsive image variants
+# 'cloudinary' stores Cloudinary transformation URLs for each width;
+# 'local' resizes the originals with Pillow from BLOG_IMAGE_STORAGE (the
+# local filesystem under MEDIA_ROOT by default).
+# ---------------------
+BLOG_IMAGE_BACKEND = os.environ.get('BLOG_IMAGE_BACKEND', 'cloudinary')
+BLOG_IMAGE_STORAGE = None
+
 # ---------------------
 # Default primary key field type
 # <https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field>
@@ -197,3 +289,140 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 ACCOUNT_EMAIL_VERIFICATION = 'none'
+
+# ---------------------
+# Blog feed pagination
+# 'cursor' pages the post feed with (created_on, id) keyset tokens, so
+# deep pages cost the same as page 1 and no COUNT(*) is run. Set it to
+# 'offset' to fall back to Django's page-number Paginator.
+# ---------------------
+BLOG_FEED_PAGINATION = os.environ.get('BLOG_FEED_PAGINATION', 'cursor')
+
+# ---------------------
+# Caching
+# Per-process local memory unless a shared cache is chosen with
+# CACHE_BACKEND (see the task queue settings below). The blog detail
+# cache entries are invalidated by signals, so the timeout only bounds
+# how long an unused entry is kept.
+# <https://docs.djangoproject.com/en/4.2/topics/cache/>
+# ---------------------
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'nederlearn',
+    }
+}
+
+BLOG_DETAIL_CACHE_TIMEOUT = 60 * 60 * 24
+BLOG_CATEGORY_CACHE_TIMEOUT = 60 * 60
+BLOG_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Trending feed (blog/trending.py): how fast engagement loses half its
+# weight, and the weight of each kind of event
+BLOG_TRENDING_HALF_LIFE_HOURS = 24
+BLOG_TRENDING_WEIGHTS = {
+    'post': 1.0, 'like': 1.0, 'bookmark': 2.0, 'comment': 3.0,
+}
+
+# Admin changelists show an estimated total instead of running COUNT(*)
+# on unfiltered tables larger than this
+BLOG_ADMIN_APPROXIMATE_COUNT_THRESHOLD = 10000
+# The comment admin searches comment bodies of this many recent days only
+BLOG_ADMIN_COMMENT_SEARCH_DAYS = 30
+
+# Engagement event log (blog/events.py): events are buffered per process
+# and written in batches of BLOG_EVENT_FLUSH_SIZE or every
+# BLOG_EVENT_FLUSH_INTERVAL seconds by a background thread. Without the
+# thread ('false'), a full buffer is written by the request that filled
+# it. rollup_engagement leaves events inserted less than
+# BLOG_EVENT_ROLLUP_LAG seconds ago for a later run.
+BLOG_EVENT_BACKGROUND_FLUSH = os.environ.get(
+    'BLOG_EVENT_BACKGROUND_FLUSH', 'true').lower() in ('1', 'true', 'yes')
+BLOG_EVENT_FLUSH_SIZE = int(os.environ.get('BLOG_EVENT_FLUSH_SIZE', '500'))
+BLOG_EVENT_FLUSH_INTERVAL = float(
+    os.environ.get('BLOG_EVENT_FLUSH_INTERVAL', '2')
+)
+BLOG_EVENT_BUFFER_LIMIT = 20000
+BLOG_EVENT_ROLLUP_LAG = 300
+
+# Background task queue (blog/taskqueue.py), run by 'manage.py run_tasks'.
+# Failed tasks are retried after BLOG_TASK_RETRY_DELAY seconds, doubled
+# per attempt up to BLOG_TASK_MAX_RETRY_DELAY; tasks held for longer than
+# BLOG_TASK_TIMEOUT seconds are given to another worker. With
+# BLOG_TASKS_EAGER the work runs inside the request instead, for setups
+# without a worker.
+BLOG_TASKS_EAGER = os.environ.get(
+    'BLOG_TASKS_EAGER', 'false').lower() in ('1', 'true', 'yes')
+
+# Tasks run in the worker processes, so the cache entries they invalidate
+# and the feed versions they move only reach the web workers through a
+# shared cache. Unless tasks run eagerly, CACHE_BACKEND must therefore be
+# 'database' (the default; create its table with 'manage.py
+# createcachetable') or 'redis' (at REDIS_URL, needs the redis package).
+CACHE_BACKEND = os.environ.get(
+    'CACHE_BACKEND', 'locmem' if BLOG_TASKS_EAGER else 'database'
+)
+if CACHE_BACKEND == 'database':
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'nederlearn_cache',
+    }
+elif CACHE_BACKEND == 'redis':
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL', 'redis://localhost:6379'),
+    }
+elif CACHE_BACKEND != 'locmem' or not BLOG_TASKS_EAGER:
+    raise ImproperlyConfigured(
+        f'CACHE_BACKEND={CACHE_BACKEND!r}: use a shared cache ("database" '
+        f'or "redis"), or "locmem" together with BLOG_TASKS_EAGER.'
+    )
+BLOG_TASK_RETRY_DELAY = 10
+BLOG_TASK_MAX_RETRY_DELAY = 60 * 60
+BLOG_TASK_TIMEOUT = 15 * 60
+
+# Dutch vocabulary profiles (blog/vocabulary.py): reading speed used for
+# the reading time, and the lowest share of frequent words a post may
+# have for each level; posts below the last one are C2
+BLOG_READING_WORDS_PER_MINUTE = 180
+BLOG_VOCABULARY_LEVELS = (
+    ('A1', 0.80), ('A2', 0.72), ('B1', 0.64), ('B2', 0.56), ('C1', 0.48),
+)
+
+# Similar posts (blog/similarity.py): how many are kept per post, the
+# weight of each signal, the extra term frequency of title words and the
+# largest share of posts a word may appear in and still count
+BLOG_SIMILAR_POSTS = 6
+BLOG_SIMILAR_WEIGHTS = {
+    'text': 0.6, 'likes': 0.2, 'category': 0.15, 'year': 0.05,
+}
+BLOG_SIMILAR_TITLE_BOOST = 1.0
+BLOG_SIMILAR_MAX_DF = 0.5
+
+# Personal "For you" feed (blog/personal_feed.py). Posts are ranked by
+# recency with the same half-life scale as the trending score, moved up
+# by the reader's affinity for their category, author and title words.
+# New posts are fanned out to users seen in the last
+# BLOG_PERSONAL_FEED_ACTIVE_DAYS; other feeds, and feeds older than
+# BLOG_PERSONAL_FEED_REBUILD_HOURS, are rebuilt when their user returns.
+# A session checks its feed's state every BLOG_PERSONAL_FEED_CHECK_INTERVAL
+# seconds.
+BLOG_PERSONAL_FEED_SIZE = 300
+BLOG_PERSONAL_FEED_CANDIDATES = 1000
+BLOG_PERSONAL_FEED_HALF_LIFE_HOURS = 48
+BLOG_PERSONAL_FEED_HISTORY_DAYS = 180
+BLOG_PERSONAL_FEED_ACTIVE_DAYS = 14
+BLOG_PERSONAL_FEED_REBUILD_HOURS = 24
+BLOG_PERSONAL_FEED_CHECK_INTERVAL = 15 * 60
+BLOG_PERSONAL_FEED_WEIGHTS = {
+    # engagement history
+    'like': 1.0, 'bookmark': 2.0, 'comment': 1.5,
+    # affinity terms
+    'category': 1.0, 'profile_category': 0.5, 'author': 1.0, 'interest': 1.0,
+}
+# UserProfile fields that show interest in a media category
+BLOG_PERSONAL_FEED_PROFILE_CATEGORIES = {
+    'top_movies': 'Movies', 'top_series': 'Series', 'top_books': 'Books',
+    'top_music_albums': 'Music', 'top_podcasts': 'Podcasts',
+    'top_miscellaneous': 'Miscellaneous',
+}
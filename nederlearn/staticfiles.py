@@ -0,0 +1,283 @@
+"""
+Local static file pipeline for nederlearn.
+
+An alternative to Cloudinary's static storage, used when STATIC_SERVING
+is 'local':
+
+- CompressedManifestStaticFilesStorage runs during collectstatic. It
+  writes content-hashed copies of every file plus staticfiles.json (the
+  manifest used by {% static %}) and stores gzip and, when the 'brotli'
+  package is installed, brotli versions of text assets next to them.
+- StaticFilesMiddleware wraps the WSGI application in nederlearn/wsgi.py.
+  It indexes STATIC_ROOT once at startup and answers requests for
+  STATIC_URL itself, before Django's request handling runs, choosing the
+  smallest encoding the client accepts (honouring q-values, so q=0
+  refuses one). Each encoding has its own ETag. Hashed files are sent
+  with a one year immutable Cache-Control header.
+
+collectstatic then works offline, and static hits cost a dict lookup and
+a file read.
+"""
+
+# ---------------------
+# Standard library imports
+# ---------------------
+import gzip
+import mimetypes
+import os
+from email.utils import formatdate, parsedate_to_datetime
+
+# ---------------------
+# Django imports
+# ---------------------
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+# Only text formats are worth compressing; images and fonts already are
+COMPRESSIBLE_EXTENSIONS = (
+    '.css', '.js', '.mjs', '.map', '.json', '.svg', '.txt', '.html',
+    '.xml', '.ico',
+)
+
+# File suffix of each encoding, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+# ---------------------
+# Storage
+# ---------------------
+def compress(data, encoding):
+    if encoding == 'gzip':
+        # mtime=0 keeps the output identical between deploys
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    return brotli.compress(data)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Manifest storage that also writes '<name>.gz' and '<name>.br' for
+    every compressible file, original and hashed, if the compressed
+    version is smaller.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        # CSS files are reported once per pass; the last hashed name wins
+        hashed_names = {}
+        for name, hashed_name, processed in super().post_process(
+                paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed_names[name] = hashed_name
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for name, hashed_name in hashed_names.items():
+            for path in {name, hashed_name}:
+                for compressed in self.compress_file(path):
+                    yield path, compressed, True
+
+    def compress_file(self, name):
+        if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+            return []
+        with self.open(name) as original:
+            data = original.read()
+        written = []
+        for encoding, suffix in ENCODINGS:
+            if encoding == 'br' and brotli is None:
+                continue
+            compressed = compress(data, encoding)
+            if len(compressed) >= len(data):
+                continue
+            path = self.path(name + suffix)
+            with open(path, 'wb') as output:
+                output.write(compressed)
+            written.append(name + suffix)
+        return written
+
+
+# ---------------------
+# StaticFilesMiddleware
+# ---------------------
+def parse_accept_encoding(header):
+    """
+    Reads an Accept-Encoding header as {coding: q-value}, e.g.
+    'gzip, br;q=0' -> {'gzip': 1.0, 'br': 0.0}. Malformed q-values count
+    as 0.
+    """
+    qualities = {}
+    for item in header.split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = min(max(float(value), 0.0), 1.0)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+    return qualities
+
+
+class StaticFile:
+    """
+    One file under STATIC_ROOT with its precompressed variants and the
+    response headers for each of them.
+    """
+
+    def __init__(self, path, immutable):
+        self.path = path
+        content_type, _ = mimetypes.guess_type(path)
+        if content_type and content_type.startswith('text/'):
+            content_type += '; charset=utf-8'
+        stat = os.stat(path)
+        self.last_modified = formatdate(stat.st_mtime, usegmt=True)
+        self.tag = f'{int(stat.st_mtime):x}-{stat.st_size:x}'
+        self.cache_control = IMMUTABLE_CACHE_CONTROL if immutable else \
+            f'public, max-age={settings.STATIC_MAX_AGE}'
+        self.content_type = content_type or 'application/octet-stream'
+        # encoding -> (path, size); None is the uncompressed file
+        self.variants = {None: (path, stat.st_size)}
+        for encoding, suffix in ENCODINGS:
+            if os.path.exists(path + suffix):
+                self.variants[encoding] = (
+                    path + suffix, os.path.getsize(path + suffix)
+                )
+
+    def choose(self, accept_encoding):
+        """
+        The accepted variant with the highest q-value, the smaller one on
+        a tie; None (identity) if no compressed variant is accepted.
+        """
+        qualities = parse_accept_encoding(accept_encoding)
+        best, best_quality = None, 0.0
+        for encoding, _ in ENCODINGS:
+            quality = qualities.get(encoding, qualities.get('*', 0.0))
+            if encoding in self.variants and quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def etag(self, encoding):
+        # Each variant has its own bytes, so its own validator
+        return f'"{self.tag}-{encoding or "identity"}"'
+
+    def headers(self, encoding):
+        headers = [
+            ('Content-Type', self.content_type),
+            ('Content-Length', str(self.variants[encoding][1])),
+            ('Cache-Control', self.cache_control),
+            ('Last-Modified', self.last_modified),
+            ('ETag', self.etag(encoding)),
+        ]
+        if len(self.variants) > 1:
+            headers.append(('Vary', 'Accept-Encoding'))
+        if encoding:
+            headers.append(('Content-Encoding', encoding))
+        return headers
+
+    def is_not_modified(self, environ, encoding):
+        if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            return if_none_match == '*' or self.etag(encoding) in [
+                tag.strip().removeprefix('W/')
+                for tag in if_none_match.split(',')
+            ]
+        if_modified_since = environ.get('HTTP_IF_MODIFIED_SINCE')
+        if if_modified_since:
+            try:
+                return parsedate_to_datetime(if_modified_since) >= \
+                    parsedate_to_datetime(self.last_modified)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+
+class StaticFilesMiddleware:
+    """
+    WSGI middleware that serves the collected static files. Requests for
+    paths outside STATIC_URL, or for files that are not in STATIC_ROOT,
+    are passed on to the wrapped application.
+    """
+
+    def __init__(self, application, root=None, prefix=None):
+        self.application = application
+        self.root = root or settings.STATIC_ROOT
+        self.prefix = prefix or settings.STATIC_URL
+        if not self.prefix.startswith('/'):
+            self.prefix = '/' + self.prefix
+        self.files = self.scan()
+
+    def scan(self):
+        """
+        Indexes STATIC_ROOT as {url: StaticFile}. Files listed as hashed
+        names in the manifest are cached for a year.
+        """
+        files = {}
+        if not os.path.isdir(self.root):
+            return files
+        hashed = set()
+        manifest_path = os.path.join(self.root, 'staticfiles.json')
+        if os.path.exists(manifest_path):
+            storage = ManifestStaticFilesStorage(location=self.root)
+            hashed = set(storage.hashed_files.values())
+        compressed_suffixes = tuple(suffix for _, suffix in ENCODINGS)
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(directory, name)
+                relative = os.path.relpath(path, self.root).replace(
+                    os.sep, '/'
+                )
+                # 'x.css.gz' is a variant of 'x.css', not a file of its own
+                if name.endswith(compressed_suffixes) and \
+                        os.path.exists(path.rsplit('.', 1)[0]):
+                    continue
+                files[self.prefix + relative] = StaticFile(
+                    path, relative in hashed
+                )
+        return files
+
+    def __call__(self, environ, start_response):
+        static_file = self.files.get(environ.get('PATH_INFO', ''))
+        if static_file is None:
+            return self.application(environ, start_response)
+
+        method = environ['REQUEST_METHOD']
+        if method not in ('GET', 'HEAD'):
+            start_response('405 Method Not Allowed', [('Allow', 'GET, HEAD')])
+            return []
+        encoding = static_file.choose(
+            environ.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        headers = static_file.headers(encoding)
+        if static_file.is_not_modified(environ, encoding):
+            start_response('304 Not Modified', [
+                header for header in headers
+                if header[0] not in ('Content-Length', 'Content-Type',
+                                     'Content-Encoding')
+            ])
+            return []
+        start_response('200 OK', headers)
+        if method == 'HEAD':
+            return []
+        stream = open(static_file.variants[encoding][0], 'rb')
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if file_wrapper:
+            return file_wrapper(stream, 8192)
+        return read_chunks(stream)
+
+
+def read_chunks(stream, size=8192):
+    with stream:
+        while True:
+            chunk = stream.read(size)
+            if not chunk:
+                return
+            yield chunk
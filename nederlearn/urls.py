@@ -17,9 +17,12 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
+from nederlearn.dbconnections import connection_metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('internal/db-connections/', connection_metrics_view,
+        name='db_connections'),
     path("", include("blog.urls"), name="blog-urls"),
     path('summernote/', include('django_summernote.urls')),
     path('accounts/', include('allauth.urls')),
@@ -14,3 +14,12 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nederlearn.settings')
 
 application = get_wsgi_application()
+
+# Serve collected static files straight from the worker process when the
+# local static pipeline is enabled (see nederlearn/staticfiles.py).
+from django.conf import settings  # noqa: E402
+
+if settings.STATIC_SERVING == 'local':
+    from nederlearn.staticfiles import StaticFilesMiddleware
+
+    application = StaticFilesMiddleware(application)
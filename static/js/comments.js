@@ -0,0 +1,32 @@
+/*
+* Load More Comments
+* Fetches the next page of approved comments from the comment page
+* endpoint and appends it to the thread until there are none left.
+*/
+var loadMoreButton = document.getElementById('load-more-comments');
+
+if (loadMoreButton) {
+    loadMoreButton.addEventListener('click', function () {
+        var url = loadMoreButton.dataset.url + '?cursor=' +
+            encodeURIComponent(loadMoreButton.dataset.cursor);
+        loadMoreButton.disabled = true;
+
+        fetch(url, {credentials: 'same-origin'})
+            .then(function (response) {
+                return response.json();
+            })
+            .then(function (data) {
+                document.getElementById('comment-list')
+                    .insertAdjacentHTML('beforeend', data.html);
+                if (data.next_cursor) {
+                    loadMoreButton.dataset.cursor = data.next_cursor;
+                    loadMoreButton.disabled = false;
+                } else {
+                    loadMoreButton.remove();
+                }
+            })
+            .catch(function () {
+                loadMoreButton.disabled = false;
+            });
+    });
+}
@@ -0,0 +1,50 @@
+/*
+* Like Toggle
+* Sends the like form to the JSON like API instead of reloading the page,
+* then updates the heart icon and like count in place. Without JavaScript,
+* or when the request never reached the server or was refused for the
+* login or CSRF token, the form posts to the regular like/unlike view.
+*/
+// Statuses after which the regular form can still do the toggle: the
+// viewer has to log in again, or the CSRF token has expired
+var FALLBACK_STATUSES = [401, 403];
+
+document.querySelectorAll('.like-form').forEach(function (form) {
+    form.addEventListener('submit', function (event) {
+        event.preventDefault();
+        var token = form.querySelector('[name=csrfmiddlewaretoken]').value;
+
+        fetch(form.dataset.apiUrl, {
+            method: 'POST',
+            headers: {'X-CSRFToken': token},
+            credentials: 'same-origin'
+        })
+            .then(function (response) {
+                if (FALLBACK_STATUSES.indexOf(response.status) !== -1) {
+                    form.submit();
+                    return;
+                }
+                if (!response.ok) {
+                    throw new Error(response.status);
+                }
+                return response.json().then(function (data) {
+                    var icon = form.querySelector('.fa-heart');
+                    icon.classList.toggle('fas', data.liked);
+                    icon.classList.toggle('far', !data.liked);
+                    document.querySelectorAll('.like-count').forEach(function (count) {
+                        count.textContent = data.like_count;
+                    });
+                });
+            }, function () {
+                // fetch() rejects only when the request did not get
+                // through, so the toggle has not happened yet
+                form.submit();
+            })
+            .catch(function () {
+                // The server answered, and may well have toggled the like;
+                // posting the form again would undo it, so the page is
+                // reloaded to show the stored state instead
+                window.location.reload();
+            });
+    });
+});